@@ -1,5 +1,32 @@
 from django.contrib import admin
-from .models import SimulationInput
+from django.contrib.admin.views.main import ChangeList
+from . import aggregati
+from .aggregati import ETICHETTE_ESITO
+from .models import AggregatoStorico, ProduzioneMensile, ProfiloCosti, SimulationInput
+
+class EsitoFilter(admin.SimpleListFilter):
+    """Filtro per esito con scelte fisse (nessun SELECT DISTINCT sui risultati)"""
+    title = 'esito'
+    parameter_name = 'esito'
+    
+    def lookups(self, request, model_admin):
+        return list(ETICHETTE_ESITO.items())
+    
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(risultato__tipo_messaggio=self.value())
+        return queryset
+
+
+class SimulationInputChangeList(ChangeList):
+    """Elenco delle simulazioni: legge solo le colonne mostrate (non tutti i decimali)"""
+    
+    def get_queryset(self, request, exclude_parameters=None):
+        return super().get_queryset(request, exclude_parameters).only(
+            *(campo for campo in self.list_display if campo not in ('action_checkbox', 'esito')),
+            'risultato__tipo_messaggio',
+        )
+
 
 @admin.register(SimulationInput)
 class SimulationInputAdmin(admin.ModelAdmin):
@@ -10,10 +37,15 @@ class SimulationInputAdmin(admin.ModelAdmin):
         'costo_impianto', 
         'prezzo_vendita_proteine', 
         'resa_proteine',
+        'esito',
         'created_at'
     ]
-    list_filter = ['created_at']
-    search_fields = ['id']
+    list_filter = ['created_at', EsitoFilter]
+    list_select_related = ['risultato']
+    # Ricerca esatta sull'id (chiave primaria) invece di un LIKE su tutta la tabella
+    search_fields = ['=id']
+    # Nessun COUNT(*) dell'intera tabella a ogni pagina
+    show_full_result_count = False
     readonly_fields = ['created_at']
     
     fieldsets = (
@@ -24,6 +56,90 @@ class SimulationInputAdmin(admin.ModelAdmin):
             'fields': ('prezzo_vendita_proteine', 'resa_proteine', 'prezzo_vendita_siero')
         }),
         ('Informazioni', {
-            'fields': ('created_at',)
+            'fields': ('profilo_costi', 'created_at',)
+        }),
+    )
+    
+    def get_changelist(self, request, **kwargs):
+        return SimulationInputChangeList
+    
+    def delete_queryset(self, request, queryset):
+        # Aggregati aggiornati con un solo upsert per l'intera selezione
+        aggregati.elimina(queryset)
+    
+    @admin.display(description='Esito', ordering='risultato__tipo_messaggio')
+    def esito(self, obj):
+        risultato = getattr(obj, 'risultato', None)
+        return risultato.tipo_messaggio if risultato is not None else '-'
+
+
+@admin.register(ProfiloCosti)
+class ProfiloCostiAdmin(admin.ModelAdmin):
+    list_display = [
+        'nome',
+        'fornitore',
+        'regione',
+        'costo_impianto',
+        'costi_operativi_annui',
+        'costi_extra',
+        'predefinito',
+        'attivo',
+        'aggiornato_il'
+    ]
+    list_filter = ['attivo', 'predefinito', 'regione']
+    search_fields = ['nome', 'fornitore', 'regione']
+    readonly_fields = ['aggiornato_il']
+    
+    fieldsets = (
+        ('Profilo', {
+            'fields': ('nome', 'fornitore', 'regione', 'predefinito', 'attivo')
+        }),
+        ('Costi Impianto', {
+            'fields': ('costo_impianto', 'costi_operativi_annui', 'costi_extra', 'costo_distribuzione')
+        }),
+        ('Prezzi e Resa', {
+            'fields': ('prezzo_vendita_proteine', 'resa_proteine', 'prezzo_vendita_siero')
+        }),
+        ('Informazioni', {
+            'fields': ('aggiornato_il',)
         }),
     )
+
+
+@admin.register(ProduzioneMensile)
+class ProduzioneMensileAdmin(admin.ModelAdmin):
+    list_display = [
+        'latteria',
+        'mese',
+        'volume_siero',
+        'margine_impianto',
+        'margine_siero',
+        'decisione',
+        'importata_il'
+    ]
+    list_filter = ['decisione', 'mese']
+    search_fields = ['latteria']
+    date_hierarchy = 'mese'
+    readonly_fields = ['importata_il']
+
+
+@admin.register(AggregatoStorico)
+class AggregatoStoricoAdmin(admin.ModelAdmin):
+    list_display = [
+        'mese',
+        'esito',
+        'fascia_volume',
+        'conteggio',
+        'impianto_conveniente',
+        'margine_impianto',
+        'margine_siero'
+    ]
+    list_filter = ['esito', 'fascia_volume']
+    date_hierarchy = 'mese'
+    
+    # Mantenuti dal salvataggio delle simulazioni: sola lettura
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,296 @@
+"""
+Aggregati dello storico delle simulazioni per i grafici della dashboard.
+
+I risultati salvati (SimulationResult) sono riassunti in AggregatoStorico:
+conteggi e somme per mese, esito (tipo del messaggio decisionale) e fascia
+di volume. La tabella è mantenuta in modo incrementale: `aggiungi` è
+chiamata nella stessa transazione che salva le simulazioni (vedi
+persistenza.salva_in_blocco) e somma i nuovi risultati ai gruppi esistenti
+con un upsert. `elimina` cancella un queryset di simulazioni (o di
+risultati) sottraendo in un solo passaggio i delta raggruppati per mese,
+esito e fascia; le altre eliminazioni passano dal segnale post_delete, un
+upsert per risultato. `ricostruisci` ricalcola tutto con un GROUP BY sul
+database.
+
+`serie` legge solo la tabella degli aggregati (al più mesi x esiti x fasce
+righe) e restituisce le serie compatte per Chart.js.
+"""
+import bisect
+import datetime
+import threading
+
+from django.db import connection, transaction
+from django.db.models import Case, Count, DateField, F, Q, Sum, Value, When
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from . import engine
+from .models import AggregatoStorico, SimulationResult
+
+# Limiti inferiori (litri di siero) delle fasce di volume
+FASCE_VOLUME = (0, 100000, 500000, 1000000, 2000000, 5000000)
+
+# Esiti nell'ordine della tabella decisionale, con l'etichetta dei grafici
+ETICHETTE_ESITO = {
+    'success': 'Impianto',
+    'warning': 'Impianto con interventi',
+    'info': 'Vendita siero',
+}
+ESITI = tuple(dict.fromkeys(tipo for _, tipo in engine.MESSAGGI_DECISIONE.values()))
+
+# Risultati sommati per gruppo (campi omonimi di SimulationResult e AggregatoStorico)
+CAMPI_SOMMATI = (
+    'volume_siero',
+    'kg_proteine',
+    'ricavi_impianto',
+    'costi_impianto',
+    'margine_impianto',
+    'ricavi_siero',
+    'costi_siero',
+    'margine_siero',
+    'differenza_margine',
+)
+
+CHIAVE_GRUPPO = ('mese', 'esito', 'fascia_volume')
+CAMPI_GRUPPO = (*CHIAVE_GRUPPO, 'conteggio', 'impianto_conveniente', *CAMPI_SOMMATI)
+
+# Raggruppamenti delle serie: parametro `per` -> campo di AggregatoStorico
+RAGGRUPPAMENTI = {'mese': 'mese', 'esito': 'esito', 'volume': 'fascia_volume'}
+VALORI = ('media', 'somma')
+
+
+def fascia(volume):
+    """Indice della fascia di volume (in FASCE_VOLUME) di un volume di siero"""
+    return max(bisect.bisect_right(FASCE_VOLUME, volume) - 1, 0)
+
+
+def etichetta_fascia(indice):
+    minimo = FASCE_VOLUME[indice]
+    if indice + 1 == len(FASCE_VOLUME):
+        return f"≥ {minimo:,} L".replace(',', '.')
+    return f"{minimo:,}–{FASCE_VOLUME[indice + 1]:,} L".replace(',', '.')
+
+
+def _mese(created_at):
+    # Mese nel fuso orario del progetto, come TruncMonth in `ricostruisci`
+    return timezone.localtime(created_at).date().replace(day=1)
+
+
+def _gruppi(risultati, segno):
+    """Righe delta (tuple nell'ordine di CAMPI_GRUPPO) per un insieme di risultati"""
+    gruppi = {}
+    for risultato in risultati:
+        chiave = (_mese(risultato.created_at), risultato.tipo_messaggio, fascia(risultato.volume_siero))
+        somme = gruppi.get(chiave)
+        if somme is None:
+            somme = gruppi[chiave] = [0] * (2 + len(CAMPI_SOMMATI))
+        somme[0] += segno
+        somme[1] += segno if risultato.differenza_margine > 0 else 0
+        for i, campo in enumerate(CAMPI_SOMMATI, start=2):
+            somme[i] += segno * getattr(risultato, campo)
+    return [(*chiave, *somme) for chiave, somme in gruppi.items()]
+
+
+def _sql_incremento():
+    """INSERT ... ON CONFLICT DO UPDATE che somma i delta ai gruppi esistenti"""
+    opzioni = AggregatoStorico._meta
+    tabella = connection.ops.quote_name(opzioni.db_table)
+    colonna = {campo: connection.ops.quote_name(opzioni.get_field(campo).column) for campo in CAMPI_GRUPPO}
+    incrementi = ', '.join(
+        f"{colonna[campo]} = {tabella}.{colonna[campo]} + excluded.{colonna[campo]}"
+        for campo in CAMPI_GRUPPO if campo not in CHIAVE_GRUPPO
+    )
+    return (
+        f"INSERT INTO {tabella} ({', '.join(colonna.values())}) "
+        f"VALUES ({', '.join(['%s'] * len(CAMPI_GRUPPO))}) "
+        f"ON CONFLICT ({', '.join(colonna[campo] for campo in CHIAVE_GRUPPO)}) DO UPDATE SET {incrementi}"
+    )
+
+
+def _applica(righe):
+    if not righe:
+        return
+    with transaction.atomic():
+        if connection.vendor in ('sqlite', 'postgresql'):
+            adatta_data = connection.ops.adapt_datefield_value
+            with connection.cursor() as cursore:
+                cursore.executemany(
+                    _sql_incremento(), [(adatta_data(riga[0]), *riga[1:]) for riga in righe]
+                )
+        else:
+            for riga in righe:
+                valori = dict(zip(CAMPI_GRUPPO, riga))
+                chiave = {campo: valori.pop(campo) for campo in CHIAVE_GRUPPO}
+                gruppo = AggregatoStorico.objects.select_for_update().filter(**chiave)
+                if not gruppo.update(**{campo: F(campo) + valore for campo, valore in valori.items()}):
+                    AggregatoStorico.objects.create(**chiave, **valori)
+        # Gruppi svuotati dalle eliminazioni
+        if any(riga[3] < 0 for riga in righe):
+            AggregatoStorico.objects.filter(conteggio__lte=0).delete()
+
+
+def aggiungi(risultati):
+    """Somma agli aggregati dei SimulationResult appena salvati"""
+    _applica(_gruppi(risultati, 1))
+
+
+def rimuovi(risultati):
+    """Sottrae dagli aggregati dei SimulationResult eliminati"""
+    _applica(_gruppi(risultati, -1))
+
+
+# Eliminazioni in corso in `elimina` (per thread): il ricevitore non sottrae di nuovo
+_in_eliminazione = threading.local()
+
+
+def su_eliminazione(sender, instance, **kwargs):
+    """Ricevitore post_delete di SimulationResult"""
+    if not getattr(_in_eliminazione, 'attiva', False):
+        rimuovi([instance])
+
+
+def _espressione_fascia():
+    return Case(
+        *(When(volume_siero__gte=minimo, then=Value(indice)) for indice, minimo in reversed(list(enumerate(FASCE_VOLUME)))),
+        default=Value(0),
+    )
+
+
+def _somme(risultati):
+    """GROUP BY per mese, esito e fascia di un queryset di risultati"""
+    return (
+        risultati
+        .annotate(
+            mese=TruncMonth('created_at', output_field=DateField()),
+            esito=F('tipo_messaggio'),
+            fascia_volume=_espressione_fascia(),
+        )
+        .values(*CHIAVE_GRUPPO)
+        .annotate(
+            conteggio=Count('id'),
+            impianto_conveniente=Count('id', filter=Q(differenza_margine__gt=0)),
+            **{f'somma_{campo}': Sum(campo) for campo in CAMPI_SOMMATI},
+        )
+        .order_by()
+    )
+
+
+def elimina(queryset):
+    """
+    Elimina un queryset di SimulationInput o di SimulationResult (usato dalle
+    azioni di eliminazione dell'admin). I delta sono calcolati con un GROUP BY
+    e sottratti con un solo upsert, nella stessa transazione della DELETE,
+    invece di uno per risultato dal segnale post_delete. Restituisce il
+    valore di QuerySet.delete().
+    """
+    if queryset.model is SimulationResult:
+        risultati = queryset
+    else:
+        risultati = SimulationResult.objects.filter(simulazione__in=queryset)
+    with transaction.atomic():
+        righe = [
+            (
+                *(gruppo[campo] for campo in CHIAVE_GRUPPO),
+                -gruppo['conteggio'],
+                -gruppo['impianto_conveniente'],
+                *(-gruppo[f'somma_{campo}'] for campo in CAMPI_SOMMATI),
+            )
+            for gruppo in _somme(risultati)
+        ]
+        _in_eliminazione.attiva = True
+        try:
+            eliminati = queryset.delete()
+        finally:
+            _in_eliminazione.attiva = False
+        _applica(righe)
+    return eliminati
+
+
+def ricostruisci(modello_risultati=SimulationResult, modello_aggregati=AggregatoStorico):
+    """
+    Ricalcola da zero gli aggregati con un GROUP BY sul database (usato dalla
+    migrazione iniziale e dal comando `ricalcola_aggregati`). I modelli sono
+    parametri per poter usare quelli storici delle migrazioni. Restituisce
+    il numero di gruppi.
+    """
+    aggregati = [
+        modello_aggregati(
+            **{campo: gruppo[campo] for campo in (*CHIAVE_GRUPPO, 'conteggio', 'impianto_conveniente')},
+            **{campo: gruppo[f'somma_{campo}'] for campo in CAMPI_SOMMATI},
+        )
+        for gruppo in _somme(modello_risultati.objects.all())
+    ]
+    with transaction.atomic():
+        modello_aggregati.objects.all().delete()
+        modello_aggregati.objects.bulk_create(aggregati, batch_size=500)
+    return len(aggregati)
+
+
+def _mese_parametro(valore, nome):
+    try:
+        return datetime.date.fromisoformat(f"{valore}-01")
+    except ValueError:
+        raise ValueError(f"{nome} deve essere un mese AAAA-MM")
+
+
+def _etichetta(per, chiave):
+    if per == 'mese':
+        return f"{chiave:%Y-%m}"
+    if per == 'esito':
+        return ETICHETTE_ESITO.get(chiave, chiave)
+    return etichetta_fascia(chiave)
+
+
+def serie(per='mese', dal=None, al=None, valore='media'):
+    """
+    Serie dello storico raggruppate per `per` (mese, esito o volume), con
+    `dal` / `al` come mesi AAAA-MM inclusi. Per ogni gruppo: conteggio,
+    quota di simulazioni con impianto conveniente e la media (o la somma)
+    di ogni campo di CAMPI_SOMMATI. ValueError se un parametro non è valido.
+    """
+    if per not in RAGGRUPPAMENTI:
+        raise ValueError(f"per deve essere uno tra: {', '.join(RAGGRUPPAMENTI)}")
+    if valore not in VALORI:
+        raise ValueError(f"valore deve essere uno tra: {', '.join(VALORI)}")
+    campo = RAGGRUPPAMENTI[per]
+
+    queryset = AggregatoStorico.objects.all()
+    if dal:
+        queryset = queryset.filter(mese__gte=_mese_parametro(dal, 'dal'))
+    if al:
+        queryset = queryset.filter(mese__lte=_mese_parametro(al, 'al'))
+    gruppi = list(
+        queryset.values(campo)
+        .annotate(
+            totale=Sum('conteggio'),
+            convenienti=Sum('impianto_conveniente'),
+            **{f'somma_{nome}': Sum(nome) for nome in CAMPI_SOMMATI},
+        )
+        .filter(totale__gt=0)
+        .order_by(campo)
+    )
+    if per == 'esito':
+        gruppi.sort(key=lambda gruppo: ESITI.index(gruppo['esito']) if gruppo['esito'] in ESITI else len(ESITI))
+
+    conteggi = [gruppo['totale'] for gruppo in gruppi]
+    if valore == 'media':
+        valori = {
+            nome: [round(gruppo[f'somma_{nome}'] / gruppo['totale'], 2) for gruppo in gruppi]
+            for nome in CAMPI_SOMMATI
+        }
+    else:
+        valori = {nome: [round(gruppo[f'somma_{nome}'], 2) for gruppo in gruppi] for nome in CAMPI_SOMMATI}
+
+    return {
+        'per': per,
+        'valore': valore,
+        'chiavi': [
+            f"{gruppo[campo]:%Y-%m}" if per == 'mese' else gruppo[campo] for gruppo in gruppi
+        ],
+        'etichette': [_etichetta(per, gruppo[campo]) for gruppo in gruppi],
+        'conteggio': conteggi,
+        'quota_impianto_conveniente': [
+            round(gruppo['convenienti'] / gruppo['totale'], 4) for gruppo in gruppi
+        ],
+        'serie': valori,
+    }
@@ -4,3 +4,18 @@ from django.apps import AppConfig
 class DashboardConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dashboard'
+
+    def ready(self):
+        from django.core import checks
+        from django.db.models.signals import post_delete, post_save
+
+        from . import aggregati, profili, statici
+        from .models import ProfiloCosti, SimulationResult
+
+        # Modifiche ai profili di costo: la cache del processo va riletta
+        post_save.connect(profili.invalida, sender=ProfiloCosti, dispatch_uid='profili_costi_salvati')
+        post_delete.connect(profili.invalida, sender=ProfiloCosti, dispatch_uid='profili_costi_eliminati')
+        # Simulazioni eliminate: i loro risultati escono dagli aggregati dello storico
+        post_delete.connect(aggregati.su_eliminazione, sender=SimulationResult, dispatch_uid='aggregati_storico')
+        # File statici: manifest di collectstatic richiesto in produzione (check --deploy)
+        checks.register(statici.controlla_manifest, checks.Tags.staticfiles, deploy=True)
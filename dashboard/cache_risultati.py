@@ -0,0 +1,89 @@
+"""
+Cache dei risultati della dashboard.
+
+La chiave è costruita sugli input numerici canonicalizzati (10000, "10000.0"
+e "10000,00" sono lo stesso scenario) più una versione delle costanti di
+costo del motore, così una modifica dei valori fissi invalida le voci
+esistenti. Il valore è il JSON già serializzato della risposta.
+
+Il backend è l'alias Django `DASHBOARD_CACHE_ALIAS` (di default una
+LocMemCache LRU con TTL e numero massimo di voci, vedi settings).
+"""
+import hashlib
+import json
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import engine
+from .models import soglie_decisionali
+
+
+def _versione_costi():
+    costanti = dict(
+        engine.VALORI_FISSI,
+        costi_extra=engine.COSTI_EXTRA_IMPIANTO,
+        anni_ammortamento=engine.ANNI_AMMORTAMENTO,
+        anni_trend=engine.ANNI_TREND,
+        prezzo_siero_default=engine.PREZZO_SIERO_DEFAULT,
+        **soglie_decisionali()
+    )
+    testo = json.dumps(costanti, sort_keys=True)
+    return hashlib.sha1(testo.encode()).hexdigest()[:12]
+
+
+VERSIONE_COSTI = _versione_costi()
+
+_lock = threading.Lock()
+_contatori = {'hits': 0, 'misses': 0, 'scritture': 0}
+
+
+def _cache():
+    return caches[getattr(settings, 'DASHBOARD_CACHE_ALIAS', 'default')]
+
+
+def _incrementa(nome):
+    with _lock:
+        _contatori[nome] += 1
+
+
+def chiave(input_data):
+    """Chiave di cache per un dizionario `input_data` già validato"""
+    parti = []
+    for campo in sorted(input_data):
+        valore = input_data[campo]
+        if isinstance(valore, (int, float)):
+            valore = repr(float(valore))
+        parti.append(f"{campo}={valore}")
+    impronta = hashlib.sha1('&'.join(parti).encode()).hexdigest()
+    return f"simulazione:{VERSIONE_COSTI}:{impronta}"
+
+
+def leggi(input_data):
+    """Restituisce i byte JSON memorizzati per lo scenario, o None"""
+    contenuto = _cache().get(chiave(input_data))
+    _incrementa('hits' if contenuto is not None else 'misses')
+    return contenuto
+
+
+def scrivi(input_data, contenuto):
+    """Memorizza i byte JSON della risposta per lo scenario"""
+    _cache().set(chiave(input_data), contenuto)
+    _incrementa('scritture')
+
+
+def statistiche():
+    """Contatori del processo corrente per il monitoraggio"""
+    with _lock:
+        valori = dict(_contatori)
+    richieste = valori['hits'] + valori['misses']
+    valori['hit_ratio'] = round(valori['hits'] / richieste, 4) if richieste else None
+    valori['versione_costi'] = VERSIONE_COSTI
+    return valori
+
+
+def azzera_statistiche():
+    with _lock:
+        for nome in _contatori:
+            _contatori[nome] = 0
@@ -0,0 +1,128 @@
+"""
+Motore di calcolo degli scenari impianto / vendita siero.
+
+Unica definizione delle formule usate da view, modello e script di test;
+non dipende da Django e lavora su array NumPy. Per la singola simulazione
+`grafo` ne descrive le dipendenze e le ricalcola in modo incrementale.
+"""
+from .core import (
+    ANNI_AMMORTAMENTO,
+    ANNI_TREND,
+    CAMPI_NUMERICI,
+    COSTI_EXTRA_IMPIANTO,
+    COSTI_OPERATIVI_ANNUI,
+    COSTO_DISTRIBUZIONE,
+    COSTO_IMPIANTO,
+    PARAMETRI_SCENARI,
+    PREZZO_SIERO_DEFAULT,
+    PREZZO_VENDITA_PROTEINE,
+    PREZZO_VENDITA_SIERO,
+    RESA_PROTEINE,
+    VALORI_FISSI,
+    ammortamento,
+    as_array,
+    budget_rimanente,
+    calcola_scenari,
+    distribuzione_costi,
+    scenario_impianto,
+    scenario_siero,
+    trend,
+)
+from .decisione import (
+    CODICI_DECISIONE,
+    MESSAGGI_DECISIONE,
+    REGOLE_DECISIONE,
+    SOGLIA_BUDGET,
+    SOGLIA_SPAZIO,
+    classifica,
+    messaggi_decisionali,
+    messaggio_decisionale,
+)
+from .grafo import A_VALLE, INGRESSI, NODI, Valutatore
+from .montecarlo import PARAMETRI_ALEATORI, TIPI_DISTRIBUZIONE, simula_montecarlo
+from .proiezione import (
+    ORIZZONTE_MAX,
+    PARAMETRI_PROIEZIONE,
+    PROIEZIONE_DEFAULT,
+    proietta_flussi,
+    tir,
+)
+from .solver import PARAMETRI_SOLVER, risolvi_pareggio
+from .sweep import (
+    CAMPI_DECISIONE_TESTO,
+    METRICA_DECISIONE,
+    METRICHE_SWEEP,
+    PARAMETRI_SWEEP,
+    asse,
+    assi_griglia,
+    griglia_sensibilita,
+)
+from .payload import (
+    SEZIONI,
+    investimento_info,
+    proiezione_data,
+    proietta_input,
+    richiede_proiezione,
+    simulation_data,
+    simulazioni_batch,
+)
+
+__all__ = [
+    'A_VALLE',
+    'ANNI_AMMORTAMENTO',
+    'ANNI_TREND',
+    'CAMPI_DECISIONE_TESTO',
+    'CAMPI_NUMERICI',
+    'CODICI_DECISIONE',
+    'COSTI_EXTRA_IMPIANTO',
+    'COSTI_OPERATIVI_ANNUI',
+    'COSTO_DISTRIBUZIONE',
+    'COSTO_IMPIANTO',
+    'INGRESSI',
+    'MESSAGGI_DECISIONE',
+    'METRICA_DECISIONE',
+    'METRICHE_SWEEP',
+    'NODI',
+    'ORIZZONTE_MAX',
+    'PARAMETRI_ALEATORI',
+    'PARAMETRI_PROIEZIONE',
+    'PARAMETRI_SCENARI',
+    'PARAMETRI_SOLVER',
+    'PARAMETRI_SWEEP',
+    'PREZZO_SIERO_DEFAULT',
+    'PREZZO_VENDITA_PROTEINE',
+    'PREZZO_VENDITA_SIERO',
+    'PROIEZIONE_DEFAULT',
+    'REGOLE_DECISIONE',
+    'RESA_PROTEINE',
+    'SEZIONI',
+    'SOGLIA_BUDGET',
+    'SOGLIA_SPAZIO',
+    'TIPI_DISTRIBUZIONE',
+    'VALORI_FISSI',
+    'Valutatore',
+    'ammortamento',
+    'as_array',
+    'asse',
+    'assi_griglia',
+    'budget_rimanente',
+    'calcola_scenari',
+    'classifica',
+    'distribuzione_costi',
+    'griglia_sensibilita',
+    'investimento_info',
+    'messaggi_decisionali',
+    'messaggio_decisionale',
+    'proietta_flussi',
+    'proietta_input',
+    'proiezione_data',
+    'richiede_proiezione',
+    'risolvi_pareggio',
+    'scenario_impianto',
+    'scenario_siero',
+    'simula_montecarlo',
+    'simulation_data',
+    'simulazioni_batch',
+    'tir',
+    'trend',
+]
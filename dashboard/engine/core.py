@@ -0,0 +1,179 @@
+"""
+Calcoli vettoriali degli scenari impianto / vendita siero.
+
+Tutte le funzioni accettano scalari o array NumPy (anche di forme diverse,
+purché compatibili per broadcasting) e restituiscono array float64: una sola
+chiamata valuta migliaia di scenari.
+"""
+import numpy as np
+
+# Parametri fissi del settore (vedi README - "Valori Predefiniti")
+COSTO_IMPIANTO = 1000000.0
+COSTI_OPERATIVI_ANNUI = 800000.0
+PREZZO_VENDITA_PROTEINE = 50.0
+RESA_PROTEINE = 0.05  # kg/L (50g/L)
+PREZZO_VENDITA_SIERO = 0.18
+COSTO_DISTRIBUZIONE = 15000.0
+COSTI_EXTRA_IMPIANTO = 900000.0  # Costi aggiuntivi annui dello scenario impianto in dashboard
+PREZZO_SIERO_DEFAULT = 0.5  # Usato se il prezzo del siero non è valorizzato
+ANNI_AMMORTAMENTO = 10
+ANNI_TREND = 5
+
+VALORI_FISSI = {
+    'costo_impianto': COSTO_IMPIANTO,
+    'costi_operativi_annui': COSTI_OPERATIVI_ANNUI,
+    'prezzo_vendita_proteine': PREZZO_VENDITA_PROTEINE,
+    'resa_proteine': RESA_PROTEINE,
+    'prezzo_vendita_siero': PREZZO_VENDITA_SIERO,
+    'costo_distribuzione': COSTO_DISTRIBUZIONE,
+}
+
+# Parametri numerici di `calcola_scenari` (nomi dei campi di SimulationInput)
+CAMPI_NUMERICI = (
+    'volume_siero',
+    'capacita_investimento',
+    'costo_impianto',
+    'costi_operativi_annui',
+    'prezzo_vendita_proteine',
+    'resa_proteine',
+    'prezzo_vendita_siero',
+    'costo_distribuzione',
+)
+
+
+# Argomenti di calcola_scenari: campi numerici più i costi extra del profilo
+PARAMETRI_SCENARI = (*CAMPI_NUMERICI, 'costi_extra')
+
+
+def as_array(valore):
+    """Converte scalari, liste o Decimal in un array float64"""
+    if isinstance(valore, np.ndarray) and valore.dtype == np.float64:
+        return valore
+    return np.asarray(valore, dtype=np.float64)
+
+
+def ammortamento(costo_impianto, anni_ammortamento=ANNI_AMMORTAMENTO):
+    """Quota annua di ammortamento lineare dell'impianto"""
+    return as_array(costo_impianto) / anni_ammortamento
+
+
+def scenario_impianto(volume_siero, resa_proteine, prezzo_vendita_proteine,
+                      costo_impianto, costi_operativi_annui,
+                      costo_distribuzione=0.0, costi_extra=0.0,
+                      anni_ammortamento=ANNI_AMMORTAMENTO):
+    """Calcola lo scenario acquisto impianto (ammortamento lineare)"""
+    volume = as_array(volume_siero)
+    costo = as_array(costo_impianto)
+
+    kg_proteine = volume * as_array(resa_proteine)
+    ricavi = kg_proteine * as_array(prezzo_vendita_proteine)
+
+    quota_ammortamento = ammortamento(costo, anni_ammortamento)
+    costi = (quota_ammortamento + as_array(costi_operativi_annui)
+             + as_array(costo_distribuzione) + as_array(costi_extra))
+    margine = ricavi - costi
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        roi = np.where(costo > 0, margine / costo * 100, 0.0)
+        # Payback solo con margine positivo, altrimenti NaN
+        payback = np.where(margine > 0, costo / margine, np.nan)
+
+    return {
+        'kg_proteine': kg_proteine,
+        'ricavi': ricavi,
+        'ammortamento': np.broadcast_to(quota_ammortamento, ricavi.shape),
+        'costi': costi,
+        'margine_netto': margine,
+        'roi': roi,
+        'payback_years': payback,
+    }
+
+
+def scenario_siero(volume_siero, prezzo_vendita_siero, costo_distribuzione=0.0,
+                   quota_costi_vendita=0.0):
+    """Calcola lo scenario vendita diretta del siero (nessun investimento)"""
+    ricavi = as_array(volume_siero) * as_array(prezzo_vendita_siero)
+    costi = as_array(costo_distribuzione) + ricavi * quota_costi_vendita
+    costi = np.broadcast_to(costi, ricavi.shape)
+    margine = ricavi - costi
+
+    return {
+        'ricavi': ricavi,
+        'costi': costi,
+        'margine_netto': margine,
+        'roi': np.zeros_like(ricavi),
+    }
+
+
+def distribuzione_costi(quota_ammortamento, costi_operativi_annui, costo_distribuzione):
+    """Voci di costo annue dello scenario impianto mostrate nel grafico a torta"""
+    operativi = as_array(costi_operativi_annui)
+    distribuzione = as_array(costo_distribuzione)
+    return {
+        'ammortamento': quota_ammortamento,
+        'operativi': operativi,
+        'distribuzione': distribuzione,
+        'totale': quota_ammortamento + operativi + distribuzione,
+    }
+
+
+def budget_rimanente(capacita_investimento, costo_impianto, costi_operativi_annui, costo_distribuzione):
+    """Capacità di investimento residua dopo impianto, primo anno di gestione e distribuzione"""
+    return (as_array(capacita_investimento) - as_array(costo_impianto)
+            - as_array(costi_operativi_annui) - as_array(costo_distribuzione))
+
+
+def trend(valori, anni=ANNI_TREND):
+    """Valori cumulati anno per anno: forma (..., anni)"""
+    return as_array(valori)[..., np.newaxis] * np.arange(1, anni + 1, dtype=np.float64)
+
+
+def calcola_scenari(volume_siero, capacita_investimento=0.0,
+                    costo_impianto=COSTO_IMPIANTO,
+                    costi_operativi_annui=COSTI_OPERATIVI_ANNUI,
+                    prezzo_vendita_proteine=PREZZO_VENDITA_PROTEINE,
+                    resa_proteine=RESA_PROTEINE,
+                    prezzo_vendita_siero=PREZZO_VENDITA_SIERO,
+                    costo_distribuzione=COSTO_DISTRIBUZIONE,
+                    costi_extra=COSTI_EXTRA_IMPIANTO):
+    """
+    Valuta entrambi gli scenari della dashboard su array di input.
+
+    Restituisce un dizionario di array (tutti con la forma di broadcast
+    degli input) con gli scenari, la comparazione e i KPI derivati.
+    """
+    volume = as_array(volume_siero)
+    prezzo_siero = as_array(prezzo_vendita_siero)
+    prezzo_siero = np.where(prezzo_siero > 0, prezzo_siero, PREZZO_SIERO_DEFAULT)
+
+    impianto = scenario_impianto(
+        volume, resa_proteine, prezzo_vendita_proteine, costo_impianto,
+        costi_operativi_annui, costo_distribuzione, costi_extra,
+    )
+    siero = scenario_siero(volume, prezzo_siero, costo_distribuzione)
+
+    capacita = as_array(capacita_investimento)
+    forma = np.broadcast_shapes(impianto['margine_netto'].shape, siero['margine_netto'].shape,
+                                capacita.shape)
+    capacita = np.broadcast_to(capacita, forma)
+    costo = np.broadcast_to(as_array(costo_impianto), forma)
+    operativi = np.broadcast_to(as_array(costi_operativi_annui), forma)
+    distribuzione = np.broadcast_to(as_array(costo_distribuzione), forma)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        valore_aggiunto = (impianto['ricavi'] - siero['ricavi']) / volume
+
+    return {
+        'impianto': impianto,
+        'siero': siero,
+        'comparazione': {
+            'differenza_ricavi': impianto['ricavi'] - siero['ricavi'],
+            'differenza_costi': impianto['costi'] - siero['costi'],
+            'differenza_margine': impianto['margine_netto'] - siero['margine_netto'],
+        },
+        'distribuzione_costi': distribuzione_costi(impianto['ammortamento'], operativi, distribuzione),
+        'valore_aggiunto_per_litro': valore_aggiunto,
+        'capacita_investimento': capacita,
+        'costo_impianto': costo,
+        'budget_rimanente': budget_rimanente(capacita, costo, operativi, distribuzione),
+    }
@@ -0,0 +1,136 @@
+"""
+Logica decisionale: raccomandazione impianto / vendita siero in base a
+budget rimanente, tempistiche, spazio e personale.
+
+Le regole sono una tabella dichiarativa valutata in ordine (vince la prima
+soddisfatta) su array di input: `classifica` restituisce i codici dei
+messaggi per milioni di righe in un passaggio, i testi vengono risolti solo
+alla fine. Le soglie sono parametri (default SOGLIA_BUDGET / SOGLIA_SPAZIO).
+"""
+from functools import reduce
+
+import numpy as np
+
+from .core import as_array
+
+SOGLIA_BUDGET = 500000
+SOGLIA_SPAZIO = 50
+
+# Codici dei messaggi: l'indice in CODICI_DECISIONE è il valore restituito da `classifica`
+MESSAGGI_DECISIONE = {
+    'impianto': (
+        "È possibile acquistare l'impianto per ricavare le proteine dal siero del latte",
+        'success',
+    ),
+    'impianto_assumere_personale': (
+        "È possibile acquistare l'impianto per ricavare le proteine dal siero del latte, tuttavia, è necessario assumere del personale per gestire l'impianto",
+        'warning',
+    ),
+    'impianto_acquistare_spazi': (
+        "È possibile acquistare l'impianto per ricavare le proteine dal siero del latte, tuttavia, è necessario acquistare nuovi spazi per installare l'impianto",
+        'warning',
+    ),
+    'impianto_personale_e_spazi': (
+        "È possibile acquistare l'impianto per ricavare le proteine dal siero del latte, tuttavia, è necessario assumere del personale per gestire l'impianto e acquistare nuovi spazi per la sua installazione",
+        'warning',
+    ),
+    'vendita_siero': (
+        "È consigliabile vendere direttamente il siero del latte a chi è dotato dell'impianto",
+        'info',
+    ),
+}
+CODICI_DECISIONE = tuple(MESSAGGI_DECISIONE)
+
+# Tabella delle regole: (codice, condizioni da soddisfare tutte), in ordine di priorità
+REGOLE_DECISIONE = (
+    ('impianto', ('budget_sufficiente', 'tempi_compatibili', 'spazio_sufficiente', 'personale_disponibile')),
+    ('impianto_assumere_personale', ('budget_sufficiente', 'tempi_compatibili', 'spazio_sufficiente', 'personale_assente')),
+    ('impianto_acquistare_spazi', ('budget_sufficiente', 'tempi_compatibili', 'spazio_insufficiente', 'personale_disponibile')),
+    ('impianto_personale_e_spazi', ('budget_sufficiente', 'tempi_compatibili', 'spazio_insufficiente', 'personale_assente')),
+)
+CODICE_PREDEFINITO = 'vendita_siero'
+
+
+def _condizioni(budget_rimanente, tempistiche, spazio, personale, soglia_budget, soglia_spazio):
+    """Condizioni elementari delle regole (scalari o array booleani)"""
+    return {
+        'budget_sufficiente': budget_rimanente >= soglia_budget,
+        'tempi_compatibili': tempistiche != 'breve',
+        'spazio_sufficiente': spazio >= soglia_spazio,
+        # Come nella logica originale: a parità di soglia prevale lo spazio sufficiente
+        'spazio_insufficiente': spazio <= soglia_spazio,
+        'personale_disponibile': personale == 'Si',
+        'personale_assente': personale == 'No',
+    }
+
+
+def classifica(budget_rimanente, tempistiche, spazio, personale,
+               soglia_budget=SOGLIA_BUDGET, soglia_spazio=SOGLIA_SPAZIO):
+    """
+    Codici decisionali (indici in CODICI_DECISIONE, array int8) per array di
+    input compatibili per broadcasting. Tempistiche e personale sono stringhe
+    ('' se non valorizzati), spazio e budget numerici.
+    """
+    condizioni = _condizioni(as_array(budget_rimanente), np.asarray(tempistiche, dtype=str),
+                             as_array(spazio), np.asarray(personale, dtype=str),
+                             soglia_budget, soglia_spazio)
+    scelte = [reduce(np.logical_and, (condizioni[nome] for nome in richieste))
+              for _, richieste in REGOLE_DECISIONE]
+    forma = np.broadcast_shapes(*(valori.shape for valori in condizioni.values()))
+    return np.select(
+        [np.broadcast_to(scelta, forma) for scelta in scelte],
+        [CODICI_DECISIONE.index(codice) for codice, _ in REGOLE_DECISIONE],
+        default=CODICI_DECISIONE.index(CODICE_PREDEFINITO),
+    ).astype(np.int8)
+
+
+def _messaggio(codice, budget_rimanente, tempistiche, spazio, personale):
+    messaggio, tipo_messaggio = MESSAGGI_DECISIONE[CODICI_DECISIONE[codice]]
+    return {
+        'messaggio': messaggio,
+        'tipo_messaggio': tipo_messaggio,
+        'budget_rimanente': budget_rimanente,
+        'dettagli': {
+            'budget_rimanente': budget_rimanente,
+            'tempistiche': tempistiche,
+            'spazio': spazio,
+            'personale': personale
+        }
+    }
+
+
+def messaggi_decisionali(budget_rimanente, tempistiche, spazio, personale,
+                         soglia_budget=SOGLIA_BUDGET, soglia_spazio=SOGLIA_SPAZIO):
+    """
+    Versione a righe di `messaggio_decisionale`: liste (o array 1D) della
+    stessa lunghezza, una sola classificazione vettoriale per tutte.
+    """
+    tempistiche = [valore or '' for valore in tempistiche]
+    spazio = [float(valore or 0) for valore in spazio]
+    personale = [valore or '' for valore in personale]
+    budget_rimanente = [float(valore) for valore in budget_rimanente]
+    codici = classifica(budget_rimanente, tempistiche, spazio, personale,
+                        soglia_budget, soglia_spazio).tolist()
+    return [
+        _messaggio(*riga) for riga in zip(codici, budget_rimanente, tempistiche, spazio, personale)
+    ]
+
+
+def messaggio_decisionale(budget_rimanente, tempistiche, spazio, personale,
+                          soglia_budget=SOGLIA_BUDGET, soglia_spazio=SOGLIA_SPAZIO):
+    """Calcola il messaggio decisionale basato sui parametri di input"""
+    tempistiche_value = tempistiche or ''
+    spazio_value = float(spazio or 0)
+    personale_value = personale or ''
+    budget_rimanente = float(budget_rimanente)
+
+    # Stessa tabella di `classifica`, valutata su scalari senza passare da NumPy
+    condizioni = _condizioni(budget_rimanente, tempistiche_value, spazio_value, personale_value,
+                             soglia_budget, soglia_spazio)
+    codice = next(
+        (codice for codice, richieste in REGOLE_DECISIONE
+         if all(condizioni[nome] for nome in richieste)),
+        CODICE_PREDEFINITO,
+    )
+    return _messaggio(CODICI_DECISIONE.index(codice), budget_rimanente,
+                      tempistiche_value, spazio_value, personale_value)
@@ -0,0 +1,216 @@
+"""
+Grafo delle dipendenze delle grandezze derivate di una simulazione.
+
+Ogni nodo di NODI è una grandezza calcolata (scenari, budget rimanente,
+messaggio decisionale, sezioni del payload) con gli ingressi o i nodi da
+cui dipende e la funzione che la calcola: la tabella è la definizione unica
+e ispezionabile delle formule della singola simulazione, costruita sulle
+stesse funzioni di `core`, `decisione` e `payload` usate dal calcolo
+vettoriale dei batch.
+
+`Valutatore` calcola i nodi su richiesta e ne ricorda i valori; `aggiorna`
+cambia solo gli ingressi modificati e scarta i soli nodi a valle (A_VALLE):
+spostare lo spazio disponibile ricalcola il messaggio decisionale e nulla
+del resto.
+"""
+from .core import (
+    COSTI_EXTRA_IMPIANTO,
+    PREZZO_SIERO_DEFAULT,
+    VALORI_FISSI,
+    ammortamento,
+    budget_rimanente,
+    distribuzione_costi,
+    scenario_impianto,
+    scenario_siero,
+)
+from .decisione import SOGLIA_BUDGET, SOGLIA_SPAZIO, messaggio_decisionale
+from .payload import (
+    SEZIONI,
+    investimento_info,
+    proiezione_data,
+    proietta_input,
+    sezione_comparazione,
+    sezione_defaults_used,
+    sezione_distribuzione_costi,
+    sezione_kpi,
+    sezione_scenario_impianto,
+    sezione_scenario_siero,
+    sezione_trend,
+    sezione_user_scenario_type,
+)
+from .proiezione import PARAMETRI_PROIEZIONE
+
+# Ingressi del grafo (campi di `input_data` e soglie) con il valore usato se assenti
+INGRESSI_PREDEFINITI = dict(
+    VALORI_FISSI,
+    capacita_investimento=0.0,
+    costi_extra=COSTI_EXTRA_IMPIANTO,
+    tempistiche='',
+    spazio_disponibile=0.0,
+    personale_disponibile='',
+    soglia_budget=SOGLIA_BUDGET,
+    soglia_spazio=SOGLIA_SPAZIO,
+    **dict.fromkeys(PARAMETRI_PROIEZIONE),
+)
+INGRESSI = ('volume_siero', *INGRESSI_PREDEFINITI)
+
+_CAMPI_PROIEZIONE = ('volume_siero', *VALORI_FISSI, 'costi_extra', *PARAMETRI_PROIEZIONE)
+
+
+def _prezzo_siero_effettivo(prezzo_vendita_siero):
+    # Come `calcola_scenari`: prezzo non valorizzato -> PREZZO_SIERO_DEFAULT
+    return prezzo_vendita_siero if prezzo_vendita_siero > 0 else PREZZO_SIERO_DEFAULT
+
+
+def _voci_costo(costo_impianto, costi_operativi_annui, costo_distribuzione):
+    return distribuzione_costi(ammortamento(costo_impianto), costi_operativi_annui, costo_distribuzione)
+
+
+def _proiezione(*valori):
+    # Solo se è indicato almeno un parametro della proiezione pluriennale
+    dati = {campo: valore for campo, valore in zip(_CAMPI_PROIEZIONE, valori) if valore is not None}
+    if not any(campo in dati for campo in PARAMETRI_PROIEZIONE):
+        return None
+    return proiezione_data(proietta_input([dati]), 0)
+
+
+# Nodo -> (dipendenze, funzione); la funzione riceve i valori delle dipendenze in ordine
+NODI = {
+    # Grandezze intermedie
+    'prezzo_siero_effettivo': (('prezzo_vendita_siero',), _prezzo_siero_effettivo),
+    'impianto': (
+        ('volume_siero', 'resa_proteine', 'prezzo_vendita_proteine', 'costo_impianto',
+         'costi_operativi_annui', 'costo_distribuzione', 'costi_extra'),
+        scenario_impianto,
+    ),
+    'siero': (('volume_siero', 'prezzo_siero_effettivo', 'costo_distribuzione'), scenario_siero),
+    'voci_costo': (('costo_impianto', 'costi_operativi_annui', 'costo_distribuzione'), _voci_costo),
+    'budget_rimanente': (
+        ('capacita_investimento', 'costo_impianto', 'costi_operativi_annui', 'costo_distribuzione'),
+        budget_rimanente,
+    ),
+    # Sezioni del payload
+    'user_scenario_type': (('prezzo_vendita_siero',), sezione_user_scenario_type),
+    'scenario_impianto': (('impianto',), sezione_scenario_impianto),
+    'scenario_siero': (('siero', 'prezzo_vendita_siero'), sezione_scenario_siero),
+    'defaults_used': (
+        ('prezzo_vendita_proteine', 'resa_proteine', 'prezzo_vendita_siero'), sezione_defaults_used,
+    ),
+    'investimento_info': (('capacita_investimento', 'costo_impianto'), investimento_info),
+    'messaggio_decisionale': (
+        ('budget_rimanente', 'tempistiche', 'spazio_disponibile', 'personale_disponibile',
+         'soglia_budget', 'soglia_spazio'),
+        messaggio_decisionale,
+    ),
+    'comparazione': (('scenario_impianto', 'scenario_siero'), sezione_comparazione),
+    'distribuzione_costi': (('voci_costo',), sezione_distribuzione_costi),
+    'kpi': (
+        ('scenario_impianto', 'scenario_siero', 'costo_impianto', 'resa_proteine', 'volume_siero'),
+        sezione_kpi,
+    ),
+    'proiezione': (_CAMPI_PROIEZIONE, _proiezione),
+    'trend_quinquennale': (('scenario_impianto', 'scenario_siero', 'proiezione'), sezione_trend),
+}
+
+_ASSENTE = object()
+_COSTANTI = {
+    'success': True,
+    'scenario_type': 'both',  # Mostra sempre entrambi per confronto
+}
+
+
+def _a_valle():
+    """Per ogni ingresso o nodo, l'insieme dei nodi che ne dipendono (anche indirettamente)"""
+    dipendenti = {nome: set() for nome in (*INGRESSI, *NODI)}
+    for nodo, (dipendenze, _) in NODI.items():
+        for dipendenza in dipendenze:
+            dipendenti[dipendenza].add(nodo)
+
+    a_valle = {}
+
+    def visita(nome):
+        if nome not in a_valle:
+            nodi = set()
+            for dipendente in dipendenti[nome]:
+                nodi.add(dipendente)
+                nodi |= visita(dipendente)
+            a_valle[nome] = frozenset(nodi)
+        return a_valle[nome]
+
+    for nome in dipendenti:
+        visita(nome)
+    return a_valle
+
+
+A_VALLE = _a_valle()
+
+
+class Valutatore:
+    """
+    Valuta i nodi di NODI per un input, ricordando i valori intermedi.
+
+    `input_data` è un dizionario nel formato della dashboard (campi di
+    SimulationInput, più `costi_extra` e i parametri della proiezione se
+    presenti); le soglie decisionali sono ingressi come gli altri.
+    """
+
+    def __init__(self, input_data, soglia_budget=SOGLIA_BUDGET, soglia_spazio=SOGLIA_SPAZIO):
+        self.input_data = {}
+        self.valutazioni = 0  # nodi calcolati (per ispezione e test)
+        self._valori = {}
+        self.aggiorna(input_data, soglia_budget, soglia_spazio)
+
+    def aggiorna(self, input_data, soglia_budget=SOGLIA_BUDGET, soglia_spazio=SOGLIA_SPAZIO):
+        """
+        Porta il valutatore su `input_data` e restituisce l'insieme dei nodi
+        da ricalcolare (più 'input_data' se l'eco dell'input è cambiata).
+        """
+        ingressi = dict(INGRESSI_PREDEFINITI, soglia_budget=soglia_budget, soglia_spazio=soglia_spazio)
+        ingressi.update((campo, input_data[campo]) for campo in INGRESSI if campo in input_data)
+
+        scartati = set()
+        for nome, valore in ingressi.items():
+            if nome not in self._valori or self._valori[nome] != valore:
+                scartati |= A_VALLE[nome]
+        for nodo in scartati:
+            self._valori.pop(nodo, None)
+        self._valori.update(ingressi)
+
+        if input_data != self.input_data:
+            scartati.add('input_data')
+            self.input_data = dict(input_data)
+        return scartati
+
+    def valore(self, nome):
+        """Valore di un ingresso o di un nodo, calcolato solo se non già noto"""
+        valori = self._valori
+        valore = valori.get(nome, _ASSENTE)
+        if valore is _ASSENTE:
+            dipendenze, funzione = NODI[nome]
+            valore = valori[nome] = funzione(*[
+                valori[dipendenza] if dipendenza in valori else self.valore(dipendenza)
+                for dipendenza in dipendenze
+            ])
+            self.valutazioni += 1
+        return valore
+
+    def sezione(self, nome):
+        if nome in _COSTANTI:
+            return _COSTANTI[nome]
+        if nome == 'input_data':
+            return dict(self.input_data)
+        return self.valore(nome)
+
+    def payload(self, sezioni=SEZIONI):
+        """
+        Payload della dashboard (lo stesso di `simulation_data`) limitato a
+        `sezioni`, nell'ordine di SEZIONI; 'proiezione' solo se richiesta
+        dall'input.
+        """
+        data = {}
+        for nome in SEZIONI:
+            if nome in sezioni:
+                valore = self.sezione(nome)
+                if valore is not None or nome != 'proiezione':
+                    data[nome] = valore
+        return data
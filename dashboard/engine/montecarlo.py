@@ -0,0 +1,211 @@
+"""
+Simulazione Monte Carlo del rischio: prezzi, resa e volume diventano
+distribuzioni e gli scenari vengono valutati su milioni di estrazioni.
+
+Le estrazioni sono elaborate a blocchi (vettoriali) e, su richiesta,
+distribuite su un pool di processi. Ogni blocco ha un proprio generatore
+derivato dal seed con `SeedSequence.spawn`, quindi il risultato dipende solo
+da seed, numero di estrazioni e dimensione dei blocchi, non dal numero di
+processi.
+
+Il pool è unico per processo (al massimo `MAX_PROCESSI` worker), creato al
+primo uso con il metodo di avvio `spawn`: richieste concorrenti non
+moltiplicano i processi e i worker non ereditano con `fork` thread e
+connessioni al database del server.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from .core import PARAMETRI_SCENARI, calcola_scenari
+
+# Parametri che possono essere descritti da una distribuzione
+PARAMETRI_ALEATORI = (
+    'volume_siero',
+    'prezzo_vendita_proteine',
+    'prezzo_vendita_siero',
+    'resa_proteine',
+)
+
+TIPI_DISTRIBUZIONE = ('costante', 'normale', 'uniforme', 'triangolare')
+
+PERCENTILI_DEFAULT = (5, 25, 50, 75, 95)
+DIMENSIONE_BLOCCO = 100000
+MAX_ESTRAZIONI = 5000000
+MAX_PROCESSI = 4
+
+_pool = None
+_lock_pool = threading.Lock()
+
+
+def valida_distribuzione(nome, distribuzione):
+    """Normalizza la descrizione di una distribuzione (ValueError se non valida)"""
+    if nome not in PARAMETRI_ALEATORI:
+        raise ValueError(f"Parametro non aleatorio: {nome}")
+    if not isinstance(distribuzione, dict):
+        return {'tipo': 'costante', 'valore': float(distribuzione)}
+
+    tipo = distribuzione.get('tipo', 'normale')
+    if tipo == 'costante':
+        return {'tipo': tipo, 'valore': float(distribuzione['valore'])}
+    if tipo == 'normale':
+        dev_std = float(distribuzione['dev_std'])
+        if dev_std < 0:
+            raise ValueError(f"{nome}: dev_std non può essere negativa")
+        return {'tipo': tipo, 'media': float(distribuzione['media']), 'dev_std': dev_std}
+    if tipo == 'uniforme':
+        minimo, massimo = float(distribuzione['min']), float(distribuzione['max'])
+        if massimo < minimo:
+            raise ValueError(f"{nome}: max deve essere maggiore o uguale a min")
+        return {'tipo': tipo, 'min': minimo, 'max': massimo}
+    if tipo == 'triangolare':
+        minimo, moda, massimo = (float(distribuzione[k]) for k in ('min', 'moda', 'max'))
+        if not minimo <= moda <= massimo or minimo == massimo:
+            raise ValueError(f"{nome}: richiesto min <= moda <= max con min < max")
+        return {'tipo': tipo, 'min': minimo, 'moda': moda, 'max': massimo}
+    raise ValueError(f"{nome}: tipo di distribuzione non valido ({tipo})")
+
+
+def _estrai(rng, distribuzione, n):
+    tipo = distribuzione['tipo']
+    if tipo == 'costante':
+        return np.full(n, distribuzione['valore'])
+    if tipo == 'normale':
+        valori = rng.normal(distribuzione['media'], distribuzione['dev_std'], n)
+    elif tipo == 'uniforme':
+        valori = rng.uniform(distribuzione['min'], distribuzione['max'], n)
+    else:
+        valori = rng.triangular(distribuzione['min'], distribuzione['moda'], distribuzione['max'], n)
+    # Prezzi, resa e volume non possono essere negativi
+    return np.maximum(valori, 0.0, out=valori)
+
+
+def _simula_blocco(argomenti):
+    """Valuta un blocco di estrazioni (eseguibile in un processo separato)"""
+    seed, n, distribuzioni, parametri = argomenti
+    rng = np.random.default_rng(seed)
+
+    valori = dict(parametri)
+    for nome in PARAMETRI_ALEATORI:
+        if nome in distribuzioni:
+            valori[nome] = _estrai(rng, distribuzioni[nome], n)
+
+    risultati = calcola_scenari(**valori)
+    impianto = risultati['impianto']
+    siero = risultati['siero']
+    forma = impianto['ricavi'].shape
+
+    return (
+        np.broadcast_to(impianto['margine_netto'], forma),
+        np.broadcast_to(impianto['roi'], forma),
+        # Payback non recuperabile: +inf, così resta in coda alle statistiche
+        np.where(np.isnan(impianto['payback_years']), np.inf, impianto['payback_years']),
+        np.broadcast_to(siero['margine_netto'], forma),
+    )
+
+
+def _simula_blocchi(blocchi):
+    """Valuta in sequenza un gruppo di blocchi (unità di lavoro del pool)"""
+    return [_simula_blocco(blocco) for blocco in blocchi]
+
+
+def _pool_processi():
+    """Pool di processi condiviso, creato al primo utilizzo"""
+    global _pool
+    with _lock_pool:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=min(MAX_PROCESSI, os.cpu_count() or 1),
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _pool
+
+
+def _in_parallelo(blocchi, processi):
+    """
+    Blocchi valutati nel pool, divisi a turno in `processi` gruppi così
+    che una richiesta non occupi più worker di quelli chiesti. Se il pool
+    si è guastato (worker terminato) viene ricreato alla richiesta successiva
+    e questa è calcolata nel processo corrente.
+    """
+    global _pool
+    gruppi = [blocchi[i::processi] for i in range(processi)]
+    pool = _pool_processi()
+    try:
+        parziali = list(pool.map(_simula_blocchi, gruppi))
+    except BrokenProcessPool:
+        with _lock_pool:
+            if _pool is pool:
+                _pool = None
+        return [_simula_blocco(blocco) for blocco in blocchi]
+    # Ordine originale dei blocchi: il gruppo i contiene i blocchi i, i + processi, ...
+    risultati = [None] * len(blocchi)
+    for i, gruppo in enumerate(parziali):
+        risultati[i::processi] = gruppo
+    return risultati
+
+
+def _statistiche(valori, percentili):
+    finiti = np.isfinite(valori)
+    livelli = np.percentile(valori, percentili, method='nearest')
+    return {
+        'media': float(valori[finiti].mean()) if finiti.any() else None,
+        'percentili': {
+            str(p): float(v) if np.isfinite(v) else None
+            for p, v in zip(percentili, livelli)
+        },
+    }
+
+
+def simula_montecarlo(distribuzioni, parametri=None, estrazioni=1000000, seed=None,
+                      processi=1, dimensione_blocco=DIMENSIONE_BLOCCO,
+                      percentili=PERCENTILI_DEFAULT):
+    """
+    Esegue la simulazione Monte Carlo degli scenari.
+
+    `distribuzioni` associa a ciascun parametro aleatorio una distribuzione
+    (vedi `valida_distribuzione`); `parametri` fornisce i valori fissi degli
+    altri campi. Restituisce medie e percentili di margine, ROI e payback
+    dell'impianto, del margine siero e la probabilità che l'impianto renda
+    più della vendita diretta del siero.
+    """
+    estrazioni = int(estrazioni)
+    if not 1 <= estrazioni <= MAX_ESTRAZIONI:
+        raise ValueError(f"Il numero di estrazioni deve essere tra 1 e {MAX_ESTRAZIONI}")
+
+    distribuzioni = {nome: valida_distribuzione(nome, d) for nome, d in distribuzioni.items()}
+    parametri = {campo: float(valore) for campo, valore in (parametri or {}).items()
+                 if campo in PARAMETRI_SCENARI and campo not in distribuzioni}
+    if 'volume_siero' not in distribuzioni and 'volume_siero' not in parametri:
+        raise ValueError("volume_siero è obbligatorio (come distribuzione o parametro)")
+
+    dimensioni = [dimensione_blocco] * (estrazioni // dimensione_blocco)
+    if estrazioni % dimensione_blocco:
+        dimensioni.append(estrazioni % dimensione_blocco)
+    semi = np.random.SeedSequence(seed).spawn(len(dimensioni))
+    blocchi = [(s, n, distribuzioni, parametri) for s, n in zip(semi, dimensioni)]
+
+    processi = max(1, min(int(processi), MAX_PROCESSI, os.cpu_count() or 1, len(blocchi)))
+    if processi > 1:
+        parziali = _in_parallelo(blocchi, processi)
+    else:
+        parziali = [_simula_blocco(blocco) for blocco in blocchi]
+
+    margine_impianto, roi, payback, margine_siero = (
+        np.concatenate(colonna) for colonna in zip(*parziali)
+    )
+
+    return {
+        'estrazioni': estrazioni,
+        'seed': seed,
+        'margine_impianto': _statistiche(margine_impianto, percentili),
+        'roi_impianto': _statistiche(roi, percentili),
+        'payback_years': _statistiche(payback, percentili),
+        'margine_siero': _statistiche(margine_siero, percentili),
+        'probabilita_impianto_migliore': float(np.mean(margine_impianto > margine_siero)),
+        'probabilita_margine_positivo': float(np.mean(margine_impianto > 0)),
+    }
@@ -0,0 +1,306 @@
+"""
+Costruzione del dizionario `simulation_data` restituito dalla dashboard
+a partire dai risultati vettoriali di `calcola_scenari`.
+"""
+import numpy as np
+
+from .core import ANNI_TREND, CAMPI_NUMERICI, COSTI_EXTRA_IMPIANTO, VALORI_FISSI, calcola_scenari
+from .decisione import SOGLIA_BUDGET, SOGLIA_SPAZIO, messaggi_decisionali
+from .proiezione import PARAMETRI_PROIEZIONE, PROIEZIONE_DEFAULT, proietta_flussi
+
+SOGLIA_INVESTIMENTO = 500000
+
+# Sezioni del payload nell'ordine della risposta ('input_data' è l'eco dell'input)
+SEZIONI = (
+    'success', 'scenario_type', 'user_scenario_type', 'input_data', 'scenario_impianto',
+    'scenario_siero', 'defaults_used', 'investimento_info', 'messaggio_decisionale',
+    'comparazione', 'distribuzione_costi', 'kpi', 'trend_quinquennale', 'proiezione',
+)
+
+
+def _valore(array, indice):
+    return float(array[indice])
+
+
+def _in_liste(risultati):
+    """Converte (ricorsivamente) gli array dei risultati in liste Python"""
+    return {
+        chiave: _in_liste(valore) if isinstance(valore, dict) else valore.tolist()
+        for chiave, valore in risultati.items()
+    }
+
+
+def investimento_info(capacita, costo_impianto):
+    """Messaggio informativo sulla capacità di investimento vs costo impianto"""
+    sufficiente = False
+    messaggio = ""
+
+    if capacita >= SOGLIA_INVESTIMENTO:
+        if capacita >= costo_impianto:
+            sufficiente = True
+            messaggio = "✅ È possibile acquistare l'impianto di filtrazione per ottenere le proteine dal siero del latte!"
+        else:
+            differenza = costo_impianto - capacita
+            messaggio = f"⚠️ Budget insufficiente per l'impianto. Mancano €{differenza:,.2f}"
+
+    return {
+        'capacita_disponibile': capacita,
+        'costo_richiesto': costo_impianto,
+        'sufficiente': sufficiente,
+        'messaggio': messaggio,
+        'differenza': costo_impianto - capacita if capacita > 0 else 0
+    }
+
+
+def richiede_proiezione(input_data):
+    """True se l'input contiene almeno un parametro della proiezione pluriennale"""
+    return any(campo in input_data for campo in PARAMETRI_PROIEZIONE)
+
+
+def _colonna_costi_extra(lista_input):
+    """Costi extra per riga (presenti solo negli input con un profilo di costo)"""
+    return np.fromiter((dati.get('costi_extra', COSTI_EXTRA_IMPIANTO) for dati in lista_input),
+                       dtype=np.float64, count=len(lista_input))
+
+
+def proietta_input(lista_input):
+    """Proiezione vettoriale di una lista di `input_data` (parametri mancanti: default)"""
+    colonne = {
+        campo: np.fromiter((dati.get(campo, VALORI_FISSI.get(campo)) for dati in lista_input),
+                           dtype=np.float64, count=len(lista_input))
+        for campo in CAMPI_NUMERICI if campo != 'capacita_investimento'
+    }
+    colonne['costi_extra'] = _colonna_costi_extra(lista_input)
+    colonne.update({
+        campo: np.fromiter((dati.get(campo, predefinito) for dati in lista_input),
+                           dtype=np.float64, count=len(lista_input))
+        for campo, predefinito in PROIEZIONE_DEFAULT.items()
+    })
+    return proietta_flussi(**colonne)
+
+
+def _finito(valore, cifre):
+    valore = float(valore)
+    return round(valore, cifre) if np.isfinite(valore) else None
+
+
+def proiezione_data(proiezione, indice):
+    """Sezione `proiezione` del payload per lo scenario in posizione `indice`"""
+    impianto = proiezione['impianto']
+    siero = proiezione['siero']
+    orizzonte = int(proiezione['orizzonte_anni'][indice])
+    serie = {
+        nome: np.round(valori[indice][:orizzonte], 2).tolist()
+        for nome, valori in (
+            ('ricavi_impianto', impianto['ricavi']),
+            ('costi_impianto', impianto['costi']),
+            ('margine_impianto', impianto['margine']),
+            ('flusso_impianto', impianto['flussi']),
+            ('flusso_cumulato_attualizzato', impianto['flussi_cumulati_attualizzati']),
+            ('ricavi_siero', siero['ricavi']),
+            ('costi_siero', siero['costi']),
+            ('margine_siero', siero['margine']),
+        )
+    }
+    payback = _finito(impianto['payback_attualizzato'][indice], 0)
+
+    return {
+        'orizzonte_anni': orizzonte,
+        'van_impianto': round(float(impianto['van'][indice]), 2),
+        'van_siero': round(float(siero['van'][indice]), 2),
+        'differenza_van': round(float(proiezione['differenza_van'][indice]), 2),
+        'tir_impianto': _finito(impianto['tir'][indice], 4),
+        'payback_attualizzato': int(payback) if payback is not None else None,
+        'anni': [
+            dict({'anno': anno}, **{nome: valori[anno - 1] for nome, valori in serie.items()})
+            for anno in range(1, orizzonte + 1)
+        ],
+    }
+
+
+def trend_proiezione(proiezione):
+    """Trend cumulato dei primi ANNI_TREND anni della proiezione"""
+    campi = ('ricavi_impianto', 'margine_impianto', 'costi_impianto',
+             'ricavi_siero', 'costi_siero', 'margine_siero')
+    cumulati = dict.fromkeys(campi, 0.0)
+    trend_data = []
+    for riga in proiezione['anni'][:ANNI_TREND]:
+        for campo in campi:
+            cumulati[campo] += riga[campo]
+        trend_data.append(dict({'anno': riga['anno']}, **{
+            campo: round(valore, 2) for campo, valore in cumulati.items()
+        }))
+    return trend_data
+
+
+# Sezioni del payload. Ricevono i risultati di un solo scenario (`indice`
+# negli array di `calcola_scenari`, `()` per gli array 0-d del grafo) e
+# sono l'unica definizione dei valori restituiti, usata sia da
+# `simulation_data` sia dai nodi di `grafo`.
+
+def sezione_scenario_impianto(impianto, indice=()):
+    return {
+        'ricavi': round(_valore(impianto['ricavi'], indice), 2),
+        'costi': round(_valore(impianto['costi'], indice), 2),
+        'margine_netto': round(_valore(impianto['margine_netto'], indice), 2),
+        'roi': round(_valore(impianto['roi'], indice), 2),
+        'kg_proteine': round(_valore(impianto['kg_proteine'], indice), 2),
+        'is_user_data': True  # Sempre presente
+    }
+
+
+def sezione_scenario_siero(siero, prezzo_siero, indice=()):
+    return {
+        'ricavi': round(_valore(siero['ricavi'], indice), 2),
+        'costi': round(_valore(siero['costi'], indice), 2),
+        'margine_netto': round(_valore(siero['margine_netto'], indice), 2),
+        'roi': 0,  # Nessun investimento
+        'is_user_data': bool(prezzo_siero)
+    }
+
+
+def sezione_user_scenario_type(prezzo_siero):
+    return 'both' if prezzo_siero else 'impianto_with_default_siero'
+
+
+def sezione_defaults_used(prezzo_proteine, resa, prezzo_siero):
+    return {
+        'prezzo_proteine': not bool(prezzo_proteine),
+        'resa_proteine': not bool(resa),
+        'prezzo_siero': not bool(prezzo_siero)
+    }
+
+
+def sezione_comparazione(scenario_impianto, scenario_siero):
+    """Differenze tra gli scenari, sui valori già arrotondati"""
+    return {
+        'differenza_ricavi': round(scenario_impianto['ricavi'] - scenario_siero['ricavi'], 2),
+        'differenza_costi': round(scenario_impianto['costi'] - scenario_siero['costi'], 2),
+        'differenza_margine': round(scenario_impianto['margine_netto'] - scenario_siero['margine_netto'], 2)
+    }
+
+
+def sezione_distribuzione_costi(distribuzione, indice=()):
+    return {
+        'ammortamento': round(_valore(distribuzione['ammortamento'], indice), 2),
+        'operativi': round(_valore(distribuzione['operativi'], indice), 2),
+        'distribuzione': round(_valore(distribuzione['distribuzione'], indice), 2),
+        'totale': round(_valore(distribuzione['totale'], indice), 2)
+    }
+
+
+def sezione_kpi(scenario_impianto, scenario_siero, costo_impianto, resa, volume):
+    payback_years = None
+    if scenario_impianto['margine_netto'] > 0:
+        payback_years = costo_impianto / scenario_impianto['margine_netto']
+
+    kpi_data = {
+        'roi_impianto': scenario_impianto['roi'],
+        'payback_years': round(payback_years, 2) if payback_years else 999,
+    }
+    if resa:
+        kpi_data['efficienza_conversione'] = resa
+    kpi_data['valore_aggiunto_per_litro'] = round(
+        (scenario_impianto['ricavi'] - scenario_siero['ricavi']) / volume, 4
+    )
+    return kpi_data
+
+
+def sezione_trend(scenario_impianto, scenario_siero, proiezione=None):
+    """Trend cumulato di ANNI_TREND anni (quello della proiezione, se presente)"""
+    if proiezione is not None:
+        return trend_proiezione(proiezione)
+
+    trend_data = []
+    for anno in range(1, ANNI_TREND + 1):
+        trend_data.append({
+            'anno': anno,
+            'ricavi_impianto': round(scenario_impianto['ricavi'] * anno, 2),
+            'margine_impianto': round(scenario_impianto['margine_netto'] * anno, 2),
+            'costi_impianto': round(scenario_impianto['costi'] * anno, 2),
+            'ricavi_siero': round(scenario_siero['ricavi'] * anno, 2),
+            'costi_siero': round(scenario_siero['costi'] * anno, 2),
+            'margine_siero': round(scenario_siero['margine_netto'] * anno, 2),
+        })
+    return trend_data
+
+
+def simulation_data(input_data, risultati, indice, messaggio_decisionale, proiezione=None):
+    """
+    Restituisce il payload della dashboard per lo scenario in posizione
+    `indice` di `risultati`. I valori sono arrotondati come nella risposta
+    originale (i derivati sono calcolati sui valori già arrotondati).
+
+    Con `proiezione` (vedi `proiezione_data`) il trend è quello della
+    proiezione pluriennale, restituita anche nella sezione `proiezione`.
+    """
+    prezzo_siero = input_data['prezzo_vendita_siero']
+    resa = input_data['resa_proteine']
+    scenario_impianto = sezione_scenario_impianto(risultati['impianto'], indice)
+    scenario_siero = sezione_scenario_siero(risultati['siero'], prezzo_siero, indice)
+
+    data = {
+        'success': True,
+        'scenario_type': 'both',  # Mostra sempre entrambi per confronto
+        'user_scenario_type': sezione_user_scenario_type(prezzo_siero),
+        'input_data': dict(input_data),
+        'scenario_impianto': scenario_impianto,
+        'scenario_siero': scenario_siero,
+        'defaults_used': sezione_defaults_used(input_data['prezzo_vendita_proteine'], resa, prezzo_siero),
+        'investimento_info': investimento_info(
+            input_data['capacita_investimento'], input_data['costo_impianto']
+        ),
+        'messaggio_decisionale': messaggio_decisionale,
+        'comparazione': sezione_comparazione(scenario_impianto, scenario_siero),
+        'distribuzione_costi': sezione_distribuzione_costi(risultati['distribuzione_costi'], indice),
+        'kpi': sezione_kpi(scenario_impianto, scenario_siero, input_data['costo_impianto'], resa,
+                           input_data['volume_siero']),
+        'trend_quinquennale': sezione_trend(scenario_impianto, scenario_siero, proiezione),
+    }
+    if proiezione is not None:
+        data['proiezione'] = proiezione
+    return data
+
+
+def simulazioni_batch(lista_input, soglia_budget=SOGLIA_BUDGET, soglia_spazio=SOGLIA_SPAZIO,
+                      proiezione=True):
+    """
+    Calcola in un solo passaggio vettoriale una lista di input già validati
+    (dizionari nel formato `input_data`) e restituisce i payload nello stesso
+    ordine. Con `proiezione` falso la proiezione pluriennale non è calcolata:
+    nessuna sezione `proiezione` e trend senza tassi di crescita (per chi non
+    richiede nessuna delle due sezioni).
+    """
+    if not lista_input:
+        return []
+
+    colonne = {
+        campo: np.fromiter((dati[campo] for dati in lista_input),
+                           dtype=np.float64, count=len(lista_input))
+        for campo in CAMPI_NUMERICI
+    }
+    colonne['costi_extra'] = _colonna_costi_extra(lista_input)
+    # Le liste Python sono molto più veloci da indicizzare riga per riga
+    risultati = _in_liste(calcola_scenari(**colonne))
+    messaggi = messaggi_decisionali(
+        risultati['budget_rimanente'],
+        [dati['tempistiche'] for dati in lista_input],
+        [dati['spazio_disponibile'] for dati in lista_input],
+        [dati['personale_disponibile'] for dati in lista_input],
+        soglia_budget, soglia_spazio,
+    )
+
+    # Proiezione pluriennale, in un solo passaggio, per le righe che la richiedono
+    proiezioni = [None] * len(lista_input)
+    con_proiezione = [
+        i for i, dati in enumerate(lista_input) if proiezione and richiede_proiezione(dati)
+    ]
+    if con_proiezione:
+        flussi = proietta_input([lista_input[i] for i in con_proiezione])
+        for posizione, i in enumerate(con_proiezione):
+            proiezioni[i] = proiezione_data(flussi, posizione)
+
+    return [
+        simulation_data(dati, risultati, i, messaggi[i], proiezioni[i])
+        for i, dati in enumerate(lista_input)
+    ]
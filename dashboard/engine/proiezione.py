@@ -0,0 +1,176 @@
+"""
+Proiezione pluriennale dei flussi di cassa con attualizzazione (VAN/TIR).
+
+Volume, prezzi e costi evolvono anno per anno con tassi di crescita e
+inflazione costanti; l'impianto richiede l'investimento all'anno 0 e viene
+ammortizzato a quote costanti (solo nei valori contabili). Le funzioni sono
+vettoriali sia sugli anni sia sugli scenari: gli array restituiti hanno
+forma (..., anni), con `...` la forma di broadcast degli input. Gli anni
+oltre l'orizzonte del singolo scenario valgono NaN.
+"""
+import numpy as np
+
+from .core import (
+    ANNI_AMMORTAMENTO,
+    COSTI_EXTRA_IMPIANTO,
+    COSTI_OPERATIVI_ANNUI,
+    COSTO_DISTRIBUZIONE,
+    COSTO_IMPIANTO,
+    PREZZO_SIERO_DEFAULT,
+    PREZZO_VENDITA_PROTEINE,
+    PREZZO_VENDITA_SIERO,
+    RESA_PROTEINE,
+    as_array,
+)
+
+ORIZZONTE_MAX = 50
+
+# Parametri della proiezione (tassi annui come frazione: 0.02 = 2%)
+PROIEZIONE_DEFAULT = {
+    'orizzonte_anni': 10,
+    'crescita_volume': 0.0,
+    'crescita_prezzo_proteine': 0.0,
+    'crescita_prezzo_siero': 0.0,
+    'inflazione_costi': 0.0,
+    'tasso_sconto': 0.05,
+}
+PARAMETRI_PROIEZIONE = tuple(PROIEZIONE_DEFAULT)
+
+# Intervallo di ricerca del TIR e numero di bisezioni (precisione ~1e-17)
+TIR_MINIMO = -0.99
+TIR_MASSIMO = 10.0
+TIR_ITERAZIONI = 60
+
+
+def _fattori(tasso, anni):
+    """(1 + tasso) ** (anno - 1) per ogni anno: forma (..., anni)"""
+    return (1.0 + as_array(tasso)[..., np.newaxis]) ** (anni - 1)
+
+
+def _van(investimento, flussi, anni, tasso):
+    """Valore attuale netto di -investimento all'anno 0 e `flussi` agli anni 1..N"""
+    sconto = (1.0 + as_array(tasso)[..., np.newaxis]) ** -anni
+    return (flussi * sconto).sum(axis=-1) - investimento
+
+
+def tir(investimento, flussi):
+    """
+    Tasso interno di rendimento di -investimento all'anno 0 seguito da
+    `flussi` (forma (..., anni), zeri oltre l'orizzonte). Bisezione
+    vettoriale su [TIR_MINIMO, TIR_MASSIMO]; NaN se il VAN non cambia segno
+    nell'intervallo.
+    """
+    investimento = as_array(investimento)
+    flussi = as_array(flussi)
+    anni = np.arange(1, flussi.shape[-1] + 1, dtype=np.float64)
+    forma = np.broadcast_shapes(investimento.shape, flussi.shape[:-1])
+
+    basso = np.full(forma, TIR_MINIMO)
+    alto = np.full(forma, TIR_MASSIMO)
+    van_basso = _van(investimento, flussi, anni, basso)
+    valido = van_basso * _van(investimento, flussi, anni, alto) <= 0
+
+    for _ in range(TIR_ITERAZIONI):
+        medio = (basso + alto) / 2
+        van_medio = _van(investimento, flussi, anni, medio)
+        # Radice in [basso, medio] se il VAN cambia segno in quel tratto
+        a_sinistra = van_basso * van_medio <= 0
+        alto = np.where(a_sinistra, medio, alto)
+        basso = np.where(a_sinistra, basso, medio)
+        van_basso = np.where(a_sinistra, van_basso, van_medio)
+
+    return np.where(valido, (basso + alto) / 2, np.nan)
+
+
+def proietta_flussi(volume_siero,
+                    costo_impianto=COSTO_IMPIANTO,
+                    costi_operativi_annui=COSTI_OPERATIVI_ANNUI,
+                    prezzo_vendita_proteine=PREZZO_VENDITA_PROTEINE,
+                    resa_proteine=RESA_PROTEINE,
+                    prezzo_vendita_siero=PREZZO_VENDITA_SIERO,
+                    costo_distribuzione=COSTO_DISTRIBUZIONE,
+                    costi_extra=COSTI_EXTRA_IMPIANTO,
+                    orizzonte_anni=PROIEZIONE_DEFAULT['orizzonte_anni'],
+                    crescita_volume=0.0,
+                    crescita_prezzo_proteine=0.0,
+                    crescita_prezzo_siero=0.0,
+                    inflazione_costi=0.0,
+                    tasso_sconto=PROIEZIONE_DEFAULT['tasso_sconto'],
+                    anni_ammortamento=ANNI_AMMORTAMENTO):
+    """
+    Flussi anno per anno di entrambi gli scenari sull'orizzonte richiesto.
+
+    Per l'impianto `costi` e `margine` sono contabili (con l'ammortamento),
+    `flussi` sono di cassa (investimento escluso, all'anno 0); per il siero
+    costi e flussi coincidono con i valori di cassa. Restituisce anche VAN
+    di entrambi gli scenari, TIR e anno di payback attualizzato
+    dell'impianto (NaN se non raggiunto entro l'orizzonte).
+    """
+    orizzonte = np.rint(as_array(orizzonte_anni))
+    if orizzonte.size and (orizzonte.min() < 1 or orizzonte.max() > ORIZZONTE_MAX):
+        raise ValueError(f"L'orizzonte deve essere tra 1 e {ORIZZONTE_MAX} anni")
+    anni = np.arange(1, int(orizzonte.max()) + 1, dtype=np.float64)
+    nell_orizzonte = anni <= orizzonte[..., np.newaxis]
+
+    prezzo_siero = as_array(prezzo_vendita_siero)
+    prezzo_siero = np.where(prezzo_siero > 0, prezzo_siero, PREZZO_SIERO_DEFAULT)
+    costo = as_array(costo_impianto)[..., np.newaxis]
+
+    volume = as_array(volume_siero)[..., np.newaxis] * _fattori(crescita_volume, anni)
+    inflazione = _fattori(inflazione_costi, anni)
+
+    # Impianto
+    ricavi_impianto = (volume * as_array(resa_proteine)[..., np.newaxis]
+                       * as_array(prezzo_vendita_proteine)[..., np.newaxis]
+                       * _fattori(crescita_prezzo_proteine, anni))
+    costi_cassa = (as_array(costi_operativi_annui) + as_array(costo_distribuzione)
+                   + as_array(costi_extra))[..., np.newaxis] * inflazione
+    ammortamento = np.where(anni <= anni_ammortamento, costo / anni_ammortamento, 0.0)
+    flussi_impianto = ricavi_impianto - costi_cassa
+    costi_impianto = costi_cassa + ammortamento
+
+    # Siero (nessun investimento)
+    ricavi_siero = volume * prezzo_siero[..., np.newaxis] * _fattori(crescita_prezzo_siero, anni)
+    costi_siero = as_array(costo_distribuzione)[..., np.newaxis] * inflazione
+    flussi_siero = ricavi_siero - costi_siero
+
+    forma = np.broadcast_shapes(flussi_impianto.shape, flussi_siero.shape, nell_orizzonte.shape)
+    nell_orizzonte = np.broadcast_to(nell_orizzonte, forma)
+
+    def nel_periodo(valori, riempimento):
+        return np.where(nell_orizzonte, np.broadcast_to(valori, forma), riempimento)
+
+    flussi_impianto = nel_periodo(flussi_impianto, 0.0)
+    flussi_siero = nel_periodo(flussi_siero, 0.0)
+    investimento = costo[..., 0]
+
+    sconto = (1.0 + as_array(tasso_sconto)[..., np.newaxis]) ** -anni
+    cumulato_attualizzato = np.cumsum(flussi_impianto * sconto, axis=-1) - costo
+    recuperato = (cumulato_attualizzato >= 0) & nell_orizzonte
+    payback = np.where(recuperato.any(axis=-1), recuperato.argmax(axis=-1) + 1.0, np.nan)
+
+    van_impianto = _van(investimento, flussi_impianto, anni, tasso_sconto)
+    van_siero = _van(0.0, flussi_siero, anni, tasso_sconto)
+
+    return {
+        'anni': anni,
+        'orizzonte_anni': np.broadcast_to(orizzonte, forma[:-1]),
+        'impianto': {
+            'ricavi': nel_periodo(ricavi_impianto, np.nan),
+            'costi': nel_periodo(costi_impianto, np.nan),
+            'margine': nel_periodo(ricavi_impianto - costi_impianto, np.nan),
+            'flussi': nel_periodo(flussi_impianto, np.nan),
+            'flussi_cumulati_attualizzati': nel_periodo(cumulato_attualizzato, np.nan),
+            'van': np.broadcast_to(van_impianto, forma[:-1]),
+            'tir': np.broadcast_to(tir(investimento, flussi_impianto), forma[:-1]),
+            'payback_attualizzato': np.broadcast_to(payback, forma[:-1]),
+        },
+        'siero': {
+            'ricavi': nel_periodo(ricavi_siero, np.nan),
+            'costi': nel_periodo(costi_siero, np.nan),
+            'margine': nel_periodo(flussi_siero, np.nan),
+            'flussi': nel_periodo(flussi_siero, np.nan),
+            'van': np.broadcast_to(van_siero, forma[:-1]),
+        },
+        'differenza_van': np.broadcast_to(van_impianto - van_siero, forma[:-1]),
+    }
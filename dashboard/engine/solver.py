@@ -0,0 +1,94 @@
+"""
+Soluzioni analitiche di pareggio: volume e prezzo proteine di break-even,
+punto di convenienza tra scenario impianto e scenario siero e volume
+necessario per un payback obiettivo.
+
+Tutti i margini sono lineari nel volume, quindi ogni soluzione è una
+formula chiusa valutata su array (nessuna ricerca per tentativi). Le
+soluzioni inesistenti (es. l'impianto non supera mai la vendita siero)
+valgono NaN.
+"""
+import numpy as np
+
+from .core import (
+    ANNI_AMMORTAMENTO,
+    COSTI_EXTRA_IMPIANTO,
+    COSTI_OPERATIVI_ANNUI,
+    COSTO_DISTRIBUZIONE,
+    COSTO_IMPIANTO,
+    PREZZO_SIERO_DEFAULT,
+    PREZZO_VENDITA_PROTEINE,
+    PREZZO_VENDITA_SIERO,
+    RESA_PROTEINE,
+    as_array,
+)
+
+# Input accettati da risolvi_pareggio
+PARAMETRI_SOLVER = (
+    'volume_siero',
+    'costo_impianto',
+    'costi_operativi_annui',
+    'prezzo_vendita_proteine',
+    'resa_proteine',
+    'prezzo_vendita_siero',
+    'costo_distribuzione',
+    'costi_extra',
+    'payback_obiettivo',
+)
+
+
+def _dividi(numeratore, denominatore, validi):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(validi, numeratore / denominatore, np.nan)
+
+
+def risolvi_pareggio(volume_siero=np.nan,
+                     costo_impianto=COSTO_IMPIANTO,
+                     costi_operativi_annui=COSTI_OPERATIVI_ANNUI,
+                     prezzo_vendita_proteine=PREZZO_VENDITA_PROTEINE,
+                     resa_proteine=RESA_PROTEINE,
+                     prezzo_vendita_siero=PREZZO_VENDITA_SIERO,
+                     costo_distribuzione=COSTO_DISTRIBUZIONE,
+                     costi_extra=COSTI_EXTRA_IMPIANTO,
+                     payback_obiettivo=np.nan):
+    """
+    Restituisce un dizionario di array con:
+
+    - volume_pareggio: volume a cui il margine dell'impianto è zero
+    - volume_convenienza: volume oltre il quale l'impianto rende più del siero
+    - volume_payback: volume che ripaga l'impianto in `payback_obiettivo` anni
+    - prezzo_proteine_pareggio: prezzo proteine che azzera il margine a `volume_siero`
+    - prezzo_proteine_convenienza: prezzo proteine che eguaglia il siero a `volume_siero`
+    """
+    volume = as_array(volume_siero)
+    costo = as_array(costo_impianto)
+    resa = as_array(resa_proteine)
+    prezzo_proteine = as_array(prezzo_vendita_proteine)
+    prezzo_siero = as_array(prezzo_vendita_siero)
+    prezzo_siero = np.where(prezzo_siero > 0, prezzo_siero, PREZZO_SIERO_DEFAULT)
+    distribuzione = as_array(costo_distribuzione)
+    payback = as_array(payback_obiettivo)
+
+    # margine_impianto(V) = V * resa * prezzo_proteine - costi_fissi
+    # margine_siero(V)    = V * prezzo_siero - costo_distribuzione
+    costi_fissi = (costo / ANNI_AMMORTAMENTO + as_array(costi_operativi_annui)
+                   + distribuzione + as_array(costi_extra))
+    ricavo_litro_impianto = resa * prezzo_proteine
+    vantaggio_litro = ricavo_litro_impianto - prezzo_siero
+    proteine_per_volume = volume * resa
+
+    soluzioni = {
+        'volume_pareggio': _dividi(costi_fissi, ricavo_litro_impianto, ricavo_litro_impianto > 0),
+        'volume_convenienza': _dividi(costi_fissi - distribuzione, vantaggio_litro, vantaggio_litro > 0),
+        'volume_payback': _dividi(costi_fissi + costo / np.where(payback > 0, payback, np.nan),
+                                  ricavo_litro_impianto,
+                                  (ricavo_litro_impianto > 0) & (payback > 0)),
+        'prezzo_proteine_pareggio': _dividi(costi_fissi, proteine_per_volume, proteine_per_volume > 0),
+        'prezzo_proteine_convenienza': _dividi(
+            costi_fissi + volume * prezzo_siero - distribuzione, proteine_per_volume,
+            proteine_per_volume > 0
+        ),
+    }
+    # Tutte le soluzioni con la stessa forma (quella di broadcast degli input)
+    forma = np.broadcast_shapes(*(valori.shape for valori in soluzioni.values()))
+    return {nome: np.broadcast_to(valori, forma) for nome, valori in soluzioni.items()}
@@ -0,0 +1,125 @@
+"""
+Analisi di sensibilità: valutazione degli scenari su una griglia densa di
+parametri (es. volume_siero x prezzo_vendita_siero) per le heatmap.
+
+Gli assi vengono combinati per broadcasting, senza costruire una meshgrid
+né dizionari per cella.
+"""
+import numpy as np
+
+from .core import PARAMETRI_SCENARI, calcola_scenari
+from .decisione import SOGLIA_BUDGET, SOGLIA_SPAZIO, classifica
+
+# Parametri che possono diventare un asse della griglia
+PARAMETRI_SWEEP = (
+    'volume_siero',
+    'prezzo_vendita_siero',
+    'prezzo_vendita_proteine',
+    'resa_proteine',
+    'capacita_investimento',
+)
+
+# Metriche disponibili: nome -> percorso nei risultati di calcola_scenari
+METRICHE_SWEEP = {
+    'margine_impianto': ('impianto', 'margine_netto'),
+    'roi_impianto': ('impianto', 'roi'),
+    'payback_impianto': ('impianto', 'payback_years'),
+    'margine_siero': ('siero', 'margine_netto'),
+    'differenza_margine': ('comparazione', 'differenza_margine'),
+}
+
+# Metrica con il codice decisionale di ogni cella (indice in CODICI_DECISIONE)
+METRICA_DECISIONE = 'decisione'
+
+# Parametri testuali usati solo dalla metrica decisionale
+CAMPI_DECISIONE_TESTO = ('tempistiche', 'personale_disponibile')
+
+MAX_CELLE = 4000000
+
+
+def _passi(passi):
+    """Numero di passi di un asse (ValueError se non intero o fuori da 1..MAX_CELLE)"""
+    passi = float(passi)
+    if not passi.is_integer() or not 1 <= passi <= MAX_CELLE:
+        raise ValueError(f"Il numero di passi deve essere un intero tra 1 e {MAX_CELLE}")
+    return int(passi)
+
+
+def asse(minimo, massimo, passi):
+    """Valori equispaziati di un asse della griglia (estremi inclusi)"""
+    passi = _passi(passi)
+    minimo, massimo = float(minimo), float(massimo)
+    if not (np.isfinite(minimo) and np.isfinite(massimo)):
+        raise ValueError("Gli estremi dell'asse devono essere numeri finiti")
+    if massimo < minimo:
+        raise ValueError("Il massimo dell'asse deve essere maggiore o uguale al minimo")
+    return np.linspace(minimo, massimo, passi)
+
+
+def assi_griglia(intervalli):
+    """
+    Assi della griglia da nome -> (minimo, massimo, passi). Il numero di
+    celle è controllato prima di generare i valori: una griglia troppo
+    grande è rifiutata senza allocare memoria.
+    """
+    celle = 1
+    for _, _, passi in intervalli.values():
+        celle *= _passi(passi)
+    if celle > MAX_CELLE:
+        raise ValueError(f"Griglia troppo grande: {celle} celle (massimo {MAX_CELLE})")
+    return {nome: asse(*intervallo) for nome, intervallo in intervalli.items()}
+
+
+def griglia_sensibilita(assi, parametri=None, metriche=None,
+                        soglia_budget=SOGLIA_BUDGET, soglia_spazio=SOGLIA_SPAZIO):
+    """
+    Valuta le metriche su tutte le combinazioni degli assi.
+
+    `assi` è un dizionario ordinato nome_parametro -> array 1D; `parametri`
+    contiene i valori scalari degli altri campi (default: valori fissi).
+    Per la metrica `decisione` valgono anche spazio_disponibile, tempistiche
+    e personale_disponibile. Restituisce nome_metrica -> array di forma
+    (len(asse_1), len(asse_2), ...).
+    """
+    metriche = list(metriche or METRICHE_SWEEP)
+    for nome in assi:
+        if nome not in PARAMETRI_SWEEP:
+            raise ValueError(f"Parametro non valido per lo sweep: {nome}")
+    for nome in metriche:
+        if nome not in METRICHE_SWEEP and nome != METRICA_DECISIONE:
+            raise ValueError(f"Metrica non valida: {nome}")
+
+    celle = int(np.prod([len(valori) for valori in assi.values()], dtype=np.int64))
+    if celle > MAX_CELLE:
+        raise ValueError(f"Griglia troppo grande: {celle} celle (massimo {MAX_CELLE})")
+
+    parametri = parametri or {}
+    argomenti = {campo: valore for campo, valore in parametri.items()
+                 if campo in PARAMETRI_SCENARI}
+    n_assi = len(assi)
+    for posizione, (nome, valori) in enumerate(assi.items()):
+        forma = [1] * n_assi
+        forma[posizione] = -1
+        argomenti[nome] = np.asarray(valori, dtype=np.float64).reshape(forma)
+
+    if 'volume_siero' not in argomenti:
+        raise ValueError("volume_siero è obbligatorio (come asse o parametro)")
+
+    risultati = calcola_scenari(**argomenti)
+    forma_griglia = tuple(len(valori) for valori in assi.values())
+
+    griglia = {}
+    for nome in metriche:
+        if nome == METRICA_DECISIONE:
+            valori = classifica(
+                risultati['budget_rimanente'],
+                parametri.get('tempistiche') or '',
+                float(parametri.get('spazio_disponibile') or 0),
+                parametri.get('personale_disponibile') or '',
+                soglia_budget, soglia_spazio,
+            )
+        else:
+            gruppo, chiave = METRICHE_SWEEP[nome]
+            valori = risultati[gruppo][chiave]
+        griglia[nome] = np.broadcast_to(valori, forma_griglia)
+    return griglia
@@ -0,0 +1,192 @@
+"""
+Esportazione in streaming dello storico delle simulazioni (CSV o NDJSON).
+
+Le righe di SimulationInput vengono lette con `.iterator(chunk_size=...)` e
+gli scenari ricalcolati con il motore vettoriale un blocco alla volta: la
+memoria usata non dipende dal numero di simulazioni esportate. Ogni blocco
+produce un unico pezzo di byte della risposta.
+"""
+import csv
+import datetime
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.db.models import DecimalField, FloatField
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from . import engine, serializzazione
+from .models import SimulationInput, soglie_decisionali
+
+DIMENSIONE_BLOCCO = 2000
+
+FORMATI = ('csv', 'ndjson')
+
+# Colonne di SimulationInput esportate, nell'ordine
+CAMPI_INPUT = (
+    'id',
+    'created_at',
+    'profilo_costi',
+    'volume_siero',
+    'capacita_investimento',
+    'costo_impianto',
+    'costi_operativi_annui',
+    'prezzo_vendita_proteine',
+    'resa_proteine',
+    'prezzo_vendita_siero',
+    'costo_distribuzione',
+    'costi_extra',
+    'tempistiche',
+    'spazio_disponibile',
+    'personale_disponibile',
+)
+
+# Risultati ricalcolati: nome della colonna -> percorso nei risultati di calcola_scenari
+CAMPI_RISULTATO = {
+    'kg_proteine': ('impianto', 'kg_proteine'),
+    'ricavi_impianto': ('impianto', 'ricavi'),
+    'costi_impianto': ('impianto', 'costi'),
+    'margine_impianto': ('impianto', 'margine_netto'),
+    'roi_impianto': ('impianto', 'roi'),
+    'ricavi_siero': ('siero', 'ricavi'),
+    'costi_siero': ('siero', 'costi'),
+    'margine_siero': ('siero', 'margine_netto'),
+    'differenza_margine': ('comparazione', 'differenza_margine'),
+    'budget_rimanente': ('budget_rimanente',),
+}
+
+COLONNE = (*CAMPI_INPUT, *CAMPI_RISULTATO, 'decisione')
+
+
+def _data(valore, nome):
+    try:
+        return datetime.date.fromisoformat(valore)
+    except ValueError:
+        raise ValueError(f"{nome} deve essere una data AAAA-MM-GG")
+
+
+def _inizio_giorno(giorno):
+    """Mezzanotte di `giorno` nel fuso orario corrente"""
+    return timezone.make_aware(datetime.datetime.combine(giorno, datetime.time.min))
+
+
+def _numero(valore, nome):
+    try:
+        return float(valore.replace(',', '.'))
+    except ValueError:
+        raise ValueError(f"{nome} deve essere un numero valido")
+
+
+def filtra(parametri):
+    """
+    Queryset dello storico filtrato con i parametri della richiesta
+    (`dal`, `al` come date AAAA-MM-GG incluse, `volume_min`, `volume_max`,
+    `profilo`). ValueError se un parametro non è valido.
+    """
+    queryset = SimulationInput.objects.order_by('id')
+    # Intervalli su created_at (non created_at__date) così da usare l'indice
+    if parametri.get('dal'):
+        queryset = queryset.filter(created_at__gte=_inizio_giorno(_data(parametri['dal'], 'dal')))
+    if parametri.get('al'):
+        giorno_dopo = _data(parametri['al'], 'al') + datetime.timedelta(days=1)
+        queryset = queryset.filter(created_at__lt=_inizio_giorno(giorno_dopo))
+    if parametri.get('volume_min'):
+        queryset = queryset.filter(volume_siero__gte=_numero(parametri['volume_min'], 'volume_min'))
+    if parametri.get('volume_max'):
+        queryset = queryset.filter(volume_siero__lte=_numero(parametri['volume_max'], 'volume_max'))
+    if 'profilo' in parametri:
+        queryset = queryset.filter(profilo_costi=parametri['profilo'])
+    return queryset
+
+
+def _valuta(blocco):
+    """Righe di output (tuple nell'ordine di COLONNE) per un blocco di tuple di input"""
+    colonne = dict(zip(CAMPI_INPUT, zip(*blocco)))
+    # Costi extra salvati con la simulazione: modificare o eliminare il profilo non cambia lo storico
+    numeri = {campo: engine.as_array(colonne[campo]) for campo in engine.PARAMETRI_SCENARI}
+    spazio = [valore or 0.0 for valore in colonne['spazio_disponibile']]
+    risultati = engine.calcola_scenari(**numeri)
+    codici = engine.classifica(
+        risultati['budget_rimanente'],
+        [valore or '' for valore in colonne['tempistiche']],
+        spazio,
+        [valore or '' for valore in colonne['personale_disponibile']],
+        **soglie_decisionali()
+    )
+
+    uscita = dict(colonne)
+    uscita['created_at'] = [valore.isoformat() for valore in colonne['created_at']]
+    uscita['spazio_disponibile'] = spazio
+    uscita.update((campo, valori.tolist()) for campo, valori in numeri.items())
+    for nome, percorso in CAMPI_RISULTATO.items():
+        valori = risultati
+        for chiave in percorso:
+            valori = valori[chiave]
+        uscita[nome] = valori.round(2).tolist()
+    uscita['decisione'] = [engine.CODICI_DECISIONE[codice] for codice in codici.tolist()]
+
+    return list(zip(*(uscita[colonna] for colonna in COLONNE)))
+
+
+def _colonne_query():
+    # I decimali arrivano già come float dal database: i convertitori Decimal
+    # di Django sarebbero la parte più costosa dell'esportazione
+    return [
+        Cast(campo, FloatField()) if isinstance(SimulationInput._meta.get_field(campo), DecimalField) else campo
+        for campo in CAMPI_INPUT
+    ]
+
+
+def _blocchi(queryset, dimensione_blocco):
+    iteratore = queryset.values_list(*_colonne_query()).iterator(chunk_size=dimensione_blocco)
+    while True:
+        blocco = list(islice(iteratore, dimensione_blocco))
+        if not blocco:
+            return
+        yield _valuta(blocco)
+
+
+class _Buffer:
+    """Pseudo-file per csv.writer: accumula le righe fino a `svuota`"""
+
+    def __init__(self):
+        self.righe = []
+
+    def write(self, valore):
+        self.righe.append(valore)
+
+    def svuota(self):
+        contenuto = ''.join(self.righe).encode()
+        self.righe.clear()
+        return contenuto
+
+
+def in_csv(queryset, dimensione_blocco=DIMENSIONE_BLOCCO):
+    """Byte CSV (intestazione compresa), un pezzo per blocco di righe"""
+    buffer = _Buffer()
+    writer = csv.writer(buffer)
+    writer.writerow(COLONNE)
+    yield buffer.svuota()
+    for righe in _blocchi(queryset, dimensione_blocco):
+        writer.writerows(righe)
+        yield buffer.svuota()
+
+
+def in_ndjson(queryset, dimensione_blocco=DIMENSIONE_BLOCCO):
+    """Byte NDJSON (un oggetto per simulazione), un pezzo per blocco di righe"""
+    for righe in _blocchi(queryset, dimensione_blocco):
+        yield serializzazione.in_ndjson(dict(zip(COLONNE, riga)) for riga in righe)
+
+
+async def in_asincrono(pezzi):
+    """
+    Iteratore asincrono sui pezzi di un generatore sincrono (per le risposte
+    in streaming sotto ASGI): ogni blocco è letto e calcolato nel thread
+    delle operazioni sul database, senza accumulare l'intera esportazione.
+    """
+    prossimo = sync_to_async(next)
+    while True:
+        pezzo = await prossimo(pezzi, None)
+        if pezzo is None:
+            return
+        yield pezzo
@@ -0,0 +1,322 @@
+"""
+Importazione in blocco dei volumi mensili di siero per latteria (CSV).
+
+Il file viene letto in streaming a blocchi di righe; per ogni blocco la
+validazione, il calcolo degli scenari (motore vettoriale) e la scrittura di
+ProduzioneMensile avvengono in un solo passaggio, senza istanze del modello.
+Le righe non valide vengono scartate e riportate con il numero di riga.
+
+Colonne (intestazione obbligatoria, separatore `,` o `;`, decimali con
+punto o virgola): latteria, mese (AAAA-MM o AAAA-MM-GG), volume_siero e le
+opzionali capacita_investimento, spazio_disponibile, tempistiche,
+personale_disponibile, profilo.
+"""
+import csv
+import datetime
+import itertools
+import time
+
+import numpy as np
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import engine, profili
+from .models import ProduzioneMensile, soglie_decisionali
+
+DIMENSIONE_BLOCCO = 50000
+
+# Errori riportati nel riepilogo (le righe scartate sono comunque contate tutte)
+MAX_ERRORI = 100
+
+COLONNE_OBBLIGATORIE = ('latteria', 'mese', 'volume_siero')
+COLONNE_OPZIONALI = (
+    'capacita_investimento',
+    'spazio_disponibile',
+    'tempistiche',
+    'personale_disponibile',
+    'profilo',
+)
+
+TEMPISTICHE = {'': '', 'breve': 'breve', 'media': 'media', 'lunga': 'lunga'}
+PERSONALE = {'': '', 'si': 'Si', 'sì': 'Si', 'no': 'No'}
+
+# Campi di ProduzioneMensile scritti dall'importazione, nell'ordine delle tuple
+CAMPI_PRODUZIONE = (
+    'latteria',
+    'mese',
+    'volume_siero',
+    'capacita_investimento',
+    'spazio_disponibile',
+    'tempistiche',
+    'personale_disponibile',
+    'profilo_costi',
+    'kg_proteine',
+    'ricavi_impianto',
+    'costi_impianto',
+    'margine_impianto',
+    'roi_impianto',
+    'payback_years',
+    'ricavi_siero',
+    'costi_siero',
+    'margine_siero',
+    'differenza_margine',
+    'decisione',
+    'importata_il',
+)
+CHIAVE_PRODUZIONE = ('latteria', 'mese')
+
+# Costanti di costo per riga (dal profilo o dai valori fissi del motore)
+CAMPI_COSTO = (*engine.VALORI_FISSI, 'costi_extra')
+
+
+def _mese(testo):
+    """Primo giorno del mese da 'AAAA-MM' o 'AAAA-MM-GG' (None se non valido)"""
+    try:
+        data = datetime.date.fromisoformat(testo if len(testo) > 7 else testo + '-01')
+    except ValueError:
+        return None
+    return data.replace(day=1)
+
+
+def _numeri(testi, predefinito):
+    """
+    Array float di una colonna di testo (vuoto = `predefinito`) e maschera
+    delle righe non numeriche. Percorso veloce se tutta la colonna è valida.
+    """
+    try:
+        valori = np.fromiter(
+            (float(testo.replace(',', '.')) if testo else predefinito for testo in testi),
+            dtype=np.float64, count=len(testi),
+        )
+        return valori, ~np.isfinite(valori)
+    except ValueError:
+        pass
+
+    valori = np.empty(len(testi))
+    for i, testo in enumerate(testi):
+        try:
+            valori[i] = float(testo.replace(',', '.')) if testo else predefinito
+        except ValueError:
+            valori[i] = np.nan
+    return valori, ~np.isfinite(valori)
+
+
+def _colonna(blocco, indice):
+    if indice is None:
+        return [''] * len(blocco)
+    try:
+        return [riga[indice].strip() for riga in blocco]
+    except IndexError:
+        # Righe più corte dell'intestazione: campi mancanti vuoti
+        return [riga[indice].strip() if indice < len(riga) else '' for riga in blocco]
+
+
+def _costi(nomi_profilo):
+    """
+    Costanti di costo per riga (profilo indicato, predefinito o valori fissi),
+    nome del profilo applicato e maschera dei profili sconosciuti.
+    """
+    risolti = {}
+    for nome in set(nomi_profilo):
+        try:
+            risolti[nome] = profili.risolvi(nome)
+        except KeyError:
+            risolti[nome] = None
+
+    nomi = list(risolti)
+    posizione = {nome: i for i, nome in enumerate(nomi)}
+    indici = np.fromiter((posizione[nome] for nome in nomi_profilo), dtype=np.intp, count=len(nomi_profilo))
+    sconosciuti = np.array([risolti[nome] is None for nome in nomi])[indici]
+
+    fissi = dict(engine.VALORI_FISSI, costi_extra=engine.COSTI_EXTRA_IMPIANTO)
+    applicati = [risolti[nome] or ('', None) for nome in nomi]
+    costi = {
+        campo: np.array([(valori or fissi)[campo] for _, valori in applicati])[indici]
+        for campo in CAMPI_COSTO
+    }
+    return costi, [applicati[i][0] for i in indici.tolist()], sconosciuti
+
+
+def valuta_blocco(blocco, indici, prima_riga):
+    """
+    Valida e calcola un blocco di righe CSV (liste di stringhe). Restituisce
+    le tuple da scrivere (ordine di CAMPI_PRODUZIONE, senza importata_il) e
+    gli errori come coppie (numero di riga, messaggio).
+    """
+    testo = {nome: _colonna(blocco, indici.get(nome))
+             for nome in (*COLONNE_OBBLIGATORIE, *COLONNE_OPZIONALI)}
+
+    cache_mesi = {valore: _mese(valore) for valore in set(testo['mese'])}
+    mesi = [cache_mesi[valore] for valore in testo['mese']]
+    volume, volume_non_numerico = _numeri(testo['volume_siero'], np.nan)
+    capacita, capacita_non_numerica = _numeri(testo['capacita_investimento'], 0.0)
+    spazio, spazio_non_numerico = _numeri(testo['spazio_disponibile'], 0.0)
+    tempistiche = [TEMPISTICHE.get(valore.lower()) for valore in testo['tempistiche']]
+    personale = [PERSONALE.get(valore.lower()) for valore in testo['personale_disponibile']]
+    costi, profilo_applicato, profilo_sconosciuto = _costi(testo['profilo'])
+
+    # Controlli in ordine: per ogni riga si riporta il primo fallito
+    with np.errstate(invalid='ignore'):
+        controlli = (
+            (np.array([not valore for valore in testo['latteria']]), "latteria mancante"),
+            (np.array([mese is None for mese in mesi]), "mese non valido (AAAA-MM)"),
+            (volume_non_numerico | ~(volume > 0), "volume_siero deve essere un numero maggiore di 0"),
+            (capacita_non_numerica | (capacita < 0), "capacita_investimento deve essere un numero non negativo"),
+            (spazio_non_numerico | (spazio < 0), "spazio_disponibile deve essere un numero non negativo"),
+            (np.array([valore is None for valore in tempistiche]), "tempistiche deve essere breve, media o lunga"),
+            (np.array([valore is None for valore in personale]), "personale_disponibile deve essere Si o No"),
+            (profilo_sconosciuto, "profilo di costo non trovato"),
+        )
+    errore = np.full(len(blocco), -1, dtype=np.intp)
+    for codice, (non_valide, _) in enumerate(controlli):
+        errore[(errore < 0) & non_valide] = codice
+    errori = [
+        (prima_riga + i, controlli[codice][1])
+        for i, codice in zip(np.flatnonzero(errore >= 0).tolist(), errore[errore >= 0].tolist())
+    ]
+
+    valide = np.flatnonzero(errore < 0)
+    if not len(valide):
+        return [], errori
+
+    posizioni = valide.tolist()
+    tutte_valide = len(posizioni) == len(blocco)
+
+    def seleziona(valori):
+        return valori if tutte_valide else [valori[i] for i in posizioni]
+
+    volume = volume[valide]
+    capacita = capacita[valide]
+    spazio = spazio[valide]
+    tempistiche = seleziona(tempistiche)
+    personale = seleziona(personale)
+    costi = {campo: valori[valide] for campo, valori in costi.items()}
+
+    risultati = engine.calcola_scenari(volume, capacita, **costi)
+    codici = engine.classifica(risultati['budget_rimanente'], tempistiche, spazio, personale,
+                               **soglie_decisionali())
+    impianto = risultati['impianto']
+    siero = risultati['siero']
+    margine = impianto['margine_netto'].round(2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        payback = np.where(margine > 0, (costi['costo_impianto'] / margine).round(2), np.nan)
+
+    def arrotondati(valori):
+        return valori.round(2).tolist()
+
+    righe = zip(
+        seleziona(testo['latteria']),
+        seleziona(mesi),
+        volume.tolist(),
+        capacita.tolist(),
+        spazio.tolist(),
+        tempistiche,
+        personale,
+        seleziona(profilo_applicato),
+        arrotondati(impianto['kg_proteine']),
+        arrotondati(impianto['ricavi']),
+        arrotondati(impianto['costi']),
+        margine.tolist(),
+        arrotondati(impianto['roi']),
+        [None if np.isnan(valore) else valore for valore in payback.tolist()],
+        arrotondati(siero['ricavi']),
+        arrotondati(siero['costi']),
+        arrotondati(siero['margine_netto']),
+        arrotondati(risultati['comparazione']['differenza_margine']),
+        [engine.CODICI_DECISIONE[codice] for codice in codici.tolist()],
+    )
+    return list(righe), errori
+
+
+def _sql_upsert():
+    """INSERT ... ON CONFLICT DO UPDATE (SQLite e PostgreSQL) su ProduzioneMensile"""
+    opzioni = ProduzioneMensile._meta
+    colonna = {campo: connection.ops.quote_name(opzioni.get_field(campo).column) for campo in CAMPI_PRODUZIONE}
+    aggiornate = ', '.join(
+        f"{colonna[campo]} = excluded.{colonna[campo]}"
+        for campo in CAMPI_PRODUZIONE if campo not in CHIAVE_PRODUZIONE
+    )
+    return (
+        f"INSERT INTO {connection.ops.quote_name(opzioni.db_table)} "
+        f"({', '.join(colonna.values())}) VALUES ({', '.join(['%s'] * len(CAMPI_PRODUZIONE))}) "
+        f"ON CONFLICT ({', '.join(colonna[campo] for campo in CHIAVE_PRODUZIONE)}) DO UPDATE SET {aggiornate}"
+    )
+
+
+def scrivi_blocco(righe, importata_il):
+    """
+    Scrive (o sostituisce, per latteria e mese) le righe calcolate in una
+    transazione. Su SQLite e PostgreSQL usa un executemany diretto; sugli
+    altri database bulk_create con update_conflicts.
+    """
+    if not righe:
+        return
+    if connection.vendor in ('sqlite', 'postgresql'):
+        adatta_data = connection.ops.adapt_datefield_value
+        mesi = {}
+        importata_il = connection.ops.adapt_datetimefield_value(importata_il)
+        parametri = []
+        for riga in righe:
+            mese = riga[1]
+            if mese not in mesi:
+                mesi[mese] = adatta_data(mese)
+            parametri.append((riga[0], mesi[mese], *riga[2:], importata_il))
+        with transaction.atomic(), connection.cursor() as cursore:
+            cursore.executemany(_sql_upsert(), parametri)
+        return
+
+    ProduzioneMensile.objects.bulk_create(
+        [ProduzioneMensile(**dict(zip(CAMPI_PRODUZIONE, (*riga, importata_il)))) for riga in righe],
+        update_conflicts=True,
+        unique_fields=list(CHIAVE_PRODUZIONE),
+        update_fields=[campo for campo in CAMPI_PRODUZIONE if campo not in CHIAVE_PRODUZIONE],
+    )
+
+
+def importa(righe_testo, dimensione_blocco=DIMENSIONE_BLOCCO, delimitatore=None, scrivi=True):
+    """
+    Importa un CSV da un iterabile di righe di testo (file aperto, upload
+    decodificato, ...). Con `scrivi=False` valida e calcola senza salvare.
+    Restituisce il riepilogo: righe lette, importate, scartate, primi
+    MAX_ERRORI errori e durata. ValueError se l'intestazione non è valida.
+    """
+    inizio = time.perf_counter()
+    righe_testo = iter(righe_testo)
+    prima = next(righe_testo, '')
+    if not prima.strip():
+        raise ValueError("File CSV vuoto o senza intestazione")
+    if delimitatore is None:
+        delimitatore = ';' if prima.count(';') > prima.count(',') else ','
+
+    reader = csv.reader(itertools.chain([prima], righe_testo), delimiter=delimitatore)
+    intestazione = [nome.strip().lstrip('\ufeff').lower() for nome in next(reader)]
+    mancanti = [nome for nome in COLONNE_OBBLIGATORIE if nome not in intestazione]
+    if mancanti:
+        raise ValueError(f"Colonne obbligatorie mancanti: {', '.join(mancanti)}")
+    indici = {
+        nome: intestazione.index(nome) if nome in intestazione else None
+        for nome in (*COLONNE_OBBLIGATORIE, *COLONNE_OPZIONALI)
+    }
+
+    importata_il = timezone.now()
+    riepilogo = {'righe': 0, 'importate': 0, 'scartate': 0, 'errori': []}
+    prima_riga = 2  # numerazione del file, intestazione compresa
+    while True:
+        blocco = list(itertools.islice(reader, dimensione_blocco))
+        if not blocco:
+            break
+        righe, errori = valuta_blocco(blocco, indici, prima_riga)
+        if scrivi:
+            scrivi_blocco(righe, importata_il)
+
+        riepilogo['righe'] += len(blocco)
+        riepilogo['importate'] += len(righe)
+        riepilogo['scartate'] += len(errori)
+        spazio_errori = MAX_ERRORI - len(riepilogo['errori'])
+        riepilogo['errori'].extend(
+            {'riga': riga, 'errore': messaggio} for riga, messaggio in errori[:spazio_errori]
+        )
+        prima_riga += len(blocco)
+
+    riepilogo['secondi'] = round(time.perf_counter() - inizio, 3)
+    return riepilogo
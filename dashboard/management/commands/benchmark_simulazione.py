@@ -0,0 +1,181 @@
+"""
+Benchmark della pipeline di simulazione: percorso completo di dashboard_view
+e dell'endpoint JSON ajax-calculate (test client), metodi di calcolo di
+SimulationInput, serializzazione JSON di simulation_data (modulo standard e
+livello `serializzazione`, anche per un batch a righe e a colonne) e
+rendering di dashboard.html.
+
+Per ogni caso riporta operazioni/secondo e latenze p50/p99. I risultati
+possono essere salvati come baseline JSON e confrontati nelle esecuzioni
+successive:
+
+    python manage.py benchmark_simulazione --salva-baseline
+    python manage.py benchmark_simulazione --confronta
+"""
+import itertools
+import json
+import platform
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import render_to_string
+from django.test import Client, RequestFactory, override_settings
+
+from dashboard import cache_risultati, engine, serializzazione, views
+from dashboard.models import SimulationInput
+
+BASELINE_DEFAULT = Path(settings.BASE_DIR) / 'benchmark_baseline.json'
+
+INPUT_ESEMPIO = {
+    'volume_siero': '2000000',
+    'capacita_investimento': '3000000',
+    'spazio_disponibile': '80',
+    'tempistiche': 'media',
+    'personale_disponibile': 'Si',
+}
+
+
+def _simulazione_esempio():
+    input_data, _ = views._valida_input(INPUT_ESEMPIO)
+    return views._calcola_simulazione(views._ordina_input(input_data))
+
+
+def _casi():
+    """nome -> funzione senza argomenti da misurare"""
+    client = Client()
+    volumi = itertools.count(1000)
+    simulation_data = _simulazione_esempio()
+    simulation_json = json.dumps(simulation_data)
+    modello = SimulationInput(
+        volume_siero=2000000, capacita_investimento=3000000, spazio_disponibile=80,
+        tempistiche='media', personale_disponibile='Si', **engine.VALORI_FISSI
+    )
+    contesto = {'simulation_data': simulation_data, 'simulation_json': simulation_json}
+    pagina = RequestFactory().get('/')
+    batch = engine.simulazioni_batch([
+        views._ordina_input(views._valida_input(dict(INPUT_ESEMPIO, volume_siero=str(volume)))[0])
+        for volume in range(10000, 1010000, 1000)
+    ])
+
+    def vista_ajax_miss():
+        # Volume sempre diverso: nessun risultato già in cache
+        client.post('/', dict(INPUT_ESEMPIO, volume_siero=str(next(volumi))),
+                    HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+    def vista_ajax_hit():
+        client.post('/', INPUT_ESEMPIO, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+    def vista_pagina():
+        client.post('/', INPUT_ESEMPIO)
+
+    corpo_api = json.dumps(INPUT_ESEMPIO)
+
+    def api_ajax():
+        client.post('/ajax-calculate/', corpo_api, content_type='application/json')
+
+    return {
+        'vista_ajax_miss': vista_ajax_miss,
+        'vista_ajax_hit': vista_ajax_hit,
+        'vista_pagina': vista_pagina,
+        'api_ajax': api_ajax,
+        'modello_scenario_impianto': modello.calcola_scenario_impianto,
+        'modello_scenario_siero': modello.calcola_scenario_vendita_siero,
+        'modello_messaggio_decisionale': modello.calcola_messaggio_decisionale,
+        'calcolo_simulazione': _simulazione_esempio,
+        'serializzazione_json': lambda: json.dumps(simulation_data),
+        'serializzazione_payload': lambda: serializzazione.in_json(simulation_data),
+        'serializzazione_batch_righe': lambda: serializzazione.in_json(batch),
+        'serializzazione_batch_colonne': lambda: serializzazione.in_json(serializzazione.in_colonne(batch)),
+        'rendering_template': lambda: render_to_string('dashboard/dashboard.html', contesto, pagina),
+    }
+
+
+def misura(funzione, ripetizioni, riscaldamento):
+    """Esegue `funzione` e restituisce ops/sec e latenze p50/p99 in millisecondi"""
+    for _ in range(riscaldamento):
+        funzione()
+
+    durate = np.empty(ripetizioni)
+    for i in range(ripetizioni):
+        inizio = time.perf_counter()
+        funzione()
+        durate[i] = time.perf_counter() - inizio
+
+    p50, p99 = np.percentile(durate, [50, 99]) * 1000
+    return {
+        'ops_sec': round(ripetizioni / durate.sum(), 1),
+        'p50_ms': round(float(p50), 4),
+        'p99_ms': round(float(p99), 4),
+        'ripetizioni': ripetizioni,
+    }
+
+
+class Command(BaseCommand):
+    help = "Benchmark della pipeline di simulazione (ops/sec, p50/p99) con baseline"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ripetizioni', type=int, default=500)
+        parser.add_argument('--riscaldamento', type=int, default=50)
+        parser.add_argument('--casi', nargs='+', help="Sottoinsieme dei casi da eseguire")
+        parser.add_argument('--baseline', type=Path, default=BASELINE_DEFAULT,
+                            help="File JSON della baseline")
+        parser.add_argument('--salva-baseline', action='store_true',
+                            help="Salva i risultati come nuova baseline")
+        parser.add_argument('--confronta', action='store_true',
+                            help="Confronta con la baseline salvata")
+        parser.add_argument('--soglia', type=float, default=10.0,
+                            help="Calo percentuale di ops/sec segnalato come regressione")
+
+    def handle(self, *args, **options):
+        # Lo storico resta disattivato: il benchmark non scrive nel database
+        with override_settings(DASHBOARD_STORICO_ATTIVO=False,
+                               ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            cache_risultati._cache().clear()
+            casi = _casi()
+            nomi = options['casi'] or list(casi)
+            sconosciuti = set(nomi) - set(casi)
+            if sconosciuti:
+                raise CommandError(f"Casi sconosciuti: {', '.join(sorted(sconosciuti))}")
+
+            risultati = {
+                nome: misura(casi[nome], options['ripetizioni'], options['riscaldamento'])
+                for nome in nomi
+            }
+
+        baseline = {}
+        if options['confronta']:
+            if not options['baseline'].exists():
+                raise CommandError(f"Baseline non trovata: {options['baseline']}")
+            baseline = json.loads(options['baseline'].read_text())['casi']
+
+        self.stdout.write(f"{'caso':<30} {'ops/sec':>12} {'p50 ms':>10} {'p99 ms':>10} {'vs baseline':>12}")
+        regressioni = 0
+        for nome, valori in risultati.items():
+            confronto = ''
+            if nome in baseline:
+                variazione = (valori['ops_sec'] / baseline[nome]['ops_sec'] - 1) * 100
+                confronto = f"{variazione:+.1f}%"
+                if variazione < -options['soglia']:
+                    confronto += ' !'
+                    regressioni += 1
+            self.stdout.write(
+                f"{nome:<30} {valori['ops_sec']:>12.1f} {valori['p50_ms']:>10.4f} "
+                f"{valori['p99_ms']:>10.4f} {confronto:>12}"
+            )
+
+        if options['confronta']:
+            messaggio = f"Regressioni oltre il {options['soglia']:.0f}%: {regressioni}"
+            self.stdout.write(self.style.WARNING(messaggio) if regressioni else self.style.SUCCESS(messaggio))
+
+        if options['salva_baseline']:
+            options['baseline'].write_text(json.dumps({
+                'creata': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'macchina': platform.machine(),
+                'casi': risultati,
+            }, indent=2))
+            self.stdout.write(self.style.SUCCESS(f"Baseline salvata in {options['baseline']}"))
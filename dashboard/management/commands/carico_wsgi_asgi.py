@@ -0,0 +1,107 @@
+"""
+Test di carico delle view di calcolo: stesso endpoint servito dalla view
+sincrona (WSGI, un thread per richiesta concorrente) e dalla variante
+asincrona (ASGI, un unico ciclo di eventi), sulla stessa macchina.
+
+Esempio:
+    python manage.py carico_wsgi_asgi --endpoint dashboard --richieste 2000 --concorrenza 32
+"""
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.test import AsyncRequestFactory, RequestFactory, override_settings
+
+from dashboard import views
+
+# endpoint -> (view sincrona, view asincrona)
+ENDPOINT = {
+    'dashboard': (views.dashboard_view, views.dashboard_view_async),
+    'batch': (views.batch_calculate, views.batch_calculate_async),
+    'sweep': (views.sweep_calculate, views.sweep_calculate_async),
+}
+
+
+def _richiesta(factory, endpoint, i):
+    """Richiesta i-esima del test (volumi diversi per non servire tutto dalla cache)"""
+    if endpoint == 'dashboard':
+        return factory.post('/', {'volume_siero': str(1000 + i), 'spazio_disponibile': '60'},
+                            headers={'X-Requested-With': 'XMLHttpRequest'})
+    if endpoint == 'batch':
+        elementi = [{'volume_siero': 1000 + i * 100 + j, 'spazio_disponibile': 60} for j in range(100)]
+        return factory.post('/api/batch/', json.dumps(elementi), content_type='application/json')
+    corpo = {
+        'assi': {
+            'volume_siero': {'min': 1000, 'max': 5000000 + i, 'passi': 200},
+            'prezzo_vendita_siero': {'min': 0.05, 'max': 0.5, 'passi': 200},
+        },
+        'formato': 'binario',
+    }
+    return factory.post('/api/sweep/', json.dumps(corpo), content_type='application/json')
+
+
+def _esegui_wsgi(vista, richieste, concorrenza):
+    def singola(request):
+        inizio = time.perf_counter()
+        response = vista(request)
+        return time.perf_counter() - inizio, response.status_code
+
+    with ThreadPoolExecutor(max_workers=concorrenza) as pool:
+        return list(pool.map(singola, richieste))
+
+
+def _esegui_asgi(vista, richieste, concorrenza):
+    async def principale():
+        semaforo = asyncio.Semaphore(concorrenza)
+
+        async def singola(request):
+            async with semaforo:
+                inizio = time.perf_counter()
+                response = await vista(request)
+                return time.perf_counter() - inizio, response.status_code
+
+        return await asyncio.gather(*(singola(request) for request in richieste))
+
+    return asyncio.run(principale())
+
+
+class Command(BaseCommand):
+    help = "Confronta il throughput WSGI (view sincrone) e ASGI (view asincrone)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', choices=sorted(ENDPOINT), default='dashboard')
+        parser.add_argument('--richieste', type=int, default=2000)
+        parser.add_argument('--concorrenza', type=int, default=32)
+        parser.add_argument('--storico', action='store_true',
+                            help="Registra anche le simulazioni nello storico (default: disattivato)")
+
+    def handle(self, *args, **options):
+        endpoint = options['endpoint']
+        n = options['richieste']
+        concorrenza = options['concorrenza']
+        vista_sincrona, vista_asincrona = ENDPOINT[endpoint]
+
+        prove = (
+            ('WSGI', _esegui_wsgi, vista_sincrona, RequestFactory()),
+            ('ASGI', _esegui_asgi, vista_asincrona, AsyncRequestFactory()),
+        )
+        self.stdout.write(f"Endpoint {endpoint}: {n} richieste, concorrenza {concorrenza}")
+        self.stdout.write(f"{'modalità':<8} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'errori':>8}")
+
+        with override_settings(DASHBOARD_STORICO_ATTIVO=options['storico']):
+            for nome, esegui, vista, factory in prove:
+                # Offset diverso per ogni modalità: nessuna delle due parte con la cache calda
+                offset = n if nome == 'ASGI' else 0
+                richieste = [_richiesta(factory, endpoint, offset + i) for i in range(n)]
+
+                inizio = time.perf_counter()
+                esiti = esegui(vista, richieste, concorrenza)
+                durata = time.perf_counter() - inizio
+
+                latenze = np.array([latenza for latenza, _ in esiti]) * 1000
+                errori = sum(1 for _, stato in esiti if stato != 200)
+                p50, p99 = np.percentile(latenze, [50, 99])
+                self.stdout.write(f"{nome:<8} {n / durata:>10.1f} {p50:>10.2f} {p99:>10.2f} {errori:>8}")
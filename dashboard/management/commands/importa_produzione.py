@@ -0,0 +1,50 @@
+"""
+Importa un CSV di volumi mensili di siero per latteria, calcola gli scenari
+e salva i risultati in ProduzioneMensile (vedi dashboard.importazione):
+
+    python manage.py importa_produzione produzione_2025.csv
+    python manage.py importa_produzione produzione.csv --delimitatore ';' --simula
+"""
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard import importazione
+
+
+class Command(BaseCommand):
+    help = "Importa in blocco i volumi mensili di siero (CSV) e ne calcola gli scenari"
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', type=Path, help="File CSV da importare")
+        parser.add_argument('--blocco', type=int, default=importazione.DIMENSIONE_BLOCCO,
+                            help="Righe validate, calcolate e scritte per transazione")
+        parser.add_argument('--delimitatore', help="Separatore dei campi (default: rilevato)")
+        parser.add_argument('--encoding', default='utf-8-sig')
+        parser.add_argument('--simula', action='store_true',
+                            help="Valida e calcola senza scrivere nel database")
+
+    def handle(self, *args, **options):
+        if not options['file'].exists():
+            raise CommandError(f"File non trovato: {options['file']}")
+
+        with options['file'].open(encoding=options['encoding'], newline='') as file:
+            try:
+                riepilogo = importazione.importa(
+                    file,
+                    dimensione_blocco=options['blocco'],
+                    delimitatore=options['delimitatore'],
+                    scrivi=not options['simula'],
+                )
+            except (ValueError, UnicodeDecodeError) as e:
+                raise CommandError(str(e))
+
+        for errore in riepilogo['errori']:
+            self.stdout.write(self.style.WARNING(f"Riga {errore['riga']}: {errore['errore']}"))
+
+        righe_secondo = riepilogo['righe'] / riepilogo['secondi'] if riepilogo['secondi'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Righe lette: {riepilogo['righe']}, importate: {riepilogo['importate']}, "
+            f"scartate: {riepilogo['scartate']} in {riepilogo['secondi']:.1f}s "
+            f"({righe_secondo:,.0f} righe/s){' - simulazione, nulla salvato' if options['simula'] else ''}"
+        ))
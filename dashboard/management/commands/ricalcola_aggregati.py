@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from dashboard import aggregati
+
+
+class Command(BaseCommand):
+    help = "Ricalcola da zero gli aggregati dello storico usati dai grafici"
+
+    def handle(self, *args, **options):
+        gruppi = aggregati.ricostruisci()
+        self.stdout.write(self.style.SUCCESS(f"Aggregati ricalcolati: {gruppi} gruppi"))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from dashboard import persistenza
+
+
+class Command(BaseCommand):
+    help = "Scrive subito le simulazioni in attesa nella coda dello storico del processo (es. call_command nei test)"
+
+    def handle(self, *args, **options):
+        prima = persistenza.statistiche()
+        persistenza.svuota()
+        dopo = persistenza.statistiche()
+        self.stdout.write(self.style.SUCCESS(
+            f"Simulazioni scritte: {dopo['scritte'] - prima['scritte']} "
+            f"(scartate dall'avvio: {dopo['scartate']}, errori: {dopo['errori']})"
+        ))
@@ -0,0 +1,229 @@
+"""
+Strumentazione delle view di calcolo.
+
+Ogni richiesta strumentata riceve una traccia (`request.traccia`) con un
+identificativo (header X-Request-ID se presente, altrimenti generato),
+restituito nell'header X-Trace-Id della risposta. Solo una percentuale di
+richieste (`DASHBOARD_METRICHE_CAMPIONAMENTO`) misura i tempi delle fasi
+(parsing, validazione, calcolo, serializzazione, rendering); i contatori di
+richieste ed errori valgono per tutte.
+
+`esporta()` produce i contatori e gli istogrammi di latenza nel formato
+testuale di Prometheus, servito dall'endpoint /metrics/.
+"""
+import bisect
+import inspect
+import logging
+import random
+import threading
+import time
+import uuid
+from functools import wraps
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Limiti superiori dei bucket degli istogrammi (secondi)
+BUCKET_LATENZA = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                  0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Istogramma:
+    """Istogramma a bucket fissi (conteggi non cumulativi, somma e totale)"""
+
+    def __init__(self):
+        self.conteggi = [0] * (len(BUCKET_LATENZA) + 1)
+        self.somma = 0.0
+        self.totale = 0
+
+    def osserva(self, valore):
+        self.conteggi[bisect.bisect_left(BUCKET_LATENZA, valore)] += 1
+        self.somma += valore
+        self.totale += 1
+
+
+_lock = threading.Lock()
+_richieste = {}
+_campionate = {}
+_errori = {}
+_istogrammi = {}
+
+
+def _incrementa(contatori, chiave):
+    contatori[chiave] = contatori.get(chiave, 0) + 1
+
+
+class _FaseNulla:
+    """Contesto senza effetti per le richieste non campionate"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_FASE_NULLA = _FaseNulla()
+
+
+class _Fase:
+    def __init__(self, traccia, nome):
+        self.traccia = traccia
+        self.nome = nome
+
+    def __enter__(self):
+        self.inizio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        durata = time.perf_counter() - self.inizio
+        self.traccia.fasi[self.nome] = self.traccia.fasi.get(self.nome, 0.0) + durata
+        return False
+
+
+class Traccia:
+    """Traccia di una richiesta: identificativo e durata delle fasi se campionata"""
+
+    def __init__(self, vista, trace_id=None, campionata=False):
+        self.vista = vista
+        self.id = trace_id or uuid.uuid4().hex[:16]
+        self.campionata = campionata
+        self.fasi = {}
+
+    def fase(self, nome):
+        """Context manager che misura la fase `nome` (nessun costo se non campionata)"""
+        if not self.campionata:
+            return _FASE_NULLA
+        return _Fase(self, nome)
+
+
+# Traccia non campionata per le chiamate fuori da una richiesta strumentata
+NESSUNA_TRACCIA = Traccia('', trace_id='-')
+
+
+def _campiona():
+    percentuale = getattr(settings, 'DASHBOARD_METRICHE_CAMPIONAMENTO', 100)
+    return percentuale >= 100 or (percentuale > 0 and random.random() * 100 < percentuale)
+
+
+def _registra(traccia, durata, errore):
+    with _lock:
+        _incrementa(_richieste, traccia.vista)
+        if errore:
+            _incrementa(_errori, traccia.vista)
+        if traccia.campionata:
+            _incrementa(_campionate, traccia.vista)
+            for fase, valore in dict(traccia.fasi, totale=durata).items():
+                chiave = (traccia.vista, fase)
+                if chiave not in _istogrammi:
+                    _istogrammi[chiave] = Istogramma()
+                _istogrammi[chiave].osserva(valore)
+
+    if traccia.campionata and logger.isEnabledFor(logging.DEBUG):
+        fasi = ' '.join(f"{fase}={valore * 1000:.3f}ms" for fase, valore in traccia.fasi.items())
+        logger.debug("[%s] %s totale=%.3fms %s", traccia.id, traccia.vista, durata * 1000, fasi)
+
+
+def _inizia(request, vista):
+    traccia = Traccia(vista, request.headers.get('X-Request-ID'), _campiona())
+    request.traccia = traccia
+    return traccia, time.perf_counter()
+
+
+def _termina(traccia, inizio, response):
+    _registra(traccia, time.perf_counter() - inizio, response.status_code >= 400)
+    response['X-Trace-Id'] = traccia.id
+    return response
+
+
+def strumenta(vista):
+    """
+    Decoratore per view sincrone o asincrone: crea la traccia della richiesta
+    e registra contatori e latenze con il nome `vista`. Una view strumentata
+    chiamata da un'altra (es. la variante asincrona) riusa la traccia esterna.
+    """
+    def decoratore(funzione):
+        if inspect.iscoroutinefunction(funzione):
+            @wraps(funzione)
+            async def wrapper(request, *args, **kwargs):
+                if hasattr(request, 'traccia'):
+                    return await funzione(request, *args, **kwargs)
+                traccia, inizio = _inizia(request, vista)
+                try:
+                    response = await funzione(request, *args, **kwargs)
+                except Exception:
+                    _registra(traccia, time.perf_counter() - inizio, True)
+                    raise
+                return _termina(traccia, inizio, response)
+        else:
+            @wraps(funzione)
+            def wrapper(request, *args, **kwargs):
+                if hasattr(request, 'traccia'):
+                    return funzione(request, *args, **kwargs)
+                traccia, inizio = _inizia(request, vista)
+                try:
+                    response = funzione(request, *args, **kwargs)
+                except Exception:
+                    _registra(traccia, time.perf_counter() - inizio, True)
+                    raise
+                return _termina(traccia, inizio, response)
+        return wrapper
+    return decoratore
+
+
+def statistiche():
+    """Copia dei contatori e degli istogrammi correnti"""
+    with _lock:
+        return {
+            'richieste': dict(_richieste),
+            'campionate': dict(_campionate),
+            'errori': dict(_errori),
+            'istogrammi': {
+                chiave: (list(i.conteggi), i.somma, i.totale) for chiave, i in _istogrammi.items()
+            },
+        }
+
+
+def azzera():
+    with _lock:
+        for contatori in (_richieste, _campionate, _errori, _istogrammi):
+            contatori.clear()
+
+
+def _contatore(righe, nome, descrizione, valori, etichetta='vista'):
+    righe.append(f"# HELP {nome} {descrizione}")
+    righe.append(f"# TYPE {nome} counter")
+    for chiave, valore in sorted(valori.items()):
+        righe.append(f'{nome}{{{etichetta}="{chiave}"}} {valore}')
+
+
+def esporta(gauge=None):
+    """
+    Metriche nel formato testuale di Prometheus. `gauge` aggiunge valori
+    istantanei esterni (nome -> valore), es. la coda dello storico.
+    """
+    dati = statistiche()
+    righe = []
+    _contatore(righe, 'dashboard_richieste_totali', "Richieste servite per view", dati['richieste'])
+    _contatore(righe, 'dashboard_richieste_campionate_totali', "Richieste con tempi misurati", dati['campionate'])
+    _contatore(righe, 'dashboard_errori_totali', "Risposte con stato >= 400 o eccezione", dati['errori'])
+
+    nome = 'dashboard_durata_fase_secondi'
+    righe.append(f"# HELP {nome} Durata delle fasi delle richieste campionate")
+    righe.append(f"# TYPE {nome} histogram")
+    for (vista, fase), (conteggi, somma, totale) in sorted(dati['istogrammi'].items()):
+        etichette = f'vista="{vista}",fase="{fase}"'
+        cumulato = 0
+        for limite, conteggio in zip(BUCKET_LATENZA, conteggi):
+            cumulato += conteggio
+            righe.append(f'{nome}_bucket{{{etichette},le="{limite}"}} {cumulato}')
+        righe.append(f'{nome}_bucket{{{etichette},le="+Inf"}} {totale}')
+        righe.append(f'{nome}_sum{{{etichette}}} {somma:.6f}')
+        righe.append(f'{nome}_count{{{etichette}}} {totale}')
+
+    for nome, valore in (gauge or {}).items():
+        righe.append(f"# TYPE {nome} gauge")
+        righe.append(f"{nome} {valore}")
+
+    return '\n'.join(righe) + '\n'
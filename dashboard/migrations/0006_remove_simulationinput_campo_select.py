@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:08
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0005_simulationinput_costo_distribuzione_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='simulationinput',
+            name='campo_select',
+        ),
+    ]
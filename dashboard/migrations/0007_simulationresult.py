@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0006_remove_simulationinput_campo_select'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimulationResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('volume_siero', models.FloatField()),
+                ('capacita_investimento', models.FloatField()),
+                ('spazio_disponibile', models.FloatField()),
+                ('kg_proteine', models.FloatField()),
+                ('ricavi_impianto', models.FloatField()),
+                ('costi_impianto', models.FloatField()),
+                ('margine_impianto', models.FloatField()),
+                ('roi_impianto', models.FloatField()),
+                ('payback_years', models.FloatField(blank=True, null=True)),
+                ('ricavi_siero', models.FloatField()),
+                ('costi_siero', models.FloatField()),
+                ('margine_siero', models.FloatField()),
+                ('differenza_margine', models.FloatField()),
+                ('tipo_messaggio', models.CharField(max_length=10)),
+                ('simulazione', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='risultato', to='dashboard.simulationinput')),
+            ],
+            options={
+                'verbose_name': 'Risultato Simulazione',
+                'verbose_name_plural': 'Risultati Simulazioni',
+                'indexes': [models.Index(fields=['created_at'], name='risultato_created_at_idx'), models.Index(fields=['volume_siero'], name='risultato_volume_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0007_simulationresult'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfiloCosti',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=100, unique=True)),
+                ('fornitore', models.CharField(blank=True, max_length=100)),
+                ('regione', models.CharField(blank=True, max_length=100)),
+                ('costo_impianto', models.DecimalField(decimal_places=2, default=1000000.0, help_text="Costo dell'impianto in euro", max_digits=12)),
+                ('costi_operativi_annui', models.DecimalField(decimal_places=2, default=800000.0, help_text='Costi operativi annui in euro', max_digits=12)),
+                ('prezzo_vendita_proteine', models.DecimalField(decimal_places=2, default=50.0, help_text='Prezzo di vendita proteine in €/kg', max_digits=8)),
+                ('resa_proteine', models.DecimalField(decimal_places=4, default=0.05, help_text='Resa in kg di proteine per litro di siero', max_digits=6)),
+                ('prezzo_vendita_siero', models.DecimalField(decimal_places=2, default=0.18, help_text='Prezzo di vendita del siero in €/litro', max_digits=6)),
+                ('costo_distribuzione', models.DecimalField(decimal_places=2, default=15000.0, help_text='Costo di distribuzione in euro', max_digits=10)),
+                ('costi_extra', models.DecimalField(decimal_places=2, default=900000.0, help_text='Costi aggiuntivi annui dello scenario impianto in euro', max_digits=12)),
+                ('predefinito', models.BooleanField(default=False, help_text='Usato quando la richiesta non indica un profilo')),
+                ('attivo', models.BooleanField(default=True)),
+                ('aggiornato_il', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Profilo Costi',
+                'verbose_name_plural': 'Profili Costi',
+                'ordering': ['nome'],
+            },
+        ),
+        migrations.AddField(
+            model_name='simulationinput',
+            name='profilo_costi',
+            field=models.CharField(blank=True, default='', help_text='Nome del profilo di costo applicato', max_length=100),
+        ),
+    ]
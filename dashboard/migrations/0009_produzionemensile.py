@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0008_profilocosti'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProduzioneMensile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('latteria', models.CharField(max_length=100)),
+                ('mese', models.DateField(help_text='Primo giorno del mese di produzione')),
+                ('volume_siero', models.FloatField()),
+                ('capacita_investimento', models.FloatField(default=0)),
+                ('spazio_disponibile', models.FloatField(default=0)),
+                ('tempistiche', models.CharField(blank=True, max_length=10)),
+                ('personale_disponibile', models.CharField(blank=True, max_length=3)),
+                ('profilo_costi', models.CharField(blank=True, max_length=100)),
+                ('kg_proteine', models.FloatField()),
+                ('ricavi_impianto', models.FloatField()),
+                ('costi_impianto', models.FloatField()),
+                ('margine_impianto', models.FloatField()),
+                ('roi_impianto', models.FloatField()),
+                ('payback_years', models.FloatField(blank=True, null=True)),
+                ('ricavi_siero', models.FloatField()),
+                ('costi_siero', models.FloatField()),
+                ('margine_siero', models.FloatField()),
+                ('differenza_margine', models.FloatField()),
+                ('decisione', models.CharField(help_text='Codice della tabella decisionale', max_length=30)),
+                ('importata_il', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Produzione Mensile',
+                'verbose_name_plural': 'Produzioni Mensili',
+                'indexes': [models.Index(fields=['mese'], name='produzione_mese_idx')],
+                'constraints': [models.UniqueConstraint(fields=('latteria', 'mese'), name='produzione_latteria_mese_unica')],
+            },
+        ),
+    ]
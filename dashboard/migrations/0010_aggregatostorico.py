@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:37
+
+from django.db import migrations, models
+
+
+def calcola_aggregati(apps, schema_editor):
+    # Aggregati dello storico già presente
+    from dashboard.aggregati import ricostruisci
+
+    ricostruisci(apps.get_model('dashboard', 'SimulationResult'), apps.get_model('dashboard', 'AggregatoStorico'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0009_produzionemensile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AggregatoStorico',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mese', models.DateField(help_text='Primo giorno del mese di creazione')),
+                ('esito', models.CharField(help_text='Tipo del messaggio decisionale', max_length=10)),
+                ('fascia_volume', models.PositiveSmallIntegerField(help_text='Indice della fascia di volume del siero')),
+                ('conteggio', models.IntegerField(default=0)),
+                ('impianto_conveniente', models.IntegerField(default=0, help_text='Simulazioni con margine impianto superiore a quello della vendita del siero')),
+                ('volume_siero', models.FloatField(default=0)),
+                ('kg_proteine', models.FloatField(default=0)),
+                ('ricavi_impianto', models.FloatField(default=0)),
+                ('costi_impianto', models.FloatField(default=0)),
+                ('margine_impianto', models.FloatField(default=0)),
+                ('ricavi_siero', models.FloatField(default=0)),
+                ('costi_siero', models.FloatField(default=0)),
+                ('margine_siero', models.FloatField(default=0)),
+                ('differenza_margine', models.FloatField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Aggregato Storico',
+                'verbose_name_plural': 'Aggregati Storico',
+                'constraints': [models.UniqueConstraint(fields=('mese', 'esito', 'fascia_volume'), name='aggregato_gruppo_unico')],
+            },
+        ),
+        migrations.RunPython(calcola_aggregati, migrations.RunPython.noop),
+    ]
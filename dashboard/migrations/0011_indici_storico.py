@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0010_aggregatostorico'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='simulationinput',
+            index=models.Index(fields=['created_at'], name='simulazione_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='simulationinput',
+            index=models.Index(fields=['volume_siero'], name='simulazione_volume_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='simulationinput',
+            index=models.Index(fields=['profilo_costi', 'created_at'], name='simulazione_profilo_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='simulationresult',
+            index=models.Index(fields=['tipo_messaggio', 'created_at'], name='risultato_esito_data_idx'),
+        ),
+    ]
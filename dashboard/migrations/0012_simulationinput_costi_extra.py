@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:13
+
+from django.db import migrations, models
+
+
+def costi_extra_dai_profili(apps, schema_editor):
+    """Simulazioni già salvate: costi extra dei profili attuali (quelli usati finora dall'esportazione)"""
+    ProfiloCosti = apps.get_model('dashboard', 'ProfiloCosti')
+    SimulationInput = apps.get_model('dashboard', 'SimulationInput')
+    for nome, costi_extra in ProfiloCosti.objects.values_list('nome', 'costi_extra'):
+        SimulationInput.objects.filter(profilo_costi=nome).update(costi_extra=costi_extra)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0011_indici_storico'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='simulationinput',
+            name='costi_extra',
+            field=models.DecimalField(decimal_places=2, default=900000.0, help_text='Costi aggiuntivi annui dello scenario impianto applicati alla simulazione', max_digits=12),
+        ),
+        migrations.RunPython(costi_extra_dai_profili, migrations.RunPython.noop),
+    ]
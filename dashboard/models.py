@@ -1,5 +1,15 @@
+from django.conf import settings
 from django.db import models
-from decimal import Decimal
+from . import engine
+
+
+def soglie_decisionali():
+    """Soglie della tabella decisionale (configurabili nei settings)"""
+    return {
+        'soglia_budget': getattr(settings, 'DASHBOARD_SOGLIA_BUDGET', engine.SOGLIA_BUDGET),
+        'soglia_spazio': getattr(settings, 'DASHBOARD_SOGLIA_SPAZIO', engine.SOGLIA_SPAZIO),
+    }
+
 
 class SimulationInput(models.Model):
     """Modello per memorizzare i parametri di input della simulazione"""
@@ -88,104 +98,277 @@ class SimulationInput(models.Model):
         help_text="Personale disponibile per gestire l'impianto"
     )
     
+    # Profilo di costo usato per la simulazione (vuoto: valori fissi del motore)
+    profilo_costi = models.CharField(
+        max_length=100,
+        blank=True,
+        default='',
+        help_text="Nome del profilo di costo applicato"
+    )
+    costi_extra = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=engine.COSTI_EXTRA_IMPIANTO,
+        help_text="Costi aggiuntivi annui dello scenario impianto applicati alla simulazione"
+    )
+    
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         verbose_name = "Input Simulazione"
         verbose_name_plural = "Input Simulazioni"
+        indexes = [
+            # Storico per intervallo di date (esportazione, admin) e per volume
+            models.Index(fields=['created_at'], name='simulazione_created_at_idx'),
+            models.Index(fields=['volume_siero'], name='simulazione_volume_idx'),
+            models.Index(fields=['profilo_costi', 'created_at'], name='simulazione_profilo_data_idx'),
+        ]
         
     def __str__(self):
         return f"Simulazione {self.id} - {self.volume_siero}L siero"
     
+    def input_data(self):
+        """
+        Input nel formato della dashboard (eco `input_data`), con il profilo
+        e i costi extra salvati con la simulazione.
+        """
+        # Stesso ordine dei campi dell'eco delle view
+        input_data = {campo: float(getattr(self, campo) or 0) for campo in engine.CAMPI_NUMERICI}
+        input_data.update(
+            tempistiche=self.tempistiche or '',
+            spazio_disponibile=float(self.spazio_disponibile or 0),
+            personale_disponibile=self.personale_disponibile or '',
+        )
+        if self.profilo_costi:
+            input_data['profilo'] = self.profilo_costi
+        costi_extra = float(self.costi_extra)
+        if self.profilo_costi or costi_extra != engine.COSTI_EXTRA_IMPIANTO:
+            input_data['costi_extra'] = costi_extra
+        return input_data
+    
+    def valutatore(self):
+        """Grafo del motore per questa simulazione: stesse formule e soglie della dashboard"""
+        return engine.Valutatore(self.input_data(), **soglie_decisionali())
+    
     def calcola_scenario_impianto(self):
-        """Calcola i risultati per lo scenario acquisto impianto"""
-        kg_proteine = self.volume_siero * self.resa_proteine
-        ricavi_proteine = kg_proteine * self.prezzo_vendita_proteine
-        
-        # Assumiamo ammortamento su 10 anni per semplicità
-        ammortamento_annuo = self.costo_impianto / 10
-        costi_totali = ammortamento_annuo + self.costi_operativi_annui
-        
-        margine_netto = ricavi_proteine - costi_totali
-        roi = (margine_netto / self.costo_impianto) * 100 if self.costo_impianto > 0 else 0
-        
-        return {
-            'ricavi': float(ricavi_proteine),
-            'costi': float(costi_totali),
-            'margine_netto': float(margine_netto),
-            'roi': float(roi),
-            'kg_proteine': float(kg_proteine)
-        }
+        """Risultati dello scenario acquisto impianto (sezione `scenario_impianto` del payload)"""
+        return self.valutatore().sezione('scenario_impianto')
     
     def calcola_scenario_vendita_siero(self):
-        """Calcola i risultati per lo scenario vendita siero"""
-        ricavi_siero = self.volume_siero * self.prezzo_vendita_siero
-        
-        # Costi minimi per la vendita del siero (trasporto, gestione, ecc.)
-        costi_vendita = ricavi_siero * Decimal('0.10')  # 10% dei ricavi
-        
-        margine_netto = ricavi_siero - costi_vendita
-        
-        return {
-            'ricavi': float(ricavi_siero),
-            'costi': float(costi_vendita),
-            'margine_netto': float(margine_netto),
-            'roi': 0  # Nessun investimento iniziale
-        }
+        """Risultati dello scenario vendita siero (sezione `scenario_siero` del payload)"""
+        return self.valutatore().sezione('scenario_siero')
     
     def calcola_messaggio_decisionale(self):
-        """Calcola il messaggio decisionale basato sui parametri di input"""
-        # Calcola il budget rimanente
-        budget_rimanente = (self.capacita_investimento - 
-                          self.costo_impianto - 
-                          self.costi_operativi_annui - 
-                          self.costo_distribuzione)
-        
-        tempistiche_value = self.tempistiche or ''
-        spazio_value = float(self.spazio_disponibile or 0)
-        personale_value = self.personale_disponibile or ''
-        
-        # Logica decisionale
-        if (budget_rimanente >= 500000 and 
-            tempistiche_value != 'breve' and 
-            spazio_value >= 50 and 
-            personale_value == 'Si'):
-            messaggio = "È possibile acquistare l'impianto per ricavare le proteine dal siero del latte"
-            tipo_messaggio = "success"
-            
-        elif (budget_rimanente >= 500000 and 
-              tempistiche_value != 'breve' and 
-              spazio_value >= 50 and 
-              personale_value == 'No'):
-            messaggio = "È possibile acquistare l'impianto per ricavare le proteine dal siero del latte, tuttavia, è necessario assumere del personale per gestire l'impianto"
-            tipo_messaggio = "warning"
-            
-        elif (budget_rimanente >= 500000 and 
-              tempistiche_value != 'breve' and 
-              spazio_value <= 50 and 
-              personale_value == 'Si'):
-            messaggio = "È possibile acquistare l'impianto per ricavare le proteine dal siero del latte, tuttavia, è necessario acquistare nuovi spazi per installare l'impianto"
-            tipo_messaggio = "warning"
-            
-        elif (budget_rimanente >= 500000 and 
-              tempistiche_value != 'breve' and 
-              spazio_value <= 50 and 
-              personale_value == 'No'):
-            messaggio = "È possibile acquistare l'impianto per ricavare le proteine dal siero del latte, tuttavia, è necessario assumere del personale per gestire l'impianto e acquistare nuovi spazi per la sua installazione"
-            tipo_messaggio = "warning"
-            
-        else:
-            messaggio = "È consigliabile vendere direttamente il siero del latte a chi è dotato dell'impianto"
-            tipo_messaggio = "info"
-        
+        """Messaggio decisionale basato sui parametri di input"""
+        return self.valutatore().sezione('messaggio_decisionale')
+
+
+class SimulationResult(models.Model):
+    """Risultati calcolati di una simulazione, denormalizzati in float per lo storico"""
+    simulazione = models.OneToOneField(
+        SimulationInput,
+        on_delete=models.CASCADE,
+        related_name='risultato'
+    )
+    created_at = models.DateTimeField()
+    
+    # Input principali (copiati per interrogare lo storico senza join)
+    volume_siero = models.FloatField()
+    capacita_investimento = models.FloatField()
+    spazio_disponibile = models.FloatField()
+    
+    # Scenario impianto
+    kg_proteine = models.FloatField()
+    ricavi_impianto = models.FloatField()
+    costi_impianto = models.FloatField()
+    margine_impianto = models.FloatField()
+    roi_impianto = models.FloatField()
+    payback_years = models.FloatField(null=True, blank=True)
+    
+    # Scenario siero
+    ricavi_siero = models.FloatField()
+    costi_siero = models.FloatField()
+    margine_siero = models.FloatField()
+    
+    differenza_margine = models.FloatField()
+    tipo_messaggio = models.CharField(max_length=10)
+    
+    class Meta:
+        verbose_name = "Risultato Simulazione"
+        verbose_name_plural = "Risultati Simulazioni"
+        indexes = [
+            models.Index(fields=['created_at'], name='risultato_created_at_idx'),
+            models.Index(fields=['volume_siero'], name='risultato_volume_idx'),
+            models.Index(fields=['tipo_messaggio', 'created_at'], name='risultato_esito_data_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Risultato simulazione {self.simulazione_id}"
+
+
+class ProfiloCosti(models.Model):
+    """
+    Profilo di costo dell'impianto (offerta di un fornitore o di una regione)
+    che sostituisce i valori fissi del motore nelle simulazioni.
+    """
+    nome = models.CharField(max_length=100, unique=True)
+    fornitore = models.CharField(max_length=100, blank=True)
+    regione = models.CharField(max_length=100, blank=True)
+    
+    costo_impianto = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=engine.COSTO_IMPIANTO,
+        help_text="Costo dell'impianto in euro"
+    )
+    costi_operativi_annui = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=engine.COSTI_OPERATIVI_ANNUI,
+        help_text="Costi operativi annui in euro"
+    )
+    prezzo_vendita_proteine = models.DecimalField(
+        max_digits=8,
+        decimal_places=2,
+        default=engine.PREZZO_VENDITA_PROTEINE,
+        help_text="Prezzo di vendita proteine in €/kg"
+    )
+    resa_proteine = models.DecimalField(
+        max_digits=6,
+        decimal_places=4,
+        default=engine.RESA_PROTEINE,
+        help_text="Resa in kg di proteine per litro di siero"
+    )
+    prezzo_vendita_siero = models.DecimalField(
+        max_digits=6,
+        decimal_places=2,
+        default=engine.PREZZO_VENDITA_SIERO,
+        help_text="Prezzo di vendita del siero in €/litro"
+    )
+    costo_distribuzione = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=engine.COSTO_DISTRIBUZIONE,
+        help_text="Costo di distribuzione in euro"
+    )
+    costi_extra = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=engine.COSTI_EXTRA_IMPIANTO,
+        help_text="Costi aggiuntivi annui dello scenario impianto in euro"
+    )
+    
+    predefinito = models.BooleanField(
+        default=False,
+        help_text="Usato quando la richiesta non indica un profilo"
+    )
+    attivo = models.BooleanField(default=True)
+    aggiornato_il = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Profilo Costi"
+        verbose_name_plural = "Profili Costi"
+        ordering = ['nome']
+    
+    def __str__(self):
+        return self.nome
+    
+    def save(self, *args, **kwargs):
+        # Un solo profilo predefinito: gli altri perdono il flag
+        if self.predefinito:
+            ProfiloCosti.objects.filter(predefinito=True).exclude(pk=self.pk).update(predefinito=False)
+        super().save(*args, **kwargs)
+    
+    def valori(self):
+        """Costanti di costo del profilo nel formato di `engine.VALORI_FISSI` (più costi_extra)"""
         return {
-            'messaggio': messaggio,
-            'tipo_messaggio': tipo_messaggio,
-            'budget_rimanente': float(budget_rimanente),
-            'dettagli': {
-                'budget_rimanente': float(budget_rimanente),
-                'tempistiche': tempistiche_value,
-                'spazio': float(spazio_value),
-                'personale': personale_value
-            }
+            campo: float(getattr(self, campo))
+            for campo in (*engine.VALORI_FISSI, 'costi_extra')
         }
+
+
+class ProduzioneMensile(models.Model):
+    """
+    Volume mensile di siero di una latteria (importato da CSV) con gli
+    scenari calcolati, denormalizzati in float come SimulationResult.
+    Una sola riga per latteria e mese: una nuova importazione la sostituisce.
+    """
+    latteria = models.CharField(max_length=100)
+    mese = models.DateField(help_text="Primo giorno del mese di produzione")
+    
+    # Input
+    volume_siero = models.FloatField()
+    capacita_investimento = models.FloatField(default=0)
+    spazio_disponibile = models.FloatField(default=0)
+    tempistiche = models.CharField(max_length=10, blank=True)
+    personale_disponibile = models.CharField(max_length=3, blank=True)
+    profilo_costi = models.CharField(max_length=100, blank=True)
+    
+    # Scenario impianto
+    kg_proteine = models.FloatField()
+    ricavi_impianto = models.FloatField()
+    costi_impianto = models.FloatField()
+    margine_impianto = models.FloatField()
+    roi_impianto = models.FloatField()
+    payback_years = models.FloatField(null=True, blank=True)
+    
+    # Scenario siero
+    ricavi_siero = models.FloatField()
+    costi_siero = models.FloatField()
+    margine_siero = models.FloatField()
+    
+    differenza_margine = models.FloatField()
+    decisione = models.CharField(max_length=30, help_text="Codice della tabella decisionale")
+    importata_il = models.DateTimeField()
+    
+    class Meta:
+        verbose_name = "Produzione Mensile"
+        verbose_name_plural = "Produzioni Mensili"
+        constraints = [
+            models.UniqueConstraint(fields=['latteria', 'mese'], name='produzione_latteria_mese_unica'),
+        ]
+        indexes = [
+            models.Index(fields=['mese'], name='produzione_mese_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.latteria} - {self.mese:%Y-%m}"
+
+
+class AggregatoStorico(models.Model):
+    """
+    Aggregati materializzati dello storico delle simulazioni: conteggi e
+    somme dei risultati per mese, esito (tipo di messaggio) e fascia di
+    volume. Aggiornati a ogni scrittura di SimulationResult (vedi
+    dashboard.aggregati), servono i grafici dello storico senza rileggerlo.
+    """
+    mese = models.DateField(help_text="Primo giorno del mese di creazione")
+    esito = models.CharField(max_length=10, help_text="Tipo del messaggio decisionale")
+    fascia_volume = models.PositiveSmallIntegerField(help_text="Indice della fascia di volume del siero")
+    
+    conteggio = models.IntegerField(default=0)
+    impianto_conveniente = models.IntegerField(
+        default=0,
+        help_text="Simulazioni con margine impianto superiore a quello della vendita del siero"
+    )
+    
+    # Somme dei risultati delle simulazioni del gruppo
+    volume_siero = models.FloatField(default=0)
+    kg_proteine = models.FloatField(default=0)
+    ricavi_impianto = models.FloatField(default=0)
+    costi_impianto = models.FloatField(default=0)
+    margine_impianto = models.FloatField(default=0)
+    ricavi_siero = models.FloatField(default=0)
+    costi_siero = models.FloatField(default=0)
+    margine_siero = models.FloatField(default=0)
+    differenza_margine = models.FloatField(default=0)
+    
+    class Meta:
+        verbose_name = "Aggregato Storico"
+        verbose_name_plural = "Aggregati Storico"
+        constraints = [
+            models.UniqueConstraint(fields=['mese', 'esito', 'fascia_volume'], name='aggregato_gruppo_unico'),
+        ]
+    
+    def __str__(self):
+        return f"{self.mese:%Y-%m} {self.esito} fascia {self.fascia_volume}"
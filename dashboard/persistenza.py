@@ -0,0 +1,317 @@
+"""
+Persistenza dello storico delle simulazioni (write-behind).
+
+Ogni simulazione calcolata viene registrata con `registra`: le voci entrano
+in una coda limitata in memoria e un thread in background le scrive con
+`bulk_create` (SimulationInput + SimulationResult) in una sola transazione
+quando il blocco raggiunge `DASHBOARD_STORICO_BLOCCO` voci oppure dopo
+`DASHBOARD_STORICO_INTERVALLO` secondi dalla prima voce in attesa.
+
+Se la coda è piena le nuove voci vengono scartate (e contate) invece di
+bloccare la richiesta. Un blocco che non si riesce a salvare viene diviso a
+metà fino a isolare le simulazioni non valide: solo queste sono scartate
+(contate in `errori` e riportate nel log).
+
+Alla chiusura del processo la coda viene svuotata; `svuota()` (o il comando
+`svuota_storico`, ad esempio con `call_command` nei test) forza la scrittura
+immediata delle voci in attesa nel processo.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from . import aggregati, engine, serializzazione
+from .models import SimulationInput, SimulationResult
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONE_BATCH = 500
+
+# Campi di SimulationInput valorizzati dall'eco `input_data`
+CAMPI_SIMULAZIONE = (
+    'volume_siero',
+    'capacita_investimento',
+    'costo_impianto',
+    'costi_operativi_annui',
+    'prezzo_vendita_proteine',
+    'resa_proteine',
+    'prezzo_vendita_siero',
+    'costo_distribuzione',
+    'tempistiche',
+    'spazio_disponibile',
+    'personale_disponibile',
+)
+
+# Sezioni del payload lette da `crea_istanze`
+SEZIONI_STORICO = ('scenario_impianto', 'scenario_siero', 'messaggio_decisionale', 'comparazione', 'kpi')
+
+
+def massimo_colonna(campo):
+    """Valore più grande memorizzabile nella colonna decimale `campo` di SimulationInput"""
+    colonna = SimulationInput._meta.get_field(campo)
+    return round(10.0 ** (colonna.max_digits - colonna.decimal_places) - 10.0 ** -colonna.decimal_places,
+                 colonna.decimal_places)
+
+
+# Massimo di ciascuna colonna decimale valorizzata da `crea_istanze`
+MASSIMI_COLONNE = {
+    campo: massimo_colonna(campo)
+    for campo in (*CAMPI_SIMULAZIONE, 'costi_extra')
+    if SimulationInput._meta.get_field(campo).get_internal_type() == 'DecimalField'
+}
+
+
+def fuori_colonna(input_data):
+    """Campi di `input_data` non finiti o troppo grandi per le colonne decimali dello storico"""
+    return [
+        campo for campo, massimo in MASSIMI_COLONNE.items()
+        if campo in input_data and not abs(float(input_data[campo])) <= massimo
+    ]
+
+
+def crea_istanze(input_data, simulation_data):
+    """
+    Coppia (SimulationInput, SimulationResult) non salvata per una simulazione.
+    ValueError se un input non entra nella sua colonna decimale.
+    """
+    campi_non_validi = fuori_colonna(input_data)
+    if campi_non_validi:
+        raise ValueError(f"Valori fuori dai limiti delle colonne: {', '.join(campi_non_validi)}")
+    if isinstance(simulation_data, (bytes, str)):
+        simulation_data = serializzazione.da_json(simulation_data)
+
+    simulazione = SimulationInput(**{campo: input_data[campo] for campo in CAMPI_SIMULAZIONE})
+    simulazione.profilo_costi = input_data.get('profilo', '')
+    # Costi extra applicati: l'esportazione li rilegge invece di usare il profilo corrente
+    simulazione.costi_extra = input_data.get('costi_extra', engine.COSTI_EXTRA_IMPIANTO)
+
+    impianto = simulation_data['scenario_impianto']
+    siero = simulation_data['scenario_siero']
+    payback = simulation_data['kpi']['payback_years']
+    risultato = SimulationResult(
+        volume_siero=input_data['volume_siero'],
+        capacita_investimento=input_data['capacita_investimento'],
+        spazio_disponibile=input_data['spazio_disponibile'],
+        kg_proteine=impianto['kg_proteine'],
+        ricavi_impianto=impianto['ricavi'],
+        costi_impianto=impianto['costi'],
+        margine_impianto=impianto['margine_netto'],
+        roi_impianto=impianto['roi'],
+        payback_years=None if payback == 999 else payback,  # 999 = non recuperabile
+        ricavi_siero=siero['ricavi'],
+        costi_siero=siero['costi'],
+        margine_siero=siero['margine_netto'],
+        differenza_margine=simulation_data['comparazione']['differenza_margine'],
+        tipo_messaggio=simulation_data['messaggio_decisionale']['tipo_messaggio'],
+    )
+    return simulazione, risultato
+
+
+def salva_in_blocco(voci, batch_size=DIMENSIONE_BATCH):
+    """
+    Scrive una lista di coppie (input_data, simulation_data) con bulk_create
+    in un'unica transazione, aggiornando gli aggregati dello storico.
+    Restituisce il numero di simulazioni salvate.
+    """
+    if not voci:
+        return 0
+
+    coppie = [crea_istanze(input_data, simulation_data) for input_data, simulation_data in voci]
+    simulazioni = [simulazione for simulazione, _ in coppie]
+
+    with transaction.atomic():
+        SimulationInput.objects.bulk_create(simulazioni, batch_size=batch_size)
+        risultati = []
+        for simulazione, risultato in coppie:
+            risultato.simulazione = simulazione
+            risultato.created_at = simulazione.created_at
+            risultati.append(risultato)
+        SimulationResult.objects.bulk_create(risultati, batch_size=batch_size)
+        aggregati.aggiungi(risultati)
+
+    return len(coppie)
+
+
+class CodaScrittura:
+    """Buffer write-behind con coda limitata e scrittura a blocchi"""
+    
+    def __init__(self, capacita, dimensione_blocco, intervallo):
+        self.dimensione_blocco = dimensione_blocco
+        self.intervallo = intervallo
+        self._coda = queue.Queue(maxsize=capacita)
+        self._lock = threading.Lock()
+        self._lock_scrittura = threading.Lock()
+        self._svuotamento = threading.Event()
+        self._thread = None
+        self._statistiche = {'accodate': 0, 'scritte': 0, 'scartate': 0, 'blocchi': 0, 'errori': 0}
+    
+    def _conta(self, nome, quantita=1):
+        with self._lock:
+            self._statistiche[nome] += quantita
+    
+    def statistiche(self):
+        with self._lock:
+            valori = dict(self._statistiche)
+        valori['in_coda'] = self._coda.qsize()
+        return valori
+    
+    def registra(self, voci):
+        """Accoda le voci senza bloccare; restituisce quante sono state accettate"""
+        accettate = 0
+        for voce in voci:
+            try:
+                self._coda.put_nowait(voce)
+                accettate += 1
+            except queue.Full:
+                break
+        
+        self._conta('accodate', accettate)
+        if accettate < len(voci):
+            self._conta('scartate', len(voci) - accettate)
+            logger.warning("Coda storico piena: %d simulazioni scartate", len(voci) - accettate)
+        
+        self._avvia()
+        return accettate
+    
+    def _avvia(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._ciclo, name='storico-simulazioni', daemon=True
+                )
+                self._thread.start()
+    
+    def _preleva_blocco(self):
+        """Attende la prima voce, poi raccoglie fino a blocco pieno o scadenza"""
+        blocco = [self._coda.get()]
+        scadenza = time.monotonic() + self.intervallo
+        while len(blocco) < self.dimensione_blocco and not self._svuotamento.is_set():
+            resto = scadenza - time.monotonic()
+            if resto <= 0:
+                break
+            try:
+                blocco.append(self._coda.get(timeout=min(resto, 0.1)))
+            except queue.Empty:
+                continue
+        return blocco
+    
+    def _ciclo(self):
+        while True:
+            self._scrivi(self._preleva_blocco())
+    
+    def _scrivi(self, blocco):
+        try:
+            with self._lock_scrittura:
+                self._salva(blocco)
+        finally:
+            close_old_connections()
+            for _ in blocco:
+                self._coda.task_done()
+    
+    def _salva(self, voci):
+        """
+        Salva un blocco; se non riesce lo divide a metà e riprova, così una
+        simulazione non valida scarta solo sé stessa (errori = voci scartate).
+        """
+        try:
+            self._conta('scritte', salva_in_blocco(voci))
+            self._conta('blocchi')
+        except Exception:
+            if len(voci) > 1:
+                logger.warning("Salvataggio di %d simulazioni non riuscito: nuovo tentativo a metà", len(voci))
+                meta = len(voci) // 2
+                self._salva(voci[:meta])
+                self._salva(voci[meta:])
+                return
+            self._conta('errori')
+            logger.exception("Simulazione scartata dallo storico: %r", voci[0][0])
+    
+    def svuota(self):
+        """Scrive subito tutte le voci in coda e attende quelle già prelevate"""
+        self._svuotamento.set()
+        try:
+            while True:
+                blocco = []
+                while len(blocco) < self.dimensione_blocco:
+                    try:
+                        blocco.append(self._coda.get_nowait())
+                    except queue.Empty:
+                        break
+                if not blocco:
+                    break
+                self._scrivi(blocco)
+            # Eventuale blocco in scrittura nel thread in background
+            self._coda.join()
+        finally:
+            self._svuotamento.clear()
+
+
+_coda = None
+_lock_coda = threading.Lock()
+
+
+def coda():
+    """Coda di scrittura del processo, creata al primo utilizzo dai settings"""
+    global _coda
+    if _coda is None:
+        with _lock_coda:
+            if _coda is None:
+                _coda = CodaScrittura(
+                    capacita=getattr(settings, 'DASHBOARD_STORICO_CAPACITA', 50000),
+                    dimensione_blocco=getattr(settings, 'DASHBOARD_STORICO_BLOCCO', DIMENSIONE_BATCH),
+                    intervallo=getattr(settings, 'DASHBOARD_STORICO_INTERVALLO', 2.0),
+                )
+                atexit.register(_coda.svuota)
+    return _coda
+
+
+def attivo():
+    """True se le simulazioni calcolate vengono salvate nello storico"""
+    return getattr(settings, 'DASHBOARD_STORICO_ATTIVO', True)
+
+
+def registra(voci):
+    """
+    Accoda una o più simulazioni (coppie input_data, simulation_data) per il
+    salvataggio. simulation_data può essere il dizionario (almeno con le
+    SEZIONI_STORICO) o i byte JSON.
+    """
+    if not attivo():
+        return
+    if not getattr(settings, 'DASHBOARD_PERSISTENZA_ASINCRONA', True):
+        salva_in_blocco(voci)
+        return
+    
+    coda().registra(voci)
+
+
+async def aregistra(voci):
+    """Variante di `registra` per le view asincrone"""
+    if not attivo():
+        return
+    if not getattr(settings, 'DASHBOARD_PERSISTENZA_ASINCRONA', True):
+        await sync_to_async(salva_in_blocco)(voci)
+        return
+    
+    coda().registra(voci)
+
+
+def svuota():
+    """Forza la scrittura di tutte le simulazioni in attesa"""
+    if _coda is not None:
+        _coda.svuota()
+
+
+def statistiche():
+    """Contatori della coda di scrittura del processo corrente"""
+    if _coda is None:
+        return {'accodate': 0, 'scritte': 0, 'scartate': 0, 'blocchi': 0, 'errori': 0, 'in_coda': 0}
+    return _coda.statistiche()
@@ -0,0 +1,112 @@
+"""
+Profili di costo (ProfiloCosti) in cache nel processo.
+
+I profili attivi vengono letti dal database al primo utilizzo e poi serviti
+dalla memoria: le richieste non interrogano il database. I segnali
+post_save/post_delete del modello svuotano la cache del processo che ha
+fatto la modifica; gli altri processi (più worker) rileggono i profili al
+più dopo `DASHBOARD_PROFILI_TTL` secondi.
+
+Senza profili (o senza un profilo predefinito) le simulazioni usano i
+valori fissi del motore.
+"""
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError
+
+from .models import ProfiloCosti
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_generazione = 0
+# (valori per nome, nome del predefinito, scadenza) oppure None se da rileggere
+_stato = None
+
+
+def _ttl():
+    return getattr(settings, 'DASHBOARD_PROFILI_TTL', 60.0)
+
+
+def _carica():
+    profili = {}
+    predefinito = ''
+    try:
+        for profilo in ProfiloCosti.objects.filter(attivo=True):
+            profili[profilo.nome] = profilo.valori()
+            if profilo.predefinito:
+                predefinito = profilo.nome
+    except DatabaseError:
+        # Es. migrazioni non ancora applicate: si usano i valori fissi
+        logger.warning("Profili di costo non disponibili", exc_info=True)
+        return {}, ''
+    return profili, predefinito
+
+
+def _profili():
+    stato = _stato
+    if stato is not None and time.monotonic() < stato[2]:
+        return stato
+    return _ricarica()
+
+
+def _ricarica():
+    global _stato
+    generazione = _generazione
+    profili, predefinito = _carica()
+    stato = (profili, predefinito, time.monotonic() + _ttl())
+    with _lock:
+        # Una modifica arrivata durante la lettura rende il risultato obsoleto
+        if generazione == _generazione:
+            _stato = stato
+    return stato
+
+
+def invalida(**kwargs):
+    """Svuota la cache (ricevitore dei segnali di ProfiloCosti)"""
+    global _stato, _generazione
+    with _lock:
+        _generazione += 1
+        _stato = None
+
+
+async def aprepara():
+    """
+    Profili per una view asincrona, letti fuori dal ciclo di eventi se non
+    sono in cache. Il risultato va passato a `risolvi`: così la richiesta
+    non interroga il database anche se la cache viene invalidata (o scade)
+    prima della validazione.
+    """
+    stato = _stato
+    if stato is None or time.monotonic() >= stato[2]:
+        stato = await sync_to_async(_ricarica)()
+    return stato
+
+
+def nomi():
+    """Nomi dei profili attivi e nome del predefinito ('' se assente)"""
+    profili, predefinito, _ = _profili()
+    return sorted(profili), predefinito
+
+
+def valori(nome):
+    """Costanti di costo del profilo `nome` (KeyError se sconosciuto o non attivo)"""
+    return _profili()[0][nome]
+
+
+def risolvi(nome='', caricati=None):
+    """
+    Coppia (nome, valori) del profilo richiesto o, con `nome` vuoto, del
+    profilo predefinito; ('', None) se non ce n'è uno: valori fissi del
+    motore. KeyError se il profilo richiesto non esiste. `caricati` sono i
+    profili restituiti da `aprepara` (default: quelli in cache).
+    """
+    profili, predefinito, _ = caricati or _profili()
+    nome = nome or predefinito
+    if not nome:
+        return '', None
+    return nome, profili[nome]
@@ -0,0 +1,108 @@
+"""
+Serializzazione JSON delle risposte di simulazione.
+
+I payload vengono convertiti in byte una sola volta (poi riusati da cache,
+risposta AJAX ed embed nella pagina HTML). Se `orjson` è installato viene
+usato al posto del modulo standard `json`; in entrambi i casi l'output è
+compatto (senza spazi), in UTF-8, e con `<`, `>` e `&` escapati così che i
+byte siano inseribili direttamente in un tag <script>.
+
+`in_colonne` produce il formato colonnare dei batch: un elenco per campo
+(chiavi annidate unite con il punto) invece di un oggetto per simulazione.
+`differenze` calcola il delta tra due payload (JSON Merge Patch) usato
+dalla modalità what-if della dashboard.
+"""
+import json
+
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:  # dipendenza opzionale
+    orjson = None
+
+MOTORE = 'orjson' if orjson is not None else 'json'
+
+# Segnaposto per le chiavi mancanti in `differenze`
+_ASSENTE = object()
+
+# Escape dei caratteri significativi per l'HTML (validi in qualsiasi stringa JSON)
+_ESCAPE_HTML = ((b'&', b'\\u0026'), (b'<', b'\\u003c'), (b'>', b'\\u003e'))
+
+
+def _escape_html(contenuto):
+    for carattere, sostituto in _ESCAPE_HTML:
+        if carattere in contenuto:
+            contenuto = contenuto.replace(carattere, sostituto)
+    return contenuto
+
+
+if orjson is not None:
+    def _dumps(dati):
+        return orjson.dumps(dati, option=orjson.OPT_SERIALIZE_NUMPY)
+
+    da_json = orjson.loads
+else:
+    def _dumps(dati):
+        return json.dumps(dati, separators=(',', ':'), ensure_ascii=False).encode()
+
+    da_json = json.loads
+
+
+def in_json(dati):
+    """Byte JSON compatti di `dati`, sicuri da inserire in una pagina HTML"""
+    return _escape_html(_dumps(dati))
+
+
+def in_ndjson(elementi):
+    """Byte NDJSON: un oggetto JSON per riga"""
+    return b''.join(in_json(elemento) + b'\n' for elemento in elementi)
+
+
+def _colonne(righe, prefisso, colonne):
+    # righe: dizionari ({} per le righe senza il ramo corrente)
+    campi = {}
+    for riga in righe:
+        campi.update(dict.fromkeys(riga))
+    for campo in campi:
+        valori = [riga.get(campo) for riga in righe]
+        # La struttura di un campo è la stessa in tutte le righe che lo hanno
+        if isinstance(next((valore for valore in valori if valore is not None), None), dict):
+            _colonne([valore or {} for valore in valori], f"{prefisso}{campo}.", colonne)
+        else:
+            colonne[f"{prefisso}{campo}"] = valori
+    return colonne
+
+
+def in_colonne(risultati):
+    """
+    Formato colonnare di una lista di payload: {campo: [valore per riga]},
+    con i campi annidati appiattiti ('scenario_impianto.ricavi') e None
+    dove una riga non ha il campo (es. le righe in errore).
+    """
+    return _colonne(risultati, '', {})
+
+
+def differenze(precedente, corrente):
+    """
+    Delta tra due payload nel formato JSON Merge Patch (RFC 7396): solo le
+    chiavi cambiate, ricorsivamente negli oggetti; liste e valori sono
+    sostituiti per intero e None indica una chiave rimossa.
+    """
+    delta = {}
+    for campo, valore in corrente.items():
+        vecchio = precedente.get(campo, _ASSENTE)
+        if isinstance(valore, dict) and isinstance(vecchio, dict):
+            annidato = differenze(vecchio, valore)
+            if annidato:
+                delta[campo] = annidato
+        elif valore != vecchio or type(valore) is not type(vecchio):
+            delta[campo] = valore
+    for campo in precedente.keys() - corrente.keys():
+        delta[campo] = None
+    return delta
+
+
+def risposta_json(dati, status=200):
+    """HttpResponse JSON serializzata con `in_json`"""
+    return HttpResponse(in_json(dati), content_type='application/json', status=status)
@@ -0,0 +1,215 @@
+"""
+File statici: nomi con hash, precompressione e cache a lungo termine.
+
+`StaticiCompressi` (STORAGES['staticfiles']) è una ManifestStaticFilesStorage
+che in `collectstatic` scrive accanto a ogni file testuale le versioni `.gz`
+e, se il modulo `brotli` è installato, `.br` (compressione massima, fatta una
+volta sola invece che a ogni richiesta). Finché `collectstatic` non ha
+scritto il manifest (sviluppo, test) i template usano i nomi originali; con
+il manifest presente un file che non vi compare è un errore (manifest_strict).
+Il check di deploy `dashboard.E001` segnala il manifest mancante.
+
+`servizio_statici` è il middleware che serve STATIC_ROOT quando Django non è
+dietro un web server (DASHBOARD_SERVI_STATICI, default con DEBUG disattivo):
+sceglie la variante compressa in base ad Accept-Encoding, risponde 304 agli
+ETag già noti e marca i file con hash come immutabili per un anno, così che
+le visite successive non scarichino nulla.
+"""
+import gzip
+import json
+import logging
+import mimetypes
+import os
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core import checks
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.decorators import sync_and_async_middleware
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:  # dipendenza opzionale: solo gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+ESTENSIONI_COMPRIMIBILI = ('.css', '.js', '.svg', '.json', '.map', '.txt', '.html', '.ttf', '.eot')
+
+# Compressione scartata se non riduce il file almeno del 5%
+RAPPORTO_MINIMO = 0.95
+
+# Cache-Control: file con hash nel nome (immutabili) e nomi originali
+CACHE_IMMUTABILE = 'public, max-age=31536000, immutable'
+CACHE_BREVE = 'public, max-age=60'
+
+# Codifiche in ordine di preferenza: Content-Encoding -> estensione del file
+CODIFICHE = {'br': '.br', 'gzip': '.gz'}
+
+
+def comprimi(contenuto):
+    """Varianti compresse di `contenuto` che valgono la pena: {codifica: byte}"""
+    varianti = {'gzip': gzip.compress(contenuto, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        varianti['br'] = brotli.compress(contenuto, quality=11)
+    return {
+        codifica: compresso for codifica, compresso in varianti.items()
+        if len(compresso) < len(contenuto) * RAPPORTO_MINIMO
+    }
+
+
+class StaticiCompressi(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage con precompressione gzip/brotli in collectstatic"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        con_hash = set(self.hashed_files.values())
+        for nome in sorted({*paths, *con_hash}):
+            if nome.endswith(ESTENSIONI_COMPRIMIBILI) and self.exists(nome):
+                self._comprimi(nome, nome in con_hash)
+
+    def _comprimi(self, nome, con_hash):
+        percorso = self.path(nome)
+        modificato = os.path.getmtime(percorso)
+        estensioni = [estensione for codifica, estensione in CODIFICHE.items() if codifica != 'br' or brotli]
+        # Varianti già scritte da un collectstatic precedente: con l'hash nel
+        # nome il contenuto non può essere cambiato (il file viene però riscritto)
+        if all(
+            os.path.exists(percorso + e) and (con_hash or os.path.getmtime(percorso + e) >= modificato)
+            for e in estensioni
+        ):
+            return
+        with open(percorso, 'rb') as file:
+            varianti = comprimi(file.read())
+        for codifica, compresso in varianti.items():
+            with open(percorso + CODIFICHE[codifica], 'wb') as file:
+                file.write(compresso)
+
+    def manifest_presente(self):
+        return bool(self.hashed_files) or self.manifest_storage.exists(self.manifest_name)
+
+    def stored_name(self, name):
+        if not self.manifest_presente():
+            # collectstatic non eseguito (sviluppo, test): nome originale
+            return name
+        return super().stored_name(name)
+
+
+def controlla_manifest(app_configs, **kwargs):
+    """Check di deploy: senza manifest le pagine userebbero i nomi senza hash"""
+    if isinstance(staticfiles_storage, StaticiCompressi) and not staticfiles_storage.manifest_presente():
+        return [checks.Error(
+            f"Manifest dei file statici assente in {settings.STATIC_ROOT}",
+            hint="Eseguire `manage.py collectstatic` prima del deploy.",
+            id='dashboard.E001',
+        )]
+    return []
+
+
+class _File:
+    """Un file statico servito: contenuto (per codifica) letto al primo uso"""
+
+    def __init__(self, percorso, immutabile):
+        self.percorso = percorso
+        self.immutabile = immutabile
+        self.content_type = mimetypes.guess_type(percorso)[0] or 'application/octet-stream'
+        self.codifiche = [
+            codifica for codifica, estensione in CODIFICHE.items() if os.path.exists(percorso + estensione)
+        ]
+        self._varianti = {}
+
+    def variante(self, codifica):
+        """(contenuto, etag, ultima modifica) della variante con `codifica` ('' = originale)"""
+        variante = self._varianti.get(codifica)
+        if variante is None:
+            percorso = self.percorso + CODIFICHE.get(codifica, '')
+            with open(percorso, 'rb') as file:
+                contenuto = file.read()
+            stato = os.stat(percorso)
+            etag = f'"{stato.st_size:x}-{int(stato.st_mtime):x}{"-" + codifica if codifica else ""}"'
+            variante = self._varianti[codifica] = (contenuto, etag, http_date(stato.st_mtime))
+        return variante
+
+
+def _indice(radice):
+    """File di STATIC_ROOT (senza le varianti compresse) per nome relativo"""
+    manifest_path = os.path.join(radice, ManifestStaticFilesStorage.manifest_name)
+    with open(manifest_path, encoding='utf-8') as file:
+        con_hash = set(json.load(file)['paths'].values())
+    indice = {}
+    for cartella, _, nomi in os.walk(radice):
+        for nome in nomi:
+            if nome.endswith(tuple(CODIFICHE.values())):
+                continue
+            percorso = os.path.join(cartella, nome)
+            relativo = os.path.relpath(percorso, radice).replace(os.sep, '/')
+            indice[relativo] = _File(percorso, relativo in con_hash)
+    return indice
+
+
+def _codifiche_accettate(request):
+    accettate = set()
+    for parte in request.headers.get('Accept-Encoding', '').split(','):
+        nome, _, parametri = parte.strip().partition(';')
+        if parametri.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accettate.add(nome.strip().lower())
+    return accettate
+
+
+def _risposta(request, file):
+    accettate = _codifiche_accettate(request)
+    codifica = next((c for c in file.codifiche if c in accettate), '')
+    contenuto, etag, modificato = file.variante(codifica)
+
+    if etag in (valore.strip() for valore in request.headers.get('If-None-Match', '').split(',')):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(b'' if request.method == 'HEAD' else contenuto, content_type=file.content_type)
+        response['Content-Length'] = len(contenuto)
+        response['Last-Modified'] = modificato
+        if codifica:
+            response['Content-Encoding'] = codifica
+    response['ETag'] = etag
+    response['Cache-Control'] = CACHE_IMMUTABILE if file.immutabile else CACHE_BREVE
+    if file.codifiche:
+        response['Vary'] = 'Accept-Encoding'
+    return response
+
+
+@sync_and_async_middleware
+def servizio_statici(get_response):
+    """Middleware che serve i file di STATIC_ROOT prodotti da `collectstatic`"""
+    if not getattr(settings, 'DASHBOARD_SERVI_STATICI', not settings.DEBUG):
+        raise MiddlewareNotUsed
+    try:
+        indice = _indice(settings.STATIC_ROOT)
+    except (OSError, TypeError, ValueError, KeyError):
+        logger.warning("File statici non serviti: eseguire `manage.py collectstatic` (STATIC_ROOT=%s)",
+                       settings.STATIC_ROOT)
+        raise MiddlewareNotUsed
+    prefisso = settings.STATIC_URL if settings.STATIC_URL.startswith('/') else '/' + settings.STATIC_URL
+
+    def servi(request):
+        if request.method not in ('GET', 'HEAD') or not request.path.startswith(prefisso):
+            return None
+        file = indice.get(request.path[len(prefisso):])
+        return _risposta(request, file) if file is not None else None
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            response = servi(request)
+            if response is None:
+                response = await get_response(request)
+            return response
+    else:
+        def middleware(request):
+            response = servi(request)
+            if response is None:
+                response = get_response(request)
+            return response
+    return middleware
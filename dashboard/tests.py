@@ -1,3 +1,1022 @@
-from django.test import TestCase
+import gzip
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import Permission, User
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import (
+    aggregati, cache_risultati, engine, esportazione, metriche, persistenza, profili, serializzazione, statici,
+    views,
+)
+from .models import (
+    AggregatoStorico, ProduzioneMensile, ProfiloCosti, SimulationInput, SimulationResult, soglie_decisionali,
+)
+
+
+class EngineTests(SimpleTestCase):
+    """Test del motore di calcolo vettoriale"""
+
+    def test_vettoriale_coincide_con_scalare(self):
+        volumi = np.array([10000.0, 500000.0, 2000000.0])
+        risultati = engine.calcola_scenari(volumi)
+
+        for i, volume in enumerate(volumi):
+            singolo = engine.calcola_scenari(volume)
+            self.assertAlmostEqual(
+                float(risultati['impianto']['margine_netto'][i]),
+                float(singolo['impianto']['margine_netto'])
+            )
+            self.assertAlmostEqual(
+                float(risultati['siero']['margine_netto'][i]),
+                float(singolo['siero']['margine_netto'])
+            )
+
+    def test_scenario_impianto(self):
+        scenario = engine.scenario_impianto(10000, 0.05, 50, 1000000, 800000)
+
+        self.assertEqual(float(scenario['kg_proteine']), 500.0)
+        self.assertEqual(float(scenario['ricavi']), 25000.0)
+        self.assertEqual(float(scenario['costi']), 900000.0)
+        self.assertTrue(np.isnan(scenario['payback_years']))
+
+    def test_griglia_sensibilita(self):
+        assi = {'volume_siero': engine.asse(1000, 5000000, 40),
+                'prezzo_vendita_siero': engine.asse(0.05, 0.5, 30)}
+        griglia = engine.griglia_sensibilita(assi, engine.VALORI_FISSI)
+
+        self.assertEqual(griglia['margine_impianto'].shape, (40, 30))
+        riferimento = engine.calcola_scenari(assi['volume_siero'][7], prezzo_vendita_siero=assi['prezzo_vendita_siero'][3])
+        self.assertAlmostEqual(float(griglia['differenza_margine'][7, 3]),
+                               float(riferimento['comparazione']['differenza_margine']))
+
+    def test_montecarlo_riproducibile(self):
+        distribuzioni = {
+            'prezzo_vendita_proteine': {'tipo': 'normale', 'media': 50, 'dev_std': 8},
+            'resa_proteine': {'tipo': 'triangolare', 'min': 0.04, 'moda': 0.05, 'max': 0.06},
+            'volume_siero': 1500000,
+        }
+        primo = engine.simula_montecarlo(distribuzioni, engine.VALORI_FISSI, estrazioni=50000,
+                                         seed=42, dimensione_blocco=20000)
+        secondo = engine.simula_montecarlo(distribuzioni, engine.VALORI_FISSI, estrazioni=50000,
+                                           seed=42, dimensione_blocco=20000)
+
+        self.assertEqual(primo, secondo)
+        percentili = primo['margine_impianto']['percentili']
+        self.assertLess(percentili['5'], percentili['50'])
+        self.assertLess(percentili['50'], percentili['95'])
+        self.assertTrue(0 <= primo['probabilita_impianto_migliore'] <= 1)
+
+    def test_montecarlo_costante(self):
+        risultato = engine.simula_montecarlo({'volume_siero': 10000}, engine.VALORI_FISSI,
+                                             estrazioni=10, seed=1)
+        deterministico = engine.calcola_scenari(10000)
+
+        self.assertAlmostEqual(risultato['margine_impianto']['media'],
+                               float(deterministico['impianto']['margine_netto']))
+        self.assertIsNone(risultato['payback_years']['percentili']['50'])
+
+    def test_risolvi_pareggio(self):
+        soluzioni = engine.risolvi_pareggio(np.array([1000000.0, 2000000.0]), payback_obiettivo=3)
+
+        volume = soluzioni['volume_pareggio'][0]
+        self.assertAlmostEqual(float(engine.calcola_scenari(volume)['impianto']['margine_netto']), 0, places=4)
+        volume = soluzioni['volume_convenienza'][0]
+        differenza = engine.calcola_scenari(volume)['comparazione']['differenza_margine']
+        self.assertAlmostEqual(float(differenza), 0, places=4)
+        volume = soluzioni['volume_payback'][1]
+        self.assertAlmostEqual(float(engine.calcola_scenari(volume)['impianto']['payback_years']), 3)
+        prezzo = soluzioni['prezzo_proteine_pareggio'][1]
+        margine = engine.calcola_scenari(2000000, prezzo_vendita_proteine=prezzo)['impianto']['margine_netto']
+        self.assertAlmostEqual(float(margine), 0, places=4)
+
+    def test_risolvi_pareggio_senza_soluzione(self):
+        # Con proteine a 1 €/kg l'impianto non supera mai la vendita del siero
+        soluzioni = engine.risolvi_pareggio(prezzo_vendita_proteine=1)
+
+        self.assertTrue(np.isnan(soluzioni['volume_convenienza']))
+        self.assertTrue(np.isnan(soluzioni['prezzo_proteine_pareggio']))
+
+    def test_proiezione(self):
+        statico = engine.calcola_scenari(2000000)
+        proiezione = engine.proietta_flussi(np.array([2000000.0, 500000.0]), orizzonte_anni=[10, 3],
+                                            tasso_sconto=0.05)
+        impianto = proiezione['impianto']
+
+        # Senza crescita né inflazione i costi annui sono quelli dello scenario statico
+        self.assertAlmostEqual(impianto['costi'][0, 0], float(statico['impianto']['costi']))
+        self.assertTrue(np.isnan(impianto['flussi'][1, 3:]).all())
+        # Al TIR il VAN dei flussi è nullo
+        tir = impianto['tir'][0]
+        flussi = impianto['flussi'][0] / (1 + tir) ** np.arange(1, 11)
+        self.assertAlmostEqual(flussi.sum() / 1000000.0, 1.0, places=6)
+        self.assertTrue(np.isnan(impianto['tir'][1]))
+
+    def test_classifica_decisione(self):
+        codici = engine.classifica(
+            np.array([600000.0, 600000.0, 600000.0, 100000.0, 600000.0]),
+            np.array(['media', 'lunga', 'media', 'media', 'breve']),
+            np.array([60.0, 50.0, 10.0, 60.0, 60.0]),
+            np.array(['Si', 'No', 'No', 'Si', 'Si']),
+        )
+        nomi = [engine.CODICI_DECISIONE[c] for c in codici]
+
+        self.assertEqual(nomi, ['impianto', 'impianto_assumere_personale', 'impianto_personale_e_spazi',
+                                'vendita_siero', 'vendita_siero'])
+        self.assertEqual(engine.messaggio_decisionale(600000, 'media', 60, 'Si', soglia_budget=700000)['tipo_messaggio'],
+                         'info')
+
+    def test_trend(self):
+        valori = engine.trend([100.0, 10.0])
+
+        self.assertEqual(valori.shape, (2, engine.ANNI_TREND))
+        self.assertEqual(valori[0].tolist(), [100.0, 200.0, 300.0, 400.0, 500.0])
+
+    def test_grafo_coincide_con_batch(self):
+        lista_input = [
+            dict(engine.VALORI_FISSI, volume_siero=2000000.0, capacita_investimento=3000000.0,
+                 tempistiche='media', spazio_disponibile=60.0, personale_disponibile='No'),
+            dict(engine.VALORI_FISSI, volume_siero=10000.0, capacita_investimento=0.0, tempistiche='',
+                 spazio_disponibile=10.0, personale_disponibile='', prezzo_vendita_siero=0.0,
+                 costi_extra=50000.0, orizzonte_anni=12.0, tasso_sconto=0.07),
+        ]
+        for input_data, atteso in zip(lista_input, engine.simulazioni_batch(lista_input)):
+            self.assertEqual(engine.Valutatore(input_data).payload(), atteso)
+
+    def test_grafo_incrementale(self):
+        input_data = dict(engine.VALORI_FISSI, volume_siero=2000000.0, capacita_investimento=0.0,
+                          tempistiche='media', spazio_disponibile=60.0, personale_disponibile='Si')
+        valutatore = engine.Valutatore(input_data)
+        valutatore.payload()
+        valutazioni = valutatore.valutazioni
+
+        # Lo spazio entra solo nella decisione
+        scartati = valutatore.aggiorna(dict(input_data, spazio_disponibile=10.0))
+        payload = valutatore.payload()
+
+        self.assertEqual(scartati, {'messaggio_decisionale', 'input_data'})
+        self.assertEqual(valutatore.valutazioni - valutazioni, 1)
+        self.assertEqual(payload['messaggio_decisionale']['dettagli']['spazio'], 10.0)
+        self.assertIn('kpi', engine.A_VALLE['volume_siero'])
+        self.assertNotIn('kpi', engine.A_VALLE['capacita_investimento'])
+
+
+@override_settings(DASHBOARD_PERSISTENZA_ASINCRONA=False)
+class DashboardViewTests(TestCase):
+    """Test della view principale e dei metodi del modello"""
+
+    def test_calcolo_ajax(self):
+        response = self.client.post('/', {
+            'volume_siero': '10000',
+            'spazio_disponibile': '100',
+            'capacita_investimento': '3000000',
+            'tempistiche': 'media',
+            'personale_disponibile': 'Si',
+        }, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        data = response.json()
+
+        self.assertTrue(data['success'])
+        self.assertEqual(data['scenario_impianto']['ricavi'], 25000.0)
+        self.assertEqual(data['scenario_impianto']['costi'], 1815000.0)
+        self.assertEqual(data['scenario_siero']['margine_netto'], -13200.0)
+        self.assertEqual(data['kpi']['payback_years'], 999)
+        self.assertEqual(len(data['trend_quinquennale']), 5)
+        self.assertEqual(data['messaggio_decisionale']['tipo_messaggio'], 'success')
+
+    async def test_view_asincrona(self):
+        factory = AsyncRequestFactory()
+        dati = {'volume_siero': '2000000', 'spazio_disponibile': '60'}
+        request = factory.post('/', dati, headers={'X-Requested-With': 'XMLHttpRequest'})
+        response = await views.dashboard_view_async(request)
+        sincrona = await self.async_client.post('/', dati, headers={'X-Requested-With': 'XMLHttpRequest'})
+
+        self.assertEqual(json.loads(response.content), sincrona.json())
+        self.assertEqual(await SimulationResult.objects.acount(), 2)
+
+        sweep = factory.post('/api/sweep/', json.dumps(SweepApiTests.richiesta), content_type='application/json')
+        response = await views.sweep_calculate_async(sweep)
+        self.assertEqual(json.loads(response.content)['forma'], [20, 10])
+
+    async def test_thread_chiudono_le_connessioni(self):
+        # Il database in memoria dei test ignora close(): si verifica la chiamata
+        with mock.patch.object(views, 'close_old_connections') as chiudi:
+            vista = views._in_thread(lambda request: HttpResponse())
+            await vista(AsyncRequestFactory().get('/'))
+
+        self.assertEqual(chiudi.call_count, 2)
+
+    def test_cache_risultati(self):
+        cache_risultati._cache().clear()
+        cache_risultati.azzera_statistiche()
+        dati = {'volume_siero': '25000', 'spazio_disponibile': '80'}
+
+        primo = self.client.post('/', dati, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        # Stesso scenario scritto in modo diverso: deve colpire la cache
+        secondo = self.client.post('/', {'volume_siero': '25000,00', 'spazio_disponibile': '80.0'},
+                                   HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        statistiche = self.client.get('/api/cache/stats/').json()
+
+        self.assertEqual(primo.content, secondo.content)
+        self.assertEqual(statistiche['misses'], 1)
+        self.assertEqual(statistiche['hits'], 1)
+
+    def test_metriche(self):
+        metriche.azzera()
+        response = self.client.post('/', {'volume_siero': '3000', 'spazio_disponibile': '60'},
+                                    HTTP_X_REQUESTED_WITH='XMLHttpRequest', HTTP_X_REQUEST_ID='abc123')
+        testo = self.client.get('/metrics/').content.decode()
+
+        self.assertEqual(response['X-Trace-Id'], 'abc123')
+        self.assertIn('dashboard_richieste_totali{vista="dashboard"} 1', testo)
+        self.assertIn('dashboard_durata_fase_secondi_count{vista="dashboard",fase="calcolo"} 1', testo)
+
+        with self.settings(DASHBOARD_METRICHE_CAMPIONAMENTO=0):
+            self.client.post('/', {'volume_siero': '3000', 'spazio_disponibile': '60'},
+                             HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        statistiche = metriche.statistiche()
+        self.assertEqual((statistiche['richieste']['dashboard'], statistiche['campionate']['dashboard']), (2, 1))
+
+    def test_storico_salvato(self):
+        self.client.post('/', {'volume_siero': '2000000', 'spazio_disponibile': '60'},
+                         HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        risultato = SimulationResult.objects.select_related('simulazione').get()
+
+        self.assertEqual(risultato.volume_siero, 2000000.0)
+        self.assertEqual(risultato.simulazione.volume_siero, 2000000)
+        self.assertEqual(risultato.created_at, risultato.simulazione.created_at)
+        self.assertEqual(risultato.margine_impianto, 3185000.0)
+
+    def test_proiezione(self):
+        data = self.client.post('/', {
+            'volume_siero': '2000000', 'spazio_disponibile': '60',
+            'orizzonte_anni': '20', 'crescita_volume': '0.02', 'tasso_sconto': '0.06',
+        }, HTTP_X_REQUESTED_WITH='XMLHttpRequest').json()
+
+        self.assertEqual(len(data['proiezione']['anni']), 20)
+        self.assertGreater(data['proiezione']['van_impianto'], data['proiezione']['van_siero'])
+        self.assertEqual(data['trend_quinquennale'][1]['ricavi_impianto'], 10100000.0)
+
+    def test_api_ajax(self):
+        dati = {'volume_siero': 2000000, 'spazio_disponibile': 60, 'tempistiche': 'media'}
+        response = self.client.post('/ajax-calculate/', json.dumps(dati), content_type='application/json')
+        dashboard = self.client.post('/', dati, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+        self.assertEqual(response.json(), dashboard.json())
+        errore = self.client.post('/ajax-calculate/', json.dumps({'volume_siero': 'x'}),
+                                  content_type='application/json')
+        self.assertEqual(errore.status_code, 400)
+        self.assertEqual(self.client.get('/ajax-calculate/').status_code, 405)
+
+    @override_settings(DASHBOARD_PERSISTENZA_ASINCRONA=False)
+    def test_whatif_delta(self):
+        def applica(oggetto, delta):
+            for campo, valore in delta.items():
+                if valore is None:
+                    oggetto.pop(campo, None)
+                elif isinstance(valore, dict) and isinstance(oggetto.get(campo), dict):
+                    applica(oggetto[campo], valore)
+                else:
+                    oggetto[campo] = valore
+            return oggetto
+
+        primo = {'volume_siero': 2000000, 'spazio_disponibile': 60, 'tempistiche': 'media'}
+        secondo = dict(primo, volume_siero='2500000', capacita_investimento='1500000')
+        completo = self.client.post('/api/whatif/', json.dumps(primo), content_type='application/json').json()
+        delta = self.client.post('/api/whatif/', json.dumps(dict(secondo, precedente=primo, sessione='scheda')),
+                                 content_type='application/json').json()
+        atteso = self.client.post('/ajax-calculate/', json.dumps(secondo), content_type='application/json').json()
+
+        self.assertTrue(completo['completo'])
+        self.assertFalse(delta['completo'])
+        self.assertNotIn('success', delta['delta'])
+        self.assertNotIn('tipo_messaggio', delta['delta']['messaggio_decisionale'])
+        self.assertEqual(applica(completo['delta'], delta['delta']), atteso)
+        self.assertEqual(SimulationInput.objects.count(), 1)
+        errore = self.client.post('/api/whatif/', json.dumps({'volume_siero': 'x'}), content_type='application/json')
+        self.assertEqual(errore.status_code, 400)
+
+    @override_settings(DASHBOARD_PERSISTENZA_ASINCRONA=False)
+    def test_sezioni_richieste(self):
+        dati = {'volume_siero': 2000000, 'spazio_disponibile': 60, 'tempistiche': 'media', 'orizzonte_anni': 10}
+        completo = self.client.post('/ajax-calculate/', json.dumps(dati), content_type='application/json').json()
+        with mock.patch.object(engine.grafo, 'proietta_input') as proiezione:
+            parziale = self.client.post('/ajax-calculate/?sezioni=kpi,messaggio_decisionale', json.dumps(dati),
+                                        content_type='application/json').json()
+
+        self.assertEqual(parziale, {nome: completo[nome] for nome in ('success', 'messaggio_decisionale', 'kpi')})
+        proiezione.assert_not_called()
+        self.assertEqual(SimulationResult.objects.count(), 2)
+        errore = self.client.post('/ajax-calculate/?fields=kpi,sconosciuta', json.dumps(dati),
+                                  content_type='application/json')
+        self.assertEqual(errore.status_code, 400)
+
+    def test_validazione(self):
+        response = self.client.post('/', {'volume_siero': '0', 'spazio_disponibile': '10'},
+                                    HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+        self.assertFalse(response.json()['success'])
+
+    @override_settings(DASHBOARD_PERSISTENZA_ASINCRONA=False)
+    def test_valori_non_finiti_e_fuori_colonna(self):
+        for dati in ({'volume_siero': 'nan'}, {'volume_siero': 'inf'}, {'volume_siero': '1e12'},
+                     {'capacita_investimento': '-inf'}, {'spazio_disponibile': '1000000'},
+                     {'tasso_sconto': 'nan'}):
+            dati = dict({'volume_siero': '2000', 'spazio_disponibile': '60'}, **dati)
+            response = self.client.post('/ajax-calculate/', json.dumps(dati), content_type='application/json')
+            self.assertEqual(response.status_code, 400, dati)
+
+        massimo = self.client.post('/ajax-calculate/', json.dumps({'volume_siero': '99999999,99',
+                                                                   'spazio_disponibile': '999999.99'}),
+                                   content_type='application/json')
+        self.assertTrue(massimo.json()['success'])
+        self.assertEqual([float(v) for v in SimulationInput.objects.values_list('volume_siero', flat=True)],
+                         [99999999.99])
+
+    @override_settings(DASHBOARD_PERSISTENZA_ASINCRONA=False)
+    def test_storico_rifiuta_valori_fuori_colonna(self):
+        response = self.client.post('/', {'volume_siero': '1e12', 'spazio_disponibile': '60'},
+                                    HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        voce = (dict(engine.VALORI_FISSI, volume_siero=1e12, capacita_investimento=0, spazio_disponibile=60,
+                     tempistiche='', personale_disponibile=''), {})
+
+        self.assertFalse(response.json()['success'])
+        self.assertFalse(SimulationInput.objects.exists())
+        with self.assertRaisesMessage(ValueError, 'volume_siero'):
+            persistenza.crea_istanze(*voce)
+
+    @override_settings(DASHBOARD_PERSISTENZA_ASINCRONA=False)
+    def test_errore_storico_non_annulla_risposta(self):
+        dati = {'volume_siero': 2000000, 'spazio_disponibile': 60}
+        with mock.patch.object(persistenza, 'salva_in_blocco', side_effect=DatabaseError('database bloccato')), \
+                self.assertLogs(views.logger, 'ERROR'):
+            singola = self.client.post('/ajax-calculate/', json.dumps(dati), content_type='application/json')
+            batch = self.client.post('/api/batch/', json.dumps([dati]), content_type='application/json')
+
+        self.assertEqual(singola.status_code, 200)
+        self.assertEqual(singola.json()['scenario_impianto']['margine_netto'], 3185000.0)
+        self.assertEqual(batch.json()['results'][0], singola.json())
+
+    def test_metodi_modello(self):
+        simulation = SimulationInput(
+            volume_siero=10000, costo_impianto=150000, costi_operativi_annui=25000,
+            prezzo_vendita_proteine=8.5, resa_proteine=0.0065, prezzo_vendita_siero=0.5,
+            costo_distribuzione=10000, spazio_disponibile=60, tempistiche='media'
+        )
+        payload = engine.Valutatore(simulation.input_data(), **soglie_decisionali()).payload()
+
+        self.assertEqual(simulation.calcola_scenario_impianto(), payload['scenario_impianto'])
+        self.assertEqual(simulation.calcola_scenario_vendita_siero(), payload['scenario_siero'])
+        self.assertEqual(simulation.calcola_messaggio_decisionale(), payload['messaggio_decisionale'])
+
+    @override_settings(DASHBOARD_PERSISTENZA_ASINCRONA=False)
+    def test_metodi_modello_coincidono_con_api(self):
+        dati = {'volume_siero': 2000000, 'capacita_investimento': 1500000, 'spazio_disponibile': 60,
+                'tempistiche': 'media', 'personale_disponibile': 'Si'}
+        data = self.client.post('/ajax-calculate/', json.dumps(dati), content_type='application/json').json()
+        simulation = SimulationInput.objects.get()
+
+        self.assertEqual(simulation.input_data(), data['input_data'])
+        self.assertEqual(simulation.calcola_scenario_impianto(), data['scenario_impianto'])
+        self.assertEqual(simulation.calcola_scenario_vendita_siero(), data['scenario_siero'])
+        self.assertEqual(simulation.calcola_messaggio_decisionale(), data['messaggio_decisionale'])
+
+
+@override_settings(DASHBOARD_PERSISTENZA_ASINCRONA=False)
+class ProfiliCostiTests(TestCase):
+    """Test dei profili di costo in cache"""
+
+    def setUp(self):
+        # Il rollback dei test non invia segnali: la cache va svuotata a mano
+        profili.invalida()
+        self.addCleanup(profili.invalida)
+        ProfiloCosti.objects.create(nome='Fornitore B', costo_impianto=600000, costi_extra=400000)
+
+    def test_profilo_richiesto(self):
+        dati = {'volume_siero': '2000000', 'spazio_disponibile': '60', 'profilo': 'Fornitore B'}
+        data = self.client.post('/', dati, HTTP_X_REQUESTED_WITH='XMLHttpRequest').json()
+
+        self.assertEqual(data['input_data']['costo_impianto'], 600000.0)
+        self.assertEqual(data['input_data']['profilo'], 'Fornitore B')
+        self.assertEqual(data['scenario_impianto']['costi'], 1275000.0)
+        self.assertEqual(SimulationInput.objects.get().profilo_costi, 'Fornitore B')
+
+        # Profili già in cache: nessuna query oltre al salvataggio dello storico
+        with self.settings(DASHBOARD_STORICO_ATTIVO=False), self.assertNumQueries(0):
+            self.client.post('/', dict(dati, volume_siero='3000'), HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+        errore = self.client.post('/', dict(dati, profilo='Sconosciuto'),
+                                  HTTP_X_REQUESTED_WITH='XMLHttpRequest').json()
+        self.assertIn('Profilo di costo non trovato', errore['error'])
+
+    @override_settings(DASHBOARD_PROFILI_TTL=0)
+    async def test_view_asincrone_dopo_invalidazione(self):
+        # Con TTL nullo la cache è scaduta subito dopo la lettura di aprepara
+        factory = AsyncRequestFactory()
+        dati = {'volume_siero': 2000000, 'spazio_disponibile': 60, 'profilo': 'Fornitore B'}
+        profili.invalida()
+        request = factory.post('/', dati, headers={'X-Requested-With': 'XMLHttpRequest'})
+        dashboard = json.loads((await views.dashboard_view_async(request)).content)
+
+        profili.invalida()
+        request = factory.post('/ajax-calculate/', json.dumps(dati), content_type='application/json')
+        ajax = json.loads((await views.ajax_calculate_async(request)).content)
+
+        profili.invalida()
+        request = factory.post('/api/whatif/', json.dumps(dict(dati, precedente=dati)),
+                               content_type='application/json')
+        whatif = json.loads((await views.whatif_calculate_async(request)).content)
+
+        self.assertEqual(dashboard['input_data']['profilo'], 'Fornitore B')
+        self.assertEqual(ajax, dashboard)
+        self.assertEqual(whatif, {'success': True, 'completo': False, 'delta': {}})
+
+    def test_predefinito_in_sweep_montecarlo_solver(self):
+        ProfiloCosti.objects.filter(nome='Fornitore B').update(predefinito=True)
+        profili.invalida()
+        dashboard = self.client.post('/ajax-calculate/', json.dumps({'volume_siero': 2000000, 'spazio_disponibile': 60}),
+                                     content_type='application/json').json()
+        margine = dashboard['scenario_impianto']['margine_netto']
+
+        sweep = self.client.post('/api/sweep/', json.dumps({
+            'assi': {'volume_siero': {'min': 2000000, 'max': 2000000, 'passi': 1}}, 'metriche': ['margine_impianto'],
+        }), content_type='application/json').json()
+        montecarlo = self.client.post('/api/montecarlo/', json.dumps({
+            'distribuzioni': {'volume_siero': 2000000}, 'estrazioni': 10,
+        }), content_type='application/json').json()
+        solver = self.client.post('/api/solver/', json.dumps({'volume_siero': 2000000}),
+                                  content_type='application/json').json()
+        valori = profili.valori('Fornitore B')
+        atteso = engine.risolvi_pareggio(2000000.0, **{campo: valori[campo] for campo in engine.PARAMETRI_SOLVER
+                                                       if campo in valori})
+
+        self.assertEqual(dashboard['input_data']['profilo'], 'Fornitore B')
+        self.assertEqual(sweep['metriche']['margine_impianto'], [margine])
+        self.assertAlmostEqual(montecarlo['margine_impianto']['media'], margine)
+        self.assertAlmostEqual(solver['volume_pareggio'], float(atteso['volume_pareggio']))
+        # Con i costi extra del profilo, non quelli fissi del motore
+        self.assertNotAlmostEqual(solver['volume_pareggio'],
+                                  float(engine.risolvi_pareggio(2000000.0)['volume_pareggio']))
+
+    def test_predefinito_e_batch(self):
+        dati = {'volume_siero': 2000000, 'spazio_disponibile': 60}
+        standard = self.client.post('/api/batch/', json.dumps([dati]), content_type='application/json')
+        batch = self.client.post('/api/batch/?profilo=Fornitore+B', json.dumps([dati]),
+                                 content_type='application/json')
+        self.assertNotIn('profilo', standard.json()['results'][0]['input_data'])
+        self.assertEqual(batch.json()['results'][0]['input_data']['profilo'], 'Fornitore B')
+
+        # Il salvataggio invalida la cache: il nuovo predefinito vale subito
+        ProfiloCosti.objects.create(nome='Regione Nord', costo_impianto=1200000, predefinito=True)
+        data = self.client.post('/', dati, HTTP_X_REQUESTED_WITH='XMLHttpRequest').json()
+        self.assertEqual(data['input_data']['profilo'], 'Regione Nord')
+        self.assertEqual(data['input_data']['costo_impianto'], 1200000.0)
+
+
+@override_settings(DASHBOARD_PERSISTENZA_ASINCRONA=False)
+class EsportazioneTests(TestCase):
+    """Test dell'esportazione in streaming dello storico"""
+
+    def setUp(self):
+        for volume in (1000, 2000000, 3000000):
+            self.client.post('/', {'volume_siero': volume, 'spazio_disponibile': '60'},
+                             HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+    def test_csv_e_ndjson(self):
+        response = self.client.get('/api/storico/esporta/', {'volume_min': '1500000'})
+        righe = b''.join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual(righe[0].split(','), list(esportazione.COLONNE))
+        self.assertEqual(len(righe), 3)
+
+        response = self.client.get('/api/storico/esporta/', {'formato': 'ndjson', 'dal': '2000-01-01'})
+        esportate = [json.loads(riga) for riga in b''.join(response.streaming_content).splitlines()]
+        salvati = SimulationResult.objects.order_by('simulazione_id')
+        self.assertEqual([r['margine_impianto'] for r in esportate], [r.margine_impianto for r in salvati])
+
+        errore = self.client.get('/api/storico/esporta/', {'dal': '31/12/2024'})
+        self.assertEqual(errore.status_code, 400)
+
+    def test_filtro_date_usa_indice(self):
+        piano = esportazione.filtra({'dal': '2025-01-01', 'al': '2025-12-31'}).explain()
+        self.assertIn('simulazione_created_at_idx', piano)
+
+        ultimo = SimulationInput.objects.latest('id')
+        giorno = timezone.localtime(ultimo.created_at).date().isoformat()
+        self.assertEqual(esportazione.filtra({'dal': giorno, 'al': giorno}).count(), 3)
+
+    def test_costi_del_profilo_salvati(self):
+        profili.invalida()
+        self.addCleanup(profili.invalida)
+        profilo = ProfiloCosti.objects.create(nome='Fornitore B', costo_impianto=600000, costi_extra=400000)
+        calcolo = self.client.post('/', {'volume_siero': '2000000', 'spazio_disponibile': '60', 'profilo': 'Fornitore B'},
+                                   HTTP_X_REQUESTED_WITH='XMLHttpRequest').json()
+
+        def esportata():
+            response = self.client.get('/api/storico/esporta/', {'formato': 'ndjson', 'profilo': 'Fornitore B'})
+            return json.loads(b''.join(response.streaming_content))
+
+        prima = esportata()
+        profilo.costi_extra = 100000
+        profilo.save()
+        modificato = esportata()
+        profilo.delete()
+
+        self.assertEqual(prima['costi_extra'], 400000.0)
+        self.assertEqual(prima['margine_impianto'], calcolo['scenario_impianto']['margine_netto'])
+        self.assertEqual(modificato, prima)
+        self.assertEqual(esportata(), prima)
+
+    async def test_streaming_asincrono(self):
+        request = AsyncRequestFactory().get('/api/storico/esporta/', {'formato': 'ndjson'})
+        response = await views.esporta_storico_async(request)
+        pezzi = [pezzo async for pezzo in response]
+
+        self.assertTrue(response.is_async)
+        self.assertEqual(b''.join(pezzi).count(b'\n'), 3)
+
+
+@override_settings(DASHBOARD_PERSISTENZA_ASINCRONA=False)
+class AggregatiTests(TestCase):
+    """Test degli aggregati materializzati dello storico"""
+
+    def setUp(self):
+        for volume, spazio, tempistiche in ((1000, '60', 'breve'), (2000000, '60', 'media'),
+                                            (3000000, '10', 'media'), (3500000, '60', 'lunga')):
+            self.client.post('/', {'volume_siero': volume, 'capacita_investimento': '5000000',
+                                   'spazio_disponibile': spazio, 'tempistiche': tempistiche,
+                                   'personale_disponibile': 'Si'},
+                             HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+    def _gruppi(self):
+        return sorted(AggregatoStorico.objects.values_list(*aggregati.CAMPI_GRUPPO))
+
+    def test_incrementale_coincide_con_ricostruzione(self):
+        incrementali = self._gruppi()
+        aggregati.ricostruisci()
+
+        self.assertEqual(len(incrementali), 3)
+        for incrementale, ricostruito in zip(incrementali, self._gruppi()):
+            self.assertEqual(incrementale[:5], ricostruito[:5])
+            for a, b in zip(incrementale[5:], ricostruito[5:]):
+                self.assertAlmostEqual(a, b, places=4)
+
+        SimulationInput.objects.filter(volume_siero=1000).delete()
+        self.assertEqual(AggregatoStorico.objects.count(), 2)
+
+    def test_elimina_in_blocco(self):
+        # Altre 20 simulazioni nei gruppi esistenti: i delta restano uno per gruppo
+        for volume in range(2000000, 2000020):
+            self.client.post('/', {'volume_siero': volume, 'capacita_investimento': '5000000',
+                                   'spazio_disponibile': '60', 'tempistiche': 'media',
+                                   'personale_disponibile': 'Si'},
+                             HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        with CaptureQueriesContext(connection) as query:
+            aggregati.elimina(SimulationInput.objects.filter(volume_siero__gte=2000000))
+        upsert = [q['sql'] for q in query.captured_queries if 'INSERT INTO' in q['sql']]
+
+        self.assertEqual(len(upsert), 1)
+        self.assertEqual(SimulationResult.objects.count(), 1)
+        incrementali = self._gruppi()
+        aggregati.ricostruisci()
+        self.assertEqual(incrementali, self._gruppi())
+
+    def test_serie(self):
+        response = self.client.get('/api/storico/aggregati/', {'per': 'esito'})
+        dati = response.json()
+
+        self.assertEqual(dati['chiavi'], ['success', 'warning', 'info'])
+        self.assertEqual(dati['conteggio'], [2, 1, 1])
+        salvati = SimulationResult.objects.filter(tipo_messaggio='success')
+        self.assertAlmostEqual(dati['serie']['margine_impianto'][0],
+                               sum(r.margine_impianto for r in salvati) / 2, places=2)
+
+        per_volume = self.client.get('/api/storico/aggregati/', {'per': 'volume', 'valore': 'somma'}).json()
+        self.assertEqual(sum(per_volume['conteggio']), 4)
+        self.assertEqual(len(self.client.get('/api/storico/aggregati/').json()['chiavi']), 1)
+
+        errore = self.client.get('/api/storico/aggregati/', {'per': 'anno'})
+        self.assertEqual(errore.status_code, 400)
+
+
+@override_settings(DASHBOARD_PERSISTENZA_ASINCRONA=False)
+class AdminStoricoTests(TestCase):
+    """Test delle query dell'elenco simulazioni nell'admin"""
+
+    def setUp(self):
+        utente = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(utente)
+
+    def _simula(self, quante):
+        for volume in range(quante):
+            self.client.post('/', {'volume_siero': 1000 + volume, 'spazio_disponibile': '60'},
+                             HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+    def _elenco(self, **parametri):
+        with CaptureQueriesContext(connection) as query:
+            response = self.client.get('/admin/dashboard/simulationinput/', parametri)
+        self.assertEqual(response.status_code, 200)
+        return [q['sql'] for q in query.captured_queries]
+
+    def test_query_elenco(self):
+        self._simula(2)
+        poche = self._elenco()
+        self._simula(8)
+        molte = self._elenco()
+        self.assertEqual(SimulationInput.objects.count(), 10)
+
+        # Numero di query indipendente dalle righe (esito letto con la join)
+        self.assertEqual(len(poche), len(molte))
+        elenco = [sql for sql in molte if 'FROM "dashboard_simulationinput" LEFT OUTER JOIN' in sql]
+        self.assertEqual(len(elenco), 1)
+        self.assertIn('"dashboard_simulationresult"."tipo_messaggio"', elenco[0])
+        self.assertNotIn('costi_operativi_annui', elenco[0])
+        self.assertFalse(any('DISTINCT' in sql for sql in molte))
+
+        filtrate = self._elenco(esito='info')
+        self.assertTrue(any('"dashboard_simulationresult"."tipo_messaggio" = ' in sql for sql in filtrate))
+
+        ricerca = self._elenco(q=str(SimulationInput.objects.latest('id').id))
+        self.assertTrue(any('"dashboard_simulationinput"."id" = ' in sql for sql in ricerca))
+
+
+@override_settings(DASHBOARD_PERSISTENZA_ASINCRONA=False)
+class ImportazioneTests(TestCase):
+    """Test dell'importazione CSV dei volumi mensili"""
+
+    csv = (
+        "latteria;mese;volume_siero;capacita_investimento;spazio_disponibile;tempistiche;personale_disponibile\n"
+        "San Pietro;2025-01;2000000;3000000;80;media;Si\n"
+        "San Pietro;2025-02;1500000,5;;10;;\n"
+        "Valle;2025-13;1000;;;;\n"
+        ";2025-01;1000;;;;\n"
+        "Valle;2025-01;-5;;;;\n"
+    )
+
+    def test_comando(self):
+        with tempfile.TemporaryDirectory() as cartella:
+            file = Path(cartella) / 'produzione.csv'
+            file.write_text(self.csv, encoding='utf-8')
+            output = StringIO()
+            call_command('importa_produzione', str(file), '--blocco', '2', stdout=output)
+
+        self.assertIn('importate: 2, scartate: 3', output.getvalue())
+        self.assertIn('Riga 4: mese non valido', output.getvalue())
+        produzione = ProduzioneMensile.objects.get(latteria='San Pietro', mese='2025-01-01')
+        singolo = self.client.post('/ajax-calculate/', json.dumps({
+            'volume_siero': 2000000, 'capacita_investimento': 3000000, 'spazio_disponibile': 80,
+            'tempistiche': 'media', 'personale_disponibile': 'Si',
+        }), content_type='application/json').json()
+        self.assertEqual(produzione.margine_impianto, singolo['scenario_impianto']['margine_netto'])
+        self.assertEqual(produzione.payback_years, singolo['kpi']['payback_years'])
+        self.assertEqual(produzione.decisione, 'impianto')
+
+    def setUp(self):
+        self.staff = User.objects.create_user('operatore', password='password', is_staff=True)
+        self.staff.user_permissions.add(*Permission.objects.filter(
+            codename__in=('add_produzionemensile', 'change_produzionemensile')
+        ))
+
+    def test_upload_riservato_allo_staff(self):
+        anonimo = self.client.post('/api/produzione/importa/', self.csv, content_type='text/csv')
+        User.objects.create_user('ospite', password='password', is_staff=True)
+        self.client.login(username='ospite', password='password')
+        senza_permessi = self.client.post('/api/produzione/importa/', self.csv, content_type='text/csv')
+        csrf = Client(enforce_csrf_checks=True)
+        csrf.force_login(self.staff)
+        senza_token = csrf.post('/api/produzione/importa/', self.csv, content_type='text/csv')
+
+        self.assertEqual((anonimo.status_code, senza_permessi.status_code, senza_token.status_code),
+                         (403, 403, 403))
+        self.assertFalse(ProduzioneMensile.objects.exists())
+
+    def test_upload_e_reimportazione(self):
+        self.client.force_login(self.staff)
+        for _ in range(2):
+            riepilogo = self.client.post('/api/produzione/importa/', self.csv, content_type='text/csv').json()
+        self.assertEqual((riepilogo['importate'], riepilogo['scartate']), (2, 3))
+        # Stessa latteria e mese: la seconda importazione sostituisce la prima
+        self.assertEqual(ProduzioneMensile.objects.count(), 2)
+
+        upload = SimpleUploadedFile('produzione.csv', self.csv.encode('utf-8-sig'))
+        simulazione = self.client.post('/api/produzione/importa/?simula=1', {'file': upload}).json()
+        self.assertEqual(simulazione['righe'], 5)
+        errore = self.client.post('/api/produzione/importa/', 'volume_siero\n1000\n', content_type='text/csv')
+        self.assertEqual(errore.status_code, 400)
+
+
+class StaticiTests(TestCase):
+    """Test dei file statici locali, precompressi e con cache a lungo termine"""
+
+    def test_pagina_senza_cdn(self):
+        html = self.client.get('/').content.decode()
+
+        self.assertIn('/static/vendor/chartjs/chart.umd.min.js', html)
+        self.assertNotIn('cdn.jsdelivr.net', html)
+        self.assertNotIn('cdnjs.cloudflare.com', html)
+
+    def test_script_dashboard_esterno(self):
+        html = self.client.get('/').content.decode()
+
+        self.assertIn('/static/js/dashboard.js', html)
+        self.assertNotIn('new Chart(', html)
+        self.assertNotIn('id="datiSimulazione"', html)
+
+    def test_collectstatic_e_servizio(self):
+        with tempfile.TemporaryDirectory() as cartella:
+            sorgente = Path(cartella, 'sorgente')
+            (sorgente / 'css').mkdir(parents=True)
+            (sorgente / 'img').mkdir()
+            (sorgente / 'img' / 'logo.svg').write_text('<svg xmlns="http://www.w3.org/2000/svg"/>')
+            (sorgente / 'css' / 'app.css').write_text('body{background:url(../img/logo.svg)}\n' * 50)
+
+            with override_settings(STATIC_ROOT=Path(cartella, 'statici'), STATICFILES_DIRS=[sorgente],
+                                   STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+                                   STATIC_URL='/static/', DASHBOARD_SERVI_STATICI=True):
+                self.assertEqual([errore.id for errore in statici.controlla_manifest(None)], ['dashboard.E001'])
+                call_command('collectstatic', interactive=False, verbosity=0)
+                self.assertEqual(statici.controlla_manifest(None), [])
+                # Con il manifest scritto un file assente non ripiega sul nome originale
+                with self.assertRaises(ValueError):
+                    staticfiles_storage.stored_name('css/mancante.css')
+                manifest = json.loads(Path(cartella, 'statici', 'staticfiles.json').read_text())
+                css = manifest['paths']['css/app.css']
+                self.assertTrue(Path(cartella, 'statici', css + '.gz').exists())
+
+                middleware = statici.servizio_statici(lambda request: HttpResponse('vista'))
+                factory = RequestFactory()
+                response = middleware(factory.get(f'/static/{css}', HTTP_ACCEPT_ENCODING='gzip'))
+                self.assertEqual(response['Content-Encoding'], 'gzip')
+                self.assertEqual(response['Cache-Control'], statici.CACHE_IMMUTABILE)
+                self.assertIn(manifest['paths']['img/logo.svg'].encode(), gzip.decompress(response.content))
+
+                ripetuta = middleware(factory.get(f'/static/{css}', HTTP_ACCEPT_ENCODING='gzip',
+                                                  HTTP_IF_NONE_MATCH=response['ETag']))
+                self.assertEqual(ripetuta.status_code, 304)
+
+                originale = middleware(factory.get('/static/css/app.css', HTTP_ACCEPT_ENCODING='gzip;q=0'))
+                self.assertNotIn('Content-Encoding', originale)
+                self.assertEqual(originale['Cache-Control'], statici.CACHE_BREVE)
+                self.assertEqual(middleware(factory.get('/static/mancante.css')).content, b'vista')
+
+
+class CodaScritturaTests(SimpleTestCase):
+    """Test della coda write-behind dello storico"""
+
+    def test_coda_limitata_e_svuotamento(self):
+        scritte = []
+        coda = persistenza.CodaScrittura(capacita=2, dimensione_blocco=10, intervallo=60)
+
+        def salva(voci):
+            scritte.extend(voci)
+            return len(voci)
+
+        with mock.patch.object(persistenza, 'salva_in_blocco', side_effect=salva):
+            accettate = coda.registra([('a', {}), ('b', {}), ('c', {})])
+            coda.svuota()
+
+        statistiche = coda.statistiche()
+        self.assertEqual(accettate, 2)
+        self.assertEqual(sorted(voce for voce, _ in scritte), ['a', 'b'])
+        self.assertEqual((statistiche['scritte'], statistiche['scartate'], statistiche['in_coda']), (2, 1, 0))
+
+
+class CodaScritturaDatabaseTests(TestCase):
+    """Test della scrittura a blocchi della coda sul database"""
+
+    def test_voce_non_valida_non_scarta_il_blocco(self):
+        valori = dict(engine.VALORI_FISSI, capacita_investimento=0, spazio_disponibile=60,
+                      tempistiche='', personale_disponibile='')
+        voci = [
+            (dict(valori, volume_siero=volume), engine.simulazioni_batch([dict(valori, volume_siero=volume)])[0])
+            for volume in (1000, 2000, 3000, 4000)
+        ]
+        voci.insert(2, (dict(valori, volume_siero=float('nan')), voci[0][1]))
+        coda = persistenza.CodaScrittura(capacita=10, dimensione_blocco=10, intervallo=60)
+        for voce in voci:
+            coda._coda.put_nowait(voce)
+
+        with self.assertLogs(persistenza.logger, 'ERROR'):
+            coda.svuota()
+
+        statistiche = coda.statistiche()
+        self.assertEqual((statistiche['scritte'], statistiche['errori'], statistiche['in_coda']), (4, 1, 0))
+        self.assertEqual(sorted(SimulationResult.objects.values_list('volume_siero', flat=True)),
+                         [1000.0, 2000.0, 3000.0, 4000.0])
+
+
+    def test_comando_svuota_storico(self):
+        valori = dict(engine.VALORI_FISSI, capacita_investimento=0, spazio_disponibile=60,
+                      tempistiche='', personale_disponibile='')
+        coda = persistenza.CodaScrittura(capacita=10, dimensione_blocco=10, intervallo=60)
+        for volume in (1000, 2000):
+            input_data = dict(valori, volume_siero=volume)
+            coda._coda.put_nowait((input_data, engine.simulazioni_batch([input_data])[0]))
+        output = StringIO()
+
+        with mock.patch.object(persistenza, '_coda', coda):
+            call_command('svuota_storico', stdout=output)
+
+        self.assertIn('Simulazioni scritte: 2', output.getvalue())
+        self.assertEqual(SimulationResult.objects.count(), 2)
+        self.assertEqual(coda.statistiche()['in_coda'], 0)
+
+
+class BenchmarkTests(TestCase):
+    """Test del comando di benchmark"""
+
+    def test_baseline(self):
+        with tempfile.TemporaryDirectory() as cartella:
+            baseline = Path(cartella) / 'baseline.json'
+            opzioni = {'ripetizioni': 3, 'riscaldamento': 0, 'baseline': baseline,
+                       'casi': ['vista_ajax_miss', 'serializzazione_json'], 'stdout': StringIO()}
+            call_command('benchmark_simulazione', salva_baseline=True, **opzioni)
+            salvata = json.loads(baseline.read_text())
+            uscita = StringIO()
+            call_command('benchmark_simulazione', confronta=True, **dict(opzioni, stdout=uscita))
+
+        self.assertEqual(set(salvata['casi']), {'vista_ajax_miss', 'serializzazione_json'})
+        self.assertGreater(salvata['casi']['vista_ajax_miss']['ops_sec'], 0)
+        self.assertIn('Regressioni', uscita.getvalue())
+        self.assertFalse(SimulationResult.objects.exists())
+
+
+@override_settings(DASHBOARD_PERSISTENZA_ASINCRONA=False)
+class BatchApiTests(TestCase):
+    """Test dell'endpoint batch JSON / NDJSON"""
+
+    def test_array_json(self):
+        elementi = [
+            {'volume_siero': 10000, 'spazio_disponibile': 100,
+             'capacita_investimento': 3000000, 'tempistiche': 'media', 'personale_disponibile': 'Si'},
+            {'volume_siero': -5, 'spazio_disponibile': 10},
+        ]
+        response = self.client.post('/api/batch/', json.dumps(elementi), content_type='application/json')
+        data = response.json()
+
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(SimulationResult.objects.count(), 1)
+        singolo = self.client.post('/', elementi[0], HTTP_X_REQUESTED_WITH='XMLHttpRequest').json()
+        self.assertEqual(data['results'][0], singolo)
+        self.assertFalse(data['results'][1]['success'])
+
+    def test_sezioni(self):
+        elementi = [{'volume_siero': 10000, 'spazio_disponibile': 60, 'orizzonte_anni': 5}, {'volume_siero': 0}]
+        data = self.client.post('/api/batch/?fields=kpi', json.dumps(elementi),
+                                content_type='application/json').json()
+
+        self.assertEqual(set(data['results'][0]), {'success', 'kpi'})
+        self.assertFalse(data['results'][1]['success'])
+        self.assertIn('error', data['results'][1])
+
+    def test_ndjson(self):
+        righe = '\n'.join(json.dumps({'volume_siero': v, 'spazio_disponibile': 60}) for v in (1000, 2000))
+        response = self.client.post('/api/batch/', righe, content_type='application/x-ndjson')
+        risultati = [json.loads(riga) for riga in response.content.decode().splitlines()]
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([r['input_data']['volume_siero'] for r in risultati], [1000.0, 2000.0])
+
+    def test_formato_colonne(self):
+        elementi = [{'volume_siero': v, 'spazio_disponibile': 60} for v in (1000, 2000)] + [{'volume_siero': 0}]
+        righe = self.client.post('/api/batch/', json.dumps(elementi), content_type='application/json').json()
+        colonne = self.client.post('/api/batch/?formato=colonne', json.dumps(elementi),
+                                   content_type='application/json').json()['colonne']
+
+        self.assertEqual(colonne['success'], [True, True, False])
+        self.assertEqual(colonne['scenario_impianto.ricavi'],
+                         [r.get('scenario_impianto', {}).get('ricavi') for r in righe['results']])
+        self.assertEqual(colonne['error'], [None, None, righe['results'][2]['error']])
+
+    def test_serializzazione_html(self):
+        # I byte della risposta sono anche l'embed nella pagina: niente </script>
+        contenuto = serializzazione.in_json({'testo': '</script>&'})
+
+        self.assertNotIn(b'<', contenuto)
+        self.assertEqual(serializzazione.da_json(contenuto), {'testo': '</script>&'})
+
+    def test_json_non_valido(self):
+        response = self.client.post('/api/batch/', '{', content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+
+
+class SweepApiTests(TestCase):
+    """Test dell'endpoint di analisi di sensibilità"""
+
+    richiesta = {'assi': {'volume_siero': {'min': 1000, 'max': 100000, 'passi': 20},
+                          'prezzo_vendita_siero': {'min': 0.1, 'max': 0.3, 'passi': 10}}}
+
+    def test_json(self):
+        response = self.client.post('/api/sweep/', json.dumps(self.richiesta), content_type='application/json')
+        data = response.json()
+
+        self.assertEqual(data['forma'], [20, 10])
+        self.assertEqual(len(data['metriche']['margine_impianto']), 20)
+        self.assertEqual(len(data['assi']['prezzo_vendita_siero']), 10)
+
+    def test_binario(self):
+        richiesta = dict(self.richiesta, formato='binario', metriche=['roi_impianto'])
+        response = self.client.post('/api/sweep/', json.dumps(richiesta), content_type='application/json')
+        valori = np.frombuffer(response.content, dtype='<f4')
+
+        self.assertEqual(response['X-Sweep-Forma'], '20,10')
+        self.assertEqual(valori.size, 200)
+
+    def test_metrica_decisione(self):
+        richiesta = {'assi': {'capacita_investimento': {'min': 0, 'max': 4000000, 'passi': 5}},
+                     'parametri': {'volume_siero': 100000, 'spazio_disponibile': 80,
+                                   'tempistiche': 'media', 'personale_disponibile': 'Si'},
+                     'metriche': ['decisione']}
+        data = self.client.post('/api/sweep/', json.dumps(richiesta), content_type='application/json').json()
+        codici = [data['codici_decisione'][int(c)] for c in data['metriche']['decisione']]
+
+        self.assertEqual(codici, ['vendita_siero', 'vendita_siero', 'vendita_siero', 'impianto', 'impianto'])
+
+    def test_asse_non_valido(self):
+        richiesta = {'assi': {'tempistiche': {'min': 0, 'max': 1}}}
+        response = self.client.post('/api/sweep/', json.dumps(richiesta), content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_limiti_prima_dell_allocazione(self):
+        assi = self.richiesta['assi']
+        richieste = [
+            {'assi': {'volume_siero': dict(assi['volume_siero'], passi=1e10)}},
+            {'assi': {'volume_siero': dict(assi['volume_siero'], passi=3000),
+                      'prezzo_vendita_siero': dict(assi['prezzo_vendita_siero'], passi=3000)}},
+            {'assi': {'volume_siero': dict(assi['volume_siero'], max='inf')}},
+            dict(self.richiesta, parametri={'costo_impianto': 'nan'}),
+            dict(self.richiesta, parametri={'capacita_investimento': 1e15}),
+            dict(self.richiesta, parametri={'costo_impianto': -1}),
+            dict(self.richiesta, parametri={'sconosciuto': 1}),
+        ]
+        with mock.patch('numpy.linspace', wraps=np.linspace) as linspace:
+            for richiesta in richieste:
+                response = self.client.post('/api/sweep/', json.dumps(richiesta), content_type='application/json')
+                self.assertEqual(response.status_code, 400, richiesta)
+        # Griglie fuori limite rifiutate senza generare gli assi
+        self.assertLessEqual(max(chiamata.args[2] for chiamata in linspace.call_args_list), 20)
+
+
+class MontecarloApiTests(TestCase):
+    """Test dell'endpoint Monte Carlo e del pool di processi condiviso"""
+
+    richiesta = {
+        'distribuzioni': {
+            'prezzo_vendita_proteine': {'tipo': 'normale', 'media': 50, 'dev_std': 8},
+            'volume_siero': {'tipo': 'uniforme', 'min': 1000000, 'max': 3000000},
+        },
+        'estrazioni': 250000,
+        'seed': 7,
+    }
+
+    def test_pool_condiviso(self):
+        def calcola(processi):
+            response = self.client.post('/api/montecarlo/', json.dumps(dict(self.richiesta, processi=processi)),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            return response.json()
+
+        sequenziale = calcola(1)
+        # Il pool si usa anche su macchine con una sola CPU
+        with mock.patch('os.cpu_count', return_value=4):
+            parallelo = calcola(2)
+            pool = engine.montecarlo._pool
+            ancora = calcola(3)
+
+        self.assertEqual(parallelo, sequenziale)
+        self.assertEqual(ancora, sequenziale)
+        self.assertIs(engine.montecarlo._pool, pool)
+        self.assertEqual(pool._mp_context.get_start_method(), 'spawn')
+
+    def test_richiesta_non_valida(self):
+        response = self.client.post('/api/montecarlo/', json.dumps({'distribuzioni': {'costo_impianto': 1}}),
+                                    content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+
+
+class SolverApiTests(TestCase):
+    """Test dell'endpoint di pareggio"""
+
+    def test_singolo_e_batch(self):
+        singolo = self.client.post('/api/solver/', json.dumps({'volume_siero': 1000000}),
+                                   content_type='application/json').json()
+        batch = self.client.post('/api/solver/', json.dumps([{'volume_siero': 1000000}, {}]),
+                                 content_type='application/json').json()
+
+        self.assertAlmostEqual(singolo['volume_pareggio'], 726000.0)
+        self.assertEqual(batch['count'], 2)
+        self.assertEqual(batch['results'][0]['prezzo_proteine_pareggio'], singolo['prezzo_proteine_pareggio'])
+        self.assertIsNone(batch['results'][1]['prezzo_proteine_pareggio'])
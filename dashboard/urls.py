@@ -1,10 +1,29 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 app_name = 'dashboard'
 
+
+def _vista(nome):
+    """View di calcolo: sotto ASGI (DASHBOARD_VISTE_ASINCRONE) la variante `<nome>_async`"""
+    if settings.DASHBOARD_VISTE_ASINCRONE:
+        nome += '_async'
+    return getattr(views, nome)
+
+
 urlpatterns = [
-    path('', views.dashboard_view, name='dashboard'),
-    path('ajax-calculate/', views.ajax_calculate, name='ajax_calculate'),
+    path('', _vista('dashboard_view'), name='dashboard'),
+    path('ajax-calculate/', _vista('ajax_calculate'), name='ajax_calculate'),
+    path('api/whatif/', _vista('whatif_calculate'), name='whatif_calculate'),
+    path('api/batch/', _vista('batch_calculate'), name='batch_calculate'),
+    path('api/sweep/', _vista('sweep_calculate'), name='sweep_calculate'),
+    path('api/montecarlo/', _vista('montecarlo_calculate'), name='montecarlo_calculate'),
+    path('api/solver/', _vista('solver_calculate'), name='solver_calculate'),
+    path('api/storico/esporta/', _vista('esporta_storico'), name='esporta_storico'),
+    path('api/storico/aggregati/', _vista('storico_aggregati'), name='storico_aggregati'),
+    path('api/produzione/importa/', _vista('importa_produzione'), name='importa_produzione'),
+    path('api/cache/stats/', views.cache_stats, name='cache_stats'),
+    path('metrics/', views.metriche_view, name='metriche'),
     path('test/', views.test_view, name='test'),
-]
\ No newline at end of file
+]
@@ -0,0 +1,69 @@
+"""
+Valutatori del grafo di calcolo (engine.Valutatore) per sessione what-if.
+
+Ogni scheda della dashboard in modalità live invia un identificativo di
+sessione casuale: il processo tiene il suo Valutatore, con i valori
+intermedi dell'ultimo scenario calcolato, così che spostare un cursore
+ricalcoli solo le grandezze a valle dell'input cambiato. Le sessioni sono
+al più DASHBOARD_WHATIF_SESSIONI per processo (LRU); una sessione non
+trovata (scartata, o servita da un altro processo) riparte da zero con lo
+stesso risultato.
+"""
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from . import engine
+from .models import soglie_decisionali
+
+LUNGHEZZA_MASSIMA_CHIAVE = 64
+
+_lock = threading.Lock()
+_sessioni = OrderedDict()
+
+
+class _Sessione:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.valutatore = None
+
+
+def _sessione(chiave):
+    with _lock:
+        sessione = _sessioni.pop(chiave, None) or _Sessione()
+        # In fondo: usata più di recente
+        _sessioni[chiave] = sessione
+        while len(_sessioni) > getattr(settings, 'DASHBOARD_WHATIF_SESSIONI', 1000):
+            _sessioni.popitem(last=False)
+    return sessione
+
+
+def chiave_valida(chiave):
+    return isinstance(chiave, str) and 0 < len(chiave) <= LUNGHEZZA_MASSIMA_CHIAVE
+
+
+@contextmanager
+def valutatore(chiave, input_data):
+    """
+    Valutatore della sessione `chiave` portato su `input_data`, in uso
+    esclusivo per la durata del blocco. Senza chiave valida il valutatore
+    è nuovo e non viene ricordato.
+    """
+    soglie = soglie_decisionali()
+    if not chiave_valida(chiave):
+        yield engine.Valutatore(input_data, **soglie)
+        return
+    sessione = _sessione(chiave)
+    with sessione.lock:
+        if sessione.valutatore is None:
+            sessione.valutatore = engine.Valutatore(input_data, **soglie)
+        else:
+            sessione.valutatore.aggiorna(input_data, **soglie)
+        yield sessione.valutatore
+
+
+def statistiche():
+    with _lock:
+        return {'sessioni': len(_sessioni)}
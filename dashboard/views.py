@@ -1,119 +1,312 @@
 from django.shortcuts import render, redirect
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
 from django.contrib import messages
-import json
+from django.db import close_old_connections
+from asgiref.sync import sync_to_async
+from functools import wraps
+import codecs
 import logging
-from decimal import Decimal, InvalidOperation
+import math
+import numpy as np
+from . import (
+    aggregati, cache_risultati, engine, esportazione, importazione, metriche, persistenza, profili,
+    serializzazione, valutatori,
+)
 from .forms import SimulationForm
-from .models import SimulationInput
+from .models import soglie_decisionali
 
 logger = logging.getLogger(__name__)
 
-def dashboard_view(request):
-    """View principale della dashboard - semplificata e robusta"""
+# Numero massimo di simulazioni accettate da una singola richiesta batch
+BATCH_MAX_SIMULAZIONI = 50000
+
+# Metriche restituite dallo sweep se la richiesta non le specifica
+SWEEP_METRICHE_DEFAULT = ['margine_impianto', 'roi_impianto']
+
+# Monte Carlo: estrazioni di default e massimo numero di processi per richiesta
+# (i processi vengono dal pool condiviso del motore)
+MONTECARLO_ESTRAZIONI_DEFAULT = 1000000
+MONTECARLO_MAX_PROCESSI = engine.montecarlo.MAX_PROCESSI
+
+CAMPI_INPUT = (
+    'volume_siero',
+    'capacita_investimento',
+    'costo_impianto',
+    'costi_operativi_annui',
+    'prezzo_vendita_proteine',
+    'resa_proteine',
+    'prezzo_vendita_siero',
+    'costo_distribuzione',
+    'tempistiche',
+    'spazio_disponibile',
+    'personale_disponibile',
+)
+
+# Campi aggiunti all'eco `input_data` quando si usa un profilo di costo
+CAMPI_PROFILO = ('profilo', 'costi_extra')
+
+
+def _testo(valore):
+    """Normalizza un valore di input (POST o JSON) in stringa"""
+    if valore is None:
+        return ''
+    return str(valore).strip()
+
+
+def _numero(testo):
+    """Float di un campo di testo (anche con la virgola decimale); ValueError se non finito"""
+    numero = float(testo.replace(',', '.'))
+    if not math.isfinite(numero):
+        raise ValueError(f"valore non finito: {testo}")
+    return numero
+
+
+# Massimi dei campi numerici inseriti dall'utente: ogni simulazione va nello storico
+MASSIMI_INPUT = {
+    campo: persistenza.MASSIMI_COLONNE[campo]
+    for campo in ('volume_siero', 'capacita_investimento', 'spazio_disponibile')
+}
+
+
+def _valida_input(dati, profili_caricati=None):
+    """
+    Valida i dati di una simulazione (request.POST o dizionario JSON).
     
-    # Debug: stampa sempre i dati POST per controllo
-    if request.method == 'POST':
-        print("=== DEBUG DATI RICEVUTI ===")
-        print("request.POST:", dict(request.POST))
-        print("Headers AJAX:", request.headers.get('X-Requested-With'))
-        print("========================")
+    Restituisce la coppia (input_data, errors): input_data usa i nomi dei
+    campi di SimulationInput, con i valori fissi del settore già impostati
+    (o quelli del profilo di costo `profilo`, se indicato o predefinito).
+    Le view asincrone passano in `profili_caricati` i profili di
+    `profili.aprepara`, così la validazione non accede al database.
+    """
+    errors = []
+    
+    volume_siero = _testo(dati.get('volume_siero'))
+    capacita_investimento = _testo(dati.get('capacita_investimento'))
+    tempistiche = _testo(dati.get('tempistiche'))
+    spazio_disponibile = _testo(dati.get('spazio_disponibile'))
+    personale_disponibile = _testo(dati.get('personale_disponibile'))
+    
+    # Valida che i campi variabili siano presenti
+    if not volume_siero:
+        errors.append("Volume siero è obbligatorio")
+        return None, errors
+    
+    input_data = {}
+    try:
+        input_data['volume_siero'] = _numero(volume_siero)
+        if input_data['volume_siero'] <= 0:
+            errors.append("Volume siero deve essere maggiore di 0")
+        elif input_data['volume_siero'] > MASSIMI_INPUT['volume_siero']:
+            errors.append(f"Volume siero non può superare {MASSIMI_INPUT['volume_siero']:.2f}")
+    except (ValueError, TypeError):
+        errors.append("Volume siero deve essere un numero valido")
+        
+    # Validazione capacità investimento (opzionale)
+    if capacita_investimento:
+        try:
+            input_data['capacita_investimento'] = _numero(capacita_investimento)
+            if input_data['capacita_investimento'] < 0:
+                errors.append("Capacità investimento non può essere negativa")
+            elif input_data['capacita_investimento'] > MASSIMI_INPUT['capacita_investimento']:
+                errors.append(
+                    f"Capacità investimento non può superare {MASSIMI_INPUT['capacita_investimento']:.2f}"
+                )
+        except (ValueError, TypeError):
+            errors.append("Capacità investimento deve essere un numero valido")
+    else:
+        input_data['capacita_investimento'] = 0
+        
+    # Valori fissi, sostituiti da quelli del profilo di costo richiesto (o predefinito)
+    input_data.update(engine.VALORI_FISSI)
+    profilo = _testo(dati.get('profilo'))
+    try:
+        profilo, valori_profilo = profili.risolvi(profilo, profili_caricati)
+    except KeyError:
+        errors.append(f"Profilo di costo non trovato: {profilo}")
+    else:
+        if valori_profilo is not None:
+            input_data.update(valori_profilo, profilo=profilo)
+    
+    # Validazione spazio disponibile (obbligatorio)
+    if spazio_disponibile:
+        try:
+            input_data['spazio_disponibile'] = _numero(spazio_disponibile)
+            if input_data['spazio_disponibile'] < 0:
+                errors.append("Spazio disponibile non può essere negativo")
+            elif input_data['spazio_disponibile'] > MASSIMI_INPUT['spazio_disponibile']:
+                errors.append(f"Spazio disponibile non può superare {MASSIMI_INPUT['spazio_disponibile']:.2f}")
+        except (ValueError, TypeError):
+            errors.append("Spazio disponibile deve essere un numero valido")
+    else:
+        errors.append("Spazio disponibile è obbligatorio")
+    
+    # Campi di selezione (non numerici)
+    input_data['tempistiche'] = tempistiche
+    input_data['personale_disponibile'] = personale_disponibile
     
+    # Parametri opzionali della proiezione pluriennale (tassi come frazione)
+    for campo in engine.PARAMETRI_PROIEZIONE:
+        valore = _testo(dati.get(campo))
+        if not valore:
+            continue
+        try:
+            numero = _numero(valore)
+        except (ValueError, TypeError):
+            errors.append(f"{campo} deve essere un numero valido")
+            continue
+        if campo == 'orizzonte_anni':
+            if not numero.is_integer() or not 1 <= numero <= engine.ORIZZONTE_MAX:
+                errors.append(f"L'orizzonte deve essere un numero intero di anni tra 1 e {engine.ORIZZONTE_MAX}")
+        elif not -1 < numero <= 10:
+            errors.append(f"{campo} deve essere un tasso annuo tra -1 e 10 (es. 0.02 = 2%)")
+        input_data[campo] = numero
+    
+    # Anche i costi del profilo devono entrare nelle colonne dello storico
+    if not errors:
+        errors.extend(
+            f"{campo} fuori dai limiti dello storico" for campo in persistenza.fuori_colonna(input_data)
+        )
+    
+    return input_data, errors
+
+
+def _valori_costo(nome_profilo):
+    """
+    Valori fissi del motore sostituiti da quelli del profilo di costo
+    indicato (o del predefinito), come in `_valida_input`: sweep, Monte
+    Carlo e solver restano coerenti con la dashboard. ValueError se il
+    profilo non esiste.
+    """
+    nome_profilo = _testo(nome_profilo)
+    try:
+        _, valori_profilo = profili.risolvi(nome_profilo)
+    except KeyError:
+        raise ValueError(f"Profilo di costo non trovato: {nome_profilo}")
+    valori = dict(engine.VALORI_FISSI, costi_extra=engine.COSTI_EXTRA_IMPIANTO)
+    valori.update(valori_profilo or {})
+    return valori
+
+
+def _parametri_scalari(parametri):
+    """
+    Valori fissi della griglia di sweep indicati dalla richiesta, con gli
+    stessi controlli di `_valida_input`: numeri finiti, non negativi ed entro
+    le colonne dello storico; i campi della decisione restano testo.
+    ValueError se un parametro non è valido.
+    """
+    if not isinstance(parametri, dict):
+        raise ValueError("'parametri' deve essere un oggetto")
+    validi = {}
+    for campo, valore in parametri.items():
+        if campo in engine.CAMPI_DECISIONE_TESTO:
+            validi[campo] = _testo(valore)
+            continue
+        if campo not in persistenza.MASSIMI_COLONNE:
+            raise ValueError(f"Parametro non valido: {campo}")
+        try:
+            numero = _numero(_testo(valore))
+        except ValueError:
+            raise ValueError(f"{campo} deve essere un numero valido")
+        if numero < 0:
+            raise ValueError(f"{campo} non può essere negativo")
+        massimo = persistenza.MASSIMI_COLONNE.get(campo)
+        if massimo is not None and numero > massimo:
+            raise ValueError(f"{campo} non può superare {massimo:.2f}")
+        validi[campo] = numero
+    return validi
+
+
+def _ordina_input(input_data):
+    """Ordine dei campi nell'eco `input_data` della risposta"""
+    ordinato = {campo: input_data[campo] for campo in CAMPI_INPUT}
+    ordinato.update(
+        (campo, input_data[campo])
+        for campo in (*CAMPI_PROFILO, *engine.PARAMETRI_PROIEZIONE) if campo in input_data
+    )
+    return ordinato
+
+
+def _sezioni_richieste(request):
+    """
+    Sezioni del payload richieste con `?sezioni=kpi,messaggio_decisionale`
+    (o `?fields=`), sempre con `success`; None se il parametro manca.
+    ValueError se una sezione non esiste.
+    """
+    valore = request.GET.get('sezioni') or request.GET.get('fields')
+    if not valore:
+        return None
+    sezioni = {nome.strip() for nome in valore.split(',') if nome.strip()}
+    sconosciute = sezioni.difference(engine.SEZIONI)
+    if sconosciute:
+        raise ValueError(
+            f"{', '.join(sorted(sconosciute))} (valori ammessi: {', '.join(engine.SEZIONI)})"
+        )
+    return frozenset(sezioni | {'success'})
+
+
+def _registra_storico(voci, traccia):
+    """
+    Registra le simulazioni nello storico: un errore di salvataggio (con la
+    persistenza sincrona) finisce nel log e non annulla la risposta calcolata.
+    """
+    try:
+        persistenza.registra(voci)
+    except Exception:
+        logger.exception("[%s] Salvataggio nello storico non riuscito", traccia.id)
+
+
+async def _aregistra_storico(voci, traccia):
+    """Variante di `_registra_storico` per le view asincrone"""
+    try:
+        await persistenza.aregistra(voci)
+    except Exception:
+        logger.exception("[%s] Salvataggio nello storico non riuscito", traccia.id)
+
+
+def _calcola_simulazione(input_data):
+    """Calcola il payload completo della dashboard per un input validato"""
+    # Entrambi gli scenari, la decisione e le sezioni derivate dal grafo del motore
+    return engine.Valutatore(input_data, **soglie_decisionali()).payload()
+
+
+def _simulazione_json(input_data, traccia=metriche.NESSUNA_TRACCIA):
+    """
+    Byte JSON del payload per un input validato e ordinato: letti dalla cache
+    se presenti, altrimenti calcolati e memorizzati. Restituisce anche il
+    dizionario se appena calcolato (None se letto dalla cache).
+    """
+    simulation_data = None
+    simulation_json = cache_risultati.leggi(input_data)
+    if simulation_json is None:
+        with traccia.fase('calcolo'):
+            simulation_data = _calcola_simulazione(input_data)
+        with traccia.fase('serializzazione'):
+            simulation_json = serializzazione.in_json(simulation_data)
+        cache_risultati.scrivi(input_data, simulation_json)
+    return simulation_json, simulation_data
+
+
+@metriche.strumenta('dashboard')
+def dashboard_view(request):
+    """View principale della dashboard - semplificata e robusta"""
+    traccia = request.traccia
     form = SimulationForm()
     simulation_data = None
+    simulation_json = None
     
     if request.method == 'POST':
-        # Validazione manuale dei dati per controllo completo
-        errors = []
-        
-        # Estrai i dati dal POST
-        volume_siero = request.POST.get('volume_siero', '').strip()
-        capacita_investimento = request.POST.get('capacita_investimento', '').strip()
-        costo_impianto = request.POST.get('costo_impianto', '').strip()
-        costi_operativi = request.POST.get('costi_operativi_annui', '').strip()
-        prezzo_proteine = request.POST.get('prezzo_vendita_proteine', '').strip()
-        resa_proteine = request.POST.get('resa_proteine', '').strip()
-        prezzo_siero = request.POST.get('prezzo_vendita_siero', '').strip()
-        costo_distribuzione = request.POST.get('costo_distribuzione', '').strip()
-        tempistiche = request.POST.get('tempistiche', '').strip()
-        spazio_disponibile = request.POST.get('spazio_disponibile', '').strip()
-        personale_disponibile = request.POST.get('personale_disponibile', '').strip()
-        
-        # Valida che i campi variabili siano presenti
-        if not volume_siero:
-            errors.append("Volume siero è obbligatorio")
-            
-        # I campi fissi vengono impostati automaticamente se vuoti
-        if not costo_impianto:
-            costo_impianto = "150000"  # Valore fisso
-        if not costi_operativi:
-            costi_operativi = "25000"  # Valore fisso  
-        if not prezzo_proteine:
-            prezzo_proteine = "8.50"  # Valore fisso
-        if not resa_proteine:
-            resa_proteine = "7"  # Valore fisso
-        if not costo_distribuzione:
-            costo_distribuzione = "10000"  # Valore fisso
-        if not prezzo_siero:
-            prezzo_siero = "0.50"  # Valore fisso
-            
-        print("INFO: Tutti i valori ora sono fissi")
-            
-        # Se mancano dati per uno scenario, usa valori di default per confronto
-        # Questo permette di mostrare sempre entrambi i grafici per comparazione
-        if not prezzo_proteine and prezzo_siero:
-            print("INFO: Solo scenario siero fornito, userò valori di default per confronto")
-        if not prezzo_siero and prezzo_proteine:
-            print("INFO: Solo scenario impianto fornito, userò valori di default per confronto")
+        with traccia.fase('parsing'):
+            dati = request.POST
         
-        # Converte e valida che siano numerici
-        numeric_values = {}
-        if not errors:  # Solo se non ci sono errori di campi mancanti
-            try:
-                numeric_values['volume_siero'] = float(volume_siero.replace(',', '.'))
-                if numeric_values['volume_siero'] <= 0:
-                    errors.append("Volume siero deve essere maggiore di 0")
-            except (ValueError, TypeError):
-                errors.append("Volume siero deve essere un numero valido")
-                
-            # Validazione capacità investimento (opzionale)
-            if capacita_investimento:
-                try:
-                    numeric_values['capacita_investimento'] = float(capacita_investimento.replace(',', '.'))
-                    if numeric_values['capacita_investimento'] < 0:
-                        errors.append("Capacità investimento non può essere negativa")
-                except (ValueError, TypeError):
-                    errors.append("Capacità investimento deve essere un numero valido")
-            else:
-                numeric_values['capacita_investimento'] = 0
-                
-            # Valori fissi - sempre gli stessi
-            numeric_values['costo_impianto'] = 1000000.0
-            numeric_values['costi_operativi'] = 800000.0
-            numeric_values['prezzo_proteine'] = 50.0
-            numeric_values['resa_proteine'] = 0.05  # Valore fisso 0.05 kg/L (50g/L)
-            numeric_values['prezzo_siero'] = 0.18  # Valore fisso €0.50/L
-            numeric_values['costo_distribuzione'] = 15000.0  # Valore fisso
-            
-            # Validazione spazio disponibile (obbligatorio)
-            if spazio_disponibile:
-                try:
-                    numeric_values['spazio_disponibile'] = float(spazio_disponibile.replace(',', '.'))
-                    if numeric_values['spazio_disponibile'] < 0:
-                        errors.append("Spazio disponibile non può essere negativo")
-                except (ValueError, TypeError):
-                    errors.append("Spazio disponibile deve essere un numero valido")
-            else:
-                errors.append("Spazio disponibile è obbligatorio")
-            
-            # Campi di selezione (non numerici)
-            numeric_values['tempistiche'] = tempistiche
-            numeric_values['personale_disponibile'] = personale_disponibile
+        # Validazione manuale dei dati per controllo completo
+        with traccia.fase('validazione'):
+            input_data, errors = _valida_input(dati)
         
         # Se ci sono errori, restituisci messaggio di errore
         if errors:
             error_msg = "Errori di validazione: " + "; ".join(errors)
-            print("ERRORI VALIDAZIONE:", error_msg)
+            logger.debug("[%s] %s", traccia.id, error_msg)
             
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                 return JsonResponse({
@@ -123,186 +316,29 @@ def dashboard_view(request):
             else:
                 messages.error(request, error_msg)
         else:
-            # Controllo capacità di investimento vs costo impianto (messaggio informativo)
-            investimento_sufficiente = False
-            messaggio_investimento = ""
-            
-            if numeric_values['capacita_investimento'] >= 500000:
-                if numeric_values['capacita_investimento'] >= numeric_values['costo_impianto']:
-                    investimento_sufficiente = True
-                    messaggio_investimento = "✅ È possibile acquistare l'impianto di filtrazione per ottenere le proteine dal siero del latte!"
-                    print("INFO INVESTIMENTO:", messaggio_investimento)
-                else:
-                    differenza = numeric_values['costo_impianto'] - numeric_values['capacita_investimento']
-                    messaggio_investimento = f"⚠️ Budget insufficiente per l'impianto. Mancano €{differenza:,.2f}"
-                    print("INFO INVESTIMENTO:", messaggio_investimento)
             # Tutti i dati sono validi, procedi con i calcoli
             try:
-                print("=== CALCOLI ===")
-                print("Dati numerici validati:", numeric_values)
-                
-                # Calcoli basati sui dati inseriti
-                volume = numeric_values['volume_siero']
-                
-                # CALCOLA SEMPRE ENTRAMBI GLI SCENARI
-                # Ora i valori impianto sono fissi, solo siero può variare
-                
-                # SCENARIO IMPIANTO (valori fissi)
-                volume = numeric_values['volume_siero']
-                kg_proteine = volume * numeric_values['resa_proteine']  # 0.05 kg/L (50g/L)
-                ricavi_impianto = kg_proteine * numeric_values['prezzo_proteine']  # €50/kg
-                
-                ammortamento_annuo = numeric_values['costo_impianto'] / 10  # €1.000.000 / 10 anni
-                costi_impianto = ammortamento_annuo + numeric_values['costi_operativi'] + numeric_values['costo_distribuzione'] + 900000  # Ammortamento + operativi + distribuzione + extra
-
-                margine_impianto = ricavi_impianto - costi_impianto
-                roi_impianto = (margine_impianto / numeric_values['costo_impianto']) * 100
-                
-                scenario_impianto = {
-                    'ricavi': round(ricavi_impianto, 2),
-                    'costi': round(costi_impianto, 2),
-                    'margine_netto': round(margine_impianto, 2),
-                    'roi': round(roi_impianto, 2),
-                    'kg_proteine': round(kg_proteine, 2),
-                    'is_user_data': True  # Sempre presente
-                }
-                
-                # SCENARIO SIERO 
-                default_prezzo_siero = 0.5  # €/litroSS
-                prezzo_siero_calc = numeric_values['prezzo_siero'] or default_prezzo_siero
-                ricavi_siero = volume * prezzo_siero_calc
-                costi_siero = numeric_values['costo_distribuzione']
-                margine_siero = ricavi_siero - costi_siero
+                input_data = _ordina_input(input_data)
                 
-                scenario_siero = {
-                    'ricavi': round(ricavi_siero, 2),
-                    'costi': round(costi_siero, 2),
-                    'margine_netto': round(margine_siero, 2),
-                    'roi': 0,  # Nessun investimento
-                    'is_user_data': bool(numeric_values['prezzo_siero'])
-                }
+                # Scenari già calcolati: riusa direttamente i byte JSON memorizzati
+                simulation_json, simulation_data = _simulazione_json(input_data, traccia)
                 
-                # Calcoli derivati
-                payback_years = None
-                if scenario_impianto['margine_netto'] > 0:
-                    payback_years = numeric_values['costo_impianto'] / scenario_impianto['margine_netto']
-                
-                # LOGICA DECISIONALE - Crea oggetto temporaneo per calcoli
-                temp_simulation = SimulationInput(
-                    volume_siero=numeric_values['volume_siero'],
-                    capacita_investimento=numeric_values['capacita_investimento'],
-                    costo_impianto=numeric_values['costo_impianto'],
-                    costi_operativi_annui=numeric_values['costi_operativi'],
-                    costo_distribuzione=numeric_values['costo_distribuzione'],
-                    tempistiche=numeric_values['tempistiche'],
-                    spazio_disponibile=numeric_values['spazio_disponibile'],
-                    personale_disponibile=numeric_values['personale_disponibile']
-                )
-                
-                # Calcola il messaggio decisionale
-                messaggio_decisionale = temp_simulation.calcola_messaggio_decisionale()
-                
-                # Preparazione dati per grafici - SEMPRE ENTRAMBI
-                # Impianto sempre presente (valori fissi), siero opzionale
-                user_scenario_type = 'both' if numeric_values['prezzo_siero'] else 'impianto_with_default_siero'
-                
-                simulation_data = {
-                    'success': True,
-                    'scenario_type': 'both',  # Mostra sempre entrambi per confronto
-                    'user_scenario_type': user_scenario_type,  # Quello che l'utente ha effettivamente inserito
-                    'input_data': {
-                        'volume_siero': volume,
-                        'capacita_investimento': numeric_values['capacita_investimento'],
-                        'costo_impianto': numeric_values['costo_impianto'],
-                        'costi_operativi_annui': numeric_values['costi_operativi'],
-                        'prezzo_vendita_proteine': numeric_values['prezzo_proteine'],
-                        'resa_proteine': numeric_values['resa_proteine'],
-                        'prezzo_vendita_siero': numeric_values['prezzo_siero'],
-                        'costo_distribuzione': numeric_values['costo_distribuzione'],
-                        'tempistiche': numeric_values['tempistiche'],
-                        'spazio_disponibile': numeric_values['spazio_disponibile'],
-                        'personale_disponibile': numeric_values['personale_disponibile'],
-                    },
-                    'scenario_impianto': scenario_impianto,
-                    'scenario_siero': scenario_siero,
-                    'defaults_used': {
-                        'prezzo_proteine': not bool(numeric_values['prezzo_proteine']),
-                        'resa_proteine': not bool(numeric_values['resa_proteine']),
-                        'prezzo_siero': not bool(numeric_values['prezzo_siero'])
-                    },
-                    'investimento_info': {
-                        'capacita_disponibile': numeric_values['capacita_investimento'],
-                        'costo_richiesto': numeric_values['costo_impianto'], 
-                        'sufficiente': investimento_sufficiente,
-                        'messaggio': messaggio_investimento,
-                        'differenza': numeric_values['costo_impianto'] - numeric_values['capacita_investimento'] if numeric_values['capacita_investimento'] > 0 else 0
-                    },
-                    'messaggio_decisionale': messaggio_decisionale
-                }
-                
-                # Comparazione (solo se entrambi gli scenari esistono)
-                if scenario_impianto and scenario_siero:
-                    simulation_data['comparazione'] = {
-                        'differenza_ricavi': round(scenario_impianto['ricavi'] - scenario_siero['ricavi'], 2),
-                        'differenza_costi': round(scenario_impianto['costi'] - scenario_siero['costi'], 2),
-                        'differenza_margine': round(scenario_impianto['margine_netto'] - scenario_siero['margine_netto'], 2)
-                    }
-                
-                # KPI (calcolati in base al tipo di scenario)
-                kpi_data = {}
-                if scenario_impianto:
-                    kpi_data['roi_impianto'] = scenario_impianto['roi']
-                    kpi_data['payback_years'] = round(payback_years, 2) if payback_years else 999
-                    if numeric_values['resa_proteine']:
-                        kpi_data['efficienza_conversione'] = numeric_values['resa_proteine']
-                    
-                    # Distribuzione costi impianto
-                    ammortamento_annuo = numeric_values['costo_impianto'] / 10
-                    simulation_data['distribuzione_costi'] = {
-                        'ammortamento': round(ammortamento_annuo, 2),
-                        'operativi': round(numeric_values['costi_operativi'], 2),
-                        'distribuzione': round(numeric_values['costo_distribuzione'], 2),
-                        'totale': round(ammortamento_annuo + numeric_values['costi_operativi'] + numeric_values['costo_distribuzione'], 2)
-                    }
-                
-                if scenario_impianto and scenario_siero:
-                    kpi_data['valore_aggiunto_per_litro'] = round((scenario_impianto['ricavi'] - scenario_siero['ricavi']) / volume, 4)
-                    
-                simulation_data['kpi'] = kpi_data
-                
-                # Trend quinquennale (basato sui scenari disponibili)
-                trend_data = []
-                for anno in range(1, 6):
-                    trend_item = {'anno': anno}
-                    
-                    if scenario_impianto:
-                        trend_item['ricavi_impianto'] = round(scenario_impianto['ricavi'] * anno, 2)
-                        trend_item['margine_impianto'] = round(scenario_impianto['margine_netto'] * anno, 2)
-                        trend_item['costi_impianto'] = round(scenario_impianto['costi'] * anno, 2)
-               
-                    if scenario_siero:
-                        trend_item['ricavi_siero'] = round(scenario_siero['ricavi'] * anno, 2)
-                        trend_item['costi_siero'] = round(scenario_siero['costi'] * anno, 2)
-                        trend_item['margine_siero'] = round(scenario_siero['margine_netto'] * anno, 2)
-                    
-                    trend_data.append(trend_item)
-                
-                simulation_data['trend_quinquennale'] = trend_data
-                
-                print("Risultati calcolati:", simulation_data)
-                print("===============")
+                # Storico: salvataggio in blocco fuori dal percorso della richiesta
+                _registra_storico([(input_data, simulation_json)], traccia)
                 
                 # Restituisci JSON per AJAX
                 if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                    return JsonResponse(simulation_data)
+                    return HttpResponse(simulation_json, content_type='application/json')
+                
+                if simulation_data is None:
+                    simulation_data = serializzazione.da_json(simulation_json)
                 
                 # Per richieste normali, aggiungi il messaggio di successo
                 messages.success(request, 'Simulazione completata con successo!')
                 
             except Exception as e:
                 error_msg = f"Errore nei calcoli: {str(e)}"
-                print("ERRORE CALCOLI:", error_msg)
-                logger.error(error_msg)
+                logger.error("[%s] %s", traccia.id, error_msg)
                 
                 if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                     return JsonResponse({
@@ -315,76 +351,657 @@ def dashboard_view(request):
     # Prepara il context per il template
     context = {
         'form': form,
+        'profili_costi': profili.nomi(),
         'simulation_data': simulation_data,
-        'simulation_json': json.dumps(simulation_data) if simulation_data else None
+        'simulation_json': simulation_json.decode() if simulation_json else None
     }
     
-    return render(request, 'dashboard/dashboard.html', context)
+    with traccia.fase('rendering'):
+        return render(request, 'dashboard/dashboard.html', context)
 
+def _calcolo_api(request, profili_caricati=None):
+    """
+    Corpo comune di ajax_calculate e della variante asincrona. Restituisce
+    la risposta e la voce da registrare nello storico (None se in errore).
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Metodo non consentito'}, status=405), None
+    
+    traccia = request.traccia
+    try:
+        sezioni = _sezioni_richieste(request)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': f"Sezioni non valide: {e}"}, status=400), None
+    try:
+        with traccia.fase('parsing'):
+            dati = _leggi_json(request) if request.content_type == 'application/json' else request.POST
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': f"JSON non valido: {e}"}, status=400), None
+    if not hasattr(dati, 'get'):
+        return JsonResponse({'success': False, 'error': "È richiesto un oggetto JSON"}, status=400), None
+    
+    with traccia.fase('validazione'):
+        input_data, errors = _valida_input(dati, profili_caricati)
+    if errors:
+        return JsonResponse({
+            'success': False,
+            'error': "Errori di validazione: " + "; ".join(errors)
+        }, status=400), None
+    
+    try:
+        input_data = _ordina_input(input_data)
+        if sezioni is not None:
+            return _calcolo_sezioni(input_data, sezioni, traccia)
+        simulation_json, _ = _simulazione_json(input_data, traccia)
+    except Exception as e:
+        error_msg = f"Errore nei calcoli: {str(e)}"
+        logger.error("[%s] %s", traccia.id, error_msg)
+        return JsonResponse({'success': False, 'error': error_msg}, status=500), None
+    
+    return HttpResponse(simulation_json, content_type='application/json'), (input_data, simulation_json)
+
+
+def _calcolo_sezioni(input_data, sezioni, traccia):
+    """
+    Risposta con le sole `sezioni` del payload, valutate dal grafo del motore:
+    le altre non sono né calcolate né serializzate (e non passano dalla cache
+    dei payload completi). Per lo storico servono comunque le SEZIONI_STORICO.
+    """
+    valutatore = engine.Valutatore(input_data, **soglie_decisionali())
+    with traccia.fase('calcolo'):
+        simulation_data = valutatore.payload(sezioni)
+        voce = None
+        if persistenza.attivo():
+            voce = (input_data, valutatore.payload(persistenza.SEZIONI_STORICO))
+    with traccia.fase('serializzazione'):
+        return serializzazione.risposta_json(simulation_data), voce
+
+
+@csrf_exempt
+@metriche.strumenta('ajax')
 def ajax_calculate(request):
-    """View per calcoli AJAX"""
-    if request.method == 'POST':
-        form = SimulationForm(request.POST)
-        if form.is_valid():
-            # Crea un'istanza temporanea senza salvare nel DB
-            simulation = form.save(commit=False)
-            
-            # Calcola i risultati
-            scenario_impianto = simulation.calcola_scenario_impianto()
-            scenario_siero = simulation.calcola_scenario_vendita_siero()
-            scenario_proteine = simulation.calcola_scenario_proteine()
-            
-            # Calcoli aggiuntivi per grafici
-            roi_impianto = scenario_impianto['roi']
-            payback_years = float(form.cleaned_data['costo_impianto']) / float(scenario_impianto['margine_netto']) if scenario_impianto['margine_netto'] > 0 else 0
-            
-            # Distribuzione costi
-            ammortamento_annuo = float(form.cleaned_data['costo_impianto']) / 10
-            distribuzione_costi = {
-                'ammortamento': ammortamento_annuo,
-                'operativi': float(form.cleaned_data['costi_operativi_annui']),
-                'distribuzione': float(form.cleaned_data['costo_distribuzione']),
-                'totale': ammortamento_annuo + float(form.cleaned_data['costi_operativi_annui']) + float(form.cleaned_data['costo_distribuzione'])
-            }
+    """
+    Endpoint leggero per le integrazioni: accetta un oggetto JSON (o un form
+    urlencoded) con i campi della dashboard e restituisce lo stesso payload
+    di dashboard_view. La validazione è quella tipizzata di `_valida_input`
+    (float, senza ModelForm né istanze del modello) e i risultati passano
+    dalla cache condivisa con la dashboard.
+    
+    Con `?sezioni=kpi,messaggio_decisionale` (o `?fields=`) la risposta
+    contiene solo le sezioni indicate, calcolate in modo pigro.
+    """
+    response, voce = _calcolo_api(request)
+    if voce is not None:
+        _registra_storico([voce], request.traccia)
+    return response
+
+def _whatif(request, profili_caricati=None):
+    """
+    Corpo comune di whatif_calculate e della variante asincrona: risultato
+    dello scenario corrente come delta rispetto a quello di `precedente`.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Metodo non consentito'}, status=405)
+    
+    traccia = request.traccia
+    try:
+        with traccia.fase('parsing'):
+            dati = _leggi_json(request)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': f"JSON non valido: {e}"}, status=400)
+    if not isinstance(dati, dict):
+        return JsonResponse({'success': False, 'error': "È richiesto un oggetto JSON"}, status=400)
+    
+    with traccia.fase('validazione'):
+        input_data, errors = _valida_input(dati, profili_caricati)
+        precedente = dati.get('precedente')
+        if isinstance(precedente, dict):
+            precedente, errori_precedente = _valida_input(precedente, profili_caricati)
+            if errori_precedente:
+                precedente = None
+        else:
+            precedente = None
+    if errors:
+        return JsonResponse({
+            'success': False,
+            'error': "Errori di validazione: " + "; ".join(errors)
+        }, status=400)
+    
+    input_data = _ordina_input(input_data)
+    try:
+        with traccia.fase('calcolo'):
+            if precedente is None:
+                with valutatori.valutatore(dati.get('sessione'), input_data) as valutatore:
+                    risposta = {'success': True, 'completo': True, 'delta': valutatore.payload()}
+            else:
+                # Valori intermedi dello scenario mostrato: già noti se la sessione è in memoria
+                with valutatori.valutatore(dati.get('sessione'), _ordina_input(precedente)) as valutatore:
+                    payload_precedente = valutatore.payload()
+                    sezioni = valutatore.aggiorna(input_data, **soglie_decisionali())
+                    # Solo le sezioni a valle degli input cambiati
+                    payload = valutatore.payload(sezioni)
+                with traccia.fase('delta'):
+                    delta = serializzazione.differenze(
+                        {nome: payload_precedente[nome] for nome in payload_precedente if nome in sezioni},
+                        payload,
+                    )
+                risposta = {'success': True, 'completo': False, 'delta': delta}
+    except Exception as e:
+        error_msg = f"Errore nei calcoli: {str(e)}"
+        logger.error("[%s] %s", traccia.id, error_msg)
+        return JsonResponse({'success': False, 'error': error_msg}, status=500)
+    
+    with traccia.fase('serializzazione'):
+        return serializzazione.risposta_json(risposta)
+
+
+@csrf_exempt
+@metriche.strumenta('whatif')
+def whatif_calculate(request):
+    """
+    Endpoint della modalità what-if (cursori della dashboard): oggetto JSON
+    con i campi del form, in `precedente` gli input del risultato già
+    mostrato dal browser e in `sessione` l'identificativo della scheda.
+    Restituisce solo le parti del payload cambiate (`delta`, JSON Merge
+    Patch), o il payload intero (`completo`) se `precedente` manca o non è
+    valido. Il calcolo usa il grafo del motore con i valori intermedi della
+    sessione (vedi dashboard.valutatori): sono ricalcolate solo le sezioni
+    a valle degli input modificati.
+    
+    Le esplorazioni non sono salvate nello storico: solo il calcolo
+    confermato con "Calcola Simulazione" lo è.
+    """
+    return _whatif(request)
+
+
+@csrf_exempt
+@metriche.strumenta('batch')
+def batch_calculate(request):
+    """
+    API JSON per il calcolo di molte simulazioni in una sola richiesta.
+    
+    Accetta un array JSON di input oppure uno stream NDJSON (una simulazione
+    per riga, Content-Type application/x-ndjson) e restituisce, nello stesso
+    formato e nello stesso ordine, il payload della dashboard per ciascuna.
+    
+    Il parametro `?profilo=<nome>` applica un profilo di costo a tutte le
+    simulazioni che non ne indicano uno proprio; con `?formato=colonne` la
+    risposta è colonnare (un elenco per campo, vedi
+    `serializzazione.in_colonne`) invece di un oggetto per simulazione;
+    `?sezioni=` (o `?fields=`) limita i payload alle sezioni indicate.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Metodo non consentito'}, status=405)
+    
+    traccia = request.traccia
+    profilo_batch = request.GET.get('profilo')
+    ndjson = request.content_type in ('application/x-ndjson', 'application/ndjson')
+    try:
+        sezioni = _sezioni_richieste(request)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': f"Sezioni non valide: {e}"}, status=400)
+    
+    try:
+        with traccia.fase('parsing'):
+            if ndjson:
+                elementi = [serializzazione.da_json(riga) for riga in request if riga.strip()]
+            else:
+                elementi = serializzazione.da_json(request.body)
+    except (ValueError, UnicodeDecodeError) as e:
+        return JsonResponse({'success': False, 'error': f"JSON non valido: {e}"}, status=400)
+    
+    if not isinstance(elementi, list):
+        return JsonResponse({'success': False, 'error': "È richiesto un array di simulazioni"}, status=400)
+    
+    if len(elementi) > BATCH_MAX_SIMULAZIONI:
+        return JsonResponse({
+            'success': False,
+            'error': f"Massimo {BATCH_MAX_SIMULAZIONI} simulazioni per richiesta"
+        }, status=400)
+    
+    # Valida tutte le righe, poi calcola quelle valide in un solo passaggio
+    risultati = [None] * len(elementi)
+    validi = []
+    posizioni = []
+    with traccia.fase('validazione'):
+        for i, elemento in enumerate(elementi):
+            if not isinstance(elemento, dict):
+                risultati[i] = {'success': False, 'error': "Ogni simulazione deve essere un oggetto JSON"}
+                continue
             
-            # Trend quinquennale
-            trend_data = []
-            for anno in range(1, 6):
-                trend_data.append({
-                    'anno': anno,
-                    'ricavi_impianto': scenario_impianto['ricavi'] * anno,
-                    'costi_impianto': scenario_impianto['costi'] * anno,
-                    'ricavi_siero': scenario_siero['ricavi'] * anno,
-                    'costi_siero': scenario_siero['costi'] * anno
-                })
+            if profilo_batch and 'profilo' not in elemento:
+                elemento = dict(elemento, profilo=profilo_batch)
             
-            data = {
+            input_data, errors = _valida_input(elemento)
+            if errors:
+                risultati[i] = {'success': False, 'error': "Errori di validazione: " + "; ".join(errors)}
+            else:
+                validi.append(_ordina_input(input_data))
+                posizioni.append(i)
+    
+    # La proiezione pluriennale (la parte più costosa) solo se serve alle sezioni richieste
+    proiezione = sezioni is None or not sezioni.isdisjoint(('proiezione', 'trend_quinquennale'))
+    with traccia.fase('calcolo'):
+        calcolati = engine.simulazioni_batch(validi, proiezione=proiezione, **soglie_decisionali())
+    _registra_storico(list(zip(validi, calcolati)), traccia)
+    if sezioni is not None:
+        calcolati = [
+            {nome: valore for nome, valore in simulation_data.items() if nome in sezioni}
+            for simulation_data in calcolati
+        ]
+    for i, simulation_data in zip(posizioni, calcolati):
+        risultati[i] = simulation_data
+    
+    with traccia.fase('serializzazione'):
+        if request.GET.get('formato') == 'colonne':
+            return serializzazione.risposta_json({
                 'success': True,
-                'scenario_impianto': scenario_impianto,
-                'scenario_siero': scenario_siero,
-                'comparazione': {
-                    'differenza_ricavi': scenario_impianto['ricavi'] - scenario_siero['ricavi'],
-                    'differenza_costi': scenario_impianto['costi'] - scenario_siero['costi'],
-                    'differenza_margine': scenario_impianto['margine_netto'] - scenario_siero['margine_netto']
-                },
-                'kpi': {
-                    'roi_impianto': roi_impianto,
-                    'payback_years': float(payback_years),
-                    'efficienza_conversione': float(form.cleaned_data['resa_proteine']) * 100,
-                    'valore_aggiunto_per_litro': (scenario_impianto['ricavi'] - scenario_siero['ricavi']) / float(form.cleaned_data['volume_siero'])
-                },
-                'distribuzione_costi': distribuzione_costi,
-                'trend_quinquennale': trend_data
-            }
-            
-            return JsonResponse(data)
-        else:
-            return JsonResponse({
-                'success': False,
-                'errors': form.errors
+                'count': len(risultati),
+                'colonne': serializzazione.in_colonne(risultati)
             })
+        
+        if ndjson:
+            return HttpResponse(serializzazione.in_ndjson(risultati), content_type='application/x-ndjson')
+        
+        return serializzazione.risposta_json({
+            'success': True,
+            'count': len(risultati),
+            'results': risultati
+        })
+
+def _leggi_json(request):
+    """Legge il corpo JSON della richiesta (ValueError se non valido)"""
+    try:
+        return serializzazione.da_json(request.body)
+    except UnicodeDecodeError as e:
+        raise ValueError(str(e))
+
+
+@csrf_exempt
+@metriche.strumenta('sweep')
+def sweep_calculate(request):
+    """
+    API per l'analisi di sensibilità su una griglia di parametri.
+    
+    Corpo JSON:
+        {"assi": {"volume_siero": {"min": 1000, "max": 5000000, "passi": 500},
+                  "prezzo_vendita_siero": {"min": 0.05, "max": 0.5, "passi": 500}},
+         "parametri": {"capacita_investimento": 2000000},
+         "profilo": "Fornitore B",
+         "metriche": ["margine_impianto", "roi_impianto"],
+         "formato": "json" | "binario"}
+    
+    I parametri non indicati assumono i valori del profilo di costo (o del
+    predefinito, o i valori fissi del motore).
+    
+    In formato JSON ogni metrica è una matrice (liste annidate) con la forma
+    della griglia; in formato binario il corpo contiene le metriche una dopo
+    l'altra come float32 little-endian, con forma e ordine negli header.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Metodo non consentito'}, status=405)
+    
+    traccia = request.traccia
+    try:
+        with traccia.fase('parsing'):
+            richiesta = _leggi_json(request)
+        if not isinstance(richiesta, dict) or not isinstance(richiesta.get('assi'), dict) or not richiesta['assi']:
+            raise ValueError("Specificare almeno un asse in 'assi'")
+        
+        # Celle contate prima di generare gli assi: nessuna allocazione per griglie fuori limite
+        assi = engine.assi_griglia({
+            nome: (intervallo['min'], intervallo['max'], intervallo.get('passi', 50))
+            for nome, intervallo in richiesta['assi'].items()
+        })
+        parametri = _valori_costo(richiesta.get('profilo'))
+        parametri.update(_parametri_scalari(richiesta.get('parametri', {})))
+        nomi_metriche = richiesta.get('metriche') or SWEEP_METRICHE_DEFAULT
+        
+        with traccia.fase('calcolo'):
+            griglia = engine.griglia_sensibilita(assi, parametri, nomi_metriche, **soglie_decisionali())
+    except (KeyError, TypeError, ValueError) as e:
+        return JsonResponse({'success': False, 'error': f"Richiesta sweep non valida: {e}"}, status=400)
+    
+    forma = list(next(iter(griglia.values())).shape)
+    
+    with traccia.fase('serializzazione'):
+        return _risposta_sweep(richiesta, assi, griglia, forma)
+
+
+def _risposta_sweep(richiesta, assi, griglia, forma):
+    """Risposta dello sweep in formato JSON o binario"""
+    if richiesta.get('formato') == 'binario':
+        corpo = b''.join(
+            np.ascontiguousarray(valori, dtype='<f4').tobytes() for valori in griglia.values()
+        )
+        response = HttpResponse(corpo, content_type='application/octet-stream')
+        response['X-Sweep-Forma'] = ','.join(str(n) for n in forma)
+        response['X-Sweep-Assi'] = ','.join(assi)
+        response['X-Sweep-Metriche'] = ','.join(griglia)
+        if engine.METRICA_DECISIONE in griglia:
+            response['X-Sweep-Codici-Decisione'] = ','.join(engine.CODICI_DECISIONE)
+        return response
+    
+    risposta = {
+        'success': True,
+        'forma': forma,
+        'assi': {nome: np.round(valori, 4).tolist() for nome, valori in assi.items()},
+        # Payback non recuperabile (NaN) codificato come 999, come nei KPI
+        'metriche': {
+            nome: np.round(np.nan_to_num(valori, nan=999), 2).tolist()
+            for nome, valori in griglia.items()
+        }
+    }
+    if engine.METRICA_DECISIONE in griglia:
+        risposta['codici_decisione'] = list(engine.CODICI_DECISIONE)
+    return JsonResponse(risposta)
+
+@csrf_exempt
+@metriche.strumenta('montecarlo')
+def montecarlo_calculate(request):
+    """
+    API per la simulazione Monte Carlo del rischio.
     
-    return JsonResponse({'success': False, 'message': 'Metodo non consentito'})
+    Corpo JSON:
+        {"distribuzioni": {
+            "prezzo_vendita_proteine": {"tipo": "normale", "media": 50, "dev_std": 8},
+            "prezzo_vendita_siero": {"tipo": "uniforme", "min": 0.12, "max": 0.25},
+            "resa_proteine": {"tipo": "triangolare", "min": 0.04, "moda": 0.05, "max": 0.06},
+            "volume_siero": 3000000},
+         "parametri": {"costo_distribuzione": 15000},
+         "profilo": "Fornitore B",
+         "estrazioni": 1000000, "seed": 42, "processi": 4}
+    
+    I parametri non indicati assumono i valori del profilo di costo (o del
+    predefinito, o i valori fissi del motore).
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Metodo non consentito'}, status=405)
+    
+    try:
+        richiesta = _leggi_json(request)
+        if not isinstance(richiesta, dict) or not isinstance(richiesta.get('distribuzioni'), dict):
+            raise ValueError("Specificare le distribuzioni in 'distribuzioni'")
+        
+        parametri = _valori_costo(richiesta.get('profilo'))
+        parametri.update(richiesta.get('parametri', {}))
+        seed = richiesta.get('seed')
+        
+        risultato = engine.simula_montecarlo(
+            richiesta['distribuzioni'],
+            parametri,
+            estrazioni=richiesta.get('estrazioni', MONTECARLO_ESTRAZIONI_DEFAULT),
+            seed=int(seed) if seed is not None else None,
+            processi=min(int(richiesta.get('processi', 1)), MONTECARLO_MAX_PROCESSI),
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        return JsonResponse({'success': False, 'error': f"Richiesta Monte Carlo non valida: {e}"}, status=400)
+    
+    risultato['success'] = True
+    return JsonResponse(risultato)
+
+@csrf_exempt
+@metriche.strumenta('solver')
+def solver_calculate(request):
+    """
+    API di pareggio: volume e prezzo proteine di break-even, punto di
+    convenienza impianto/siero e volume per un payback obiettivo.
+    
+    Accetta un oggetto JSON o un array di oggetti con i campi di
+    `engine.PARAMETRI_SOLVER` e l'eventuale `profilo` (i mancanti assumono
+    i valori del profilo di costo, del predefinito o i valori fissi) e
+    restituisce le soluzioni nello stesso formato; null se non esistono.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Metodo non consentito'}, status=405)
+    
+    try:
+        richiesta = _leggi_json(request)
+        elementi = richiesta if isinstance(richiesta, list) else [richiesta]
+        if not elementi or not all(isinstance(e, dict) for e in elementi):
+            raise ValueError("È richiesto un oggetto o un array di oggetti")
+        
+        predefiniti = [
+            dict(_valori_costo(e.get('profilo')), volume_siero=np.nan, payback_obiettivo=np.nan)
+            for e in elementi
+        ]
+        colonne = {
+            campo: np.array([float(e.get(campo, valori[campo])) for e, valori in zip(elementi, predefiniti)])
+            for campo in engine.PARAMETRI_SOLVER
+        }
+    except (TypeError, ValueError) as e:
+        return JsonResponse({'success': False, 'error': f"Richiesta solver non valida: {e}"}, status=400)
+    
+    soluzioni = engine.risolvi_pareggio(**colonne)
+    # NaN (soluzione inesistente) -> None
+    colonne_risultato = {
+        nome: [v if np.isfinite(v) else None for v in valori.tolist()]
+        for nome, valori in soluzioni.items()
+    }
+    risultati = [
+        {nome: valori[i] for nome, valori in colonne_risultato.items()}
+        for i in range(len(elementi))
+    ]
+    
+    if isinstance(richiesta, list):
+        return JsonResponse({'success': True, 'count': len(risultati), 'results': risultati})
+    return JsonResponse(dict(risultati[0], success=True))
+
+def metriche_view(request):
+    """Contatori e istogrammi di latenza nel formato testuale di Prometheus"""
+    gauge = {
+        f'dashboard_storico_{nome}': valore for nome, valore in persistenza.statistiche().items()
+    }
+    gauge.update({
+        f'dashboard_cache_{nome}': valore for nome, valore in cache_risultati.statistiche().items()
+        if nome in ('hits', 'misses', 'scritture')
+    })
+    gauge.update({
+        f'dashboard_whatif_{nome}': valore for nome, valore in valutatori.statistiche().items()
+    })
+    return HttpResponse(metriche.esporta(gauge), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@metriche.strumenta('esportazione')
+def esporta_storico(request):
+    """
+    Esportazione in streaming dello storico: input e risultati ricalcolati
+    di ogni simulazione salvata, in CSV (default) o NDJSON.
+    
+    Parametri GET: formato=csv|ndjson, dal / al (AAAA-MM-GG, inclusi),
+    volume_min / volume_max, profilo. Le righe sono lette a blocchi: la
+    memoria non dipende dal numero di simulazioni esportate.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'message': 'Metodo non consentito'}, status=405)
+    
+    formato = request.GET.get('formato', 'csv')
+    if formato not in esportazione.FORMATI:
+        return JsonResponse({
+            'success': False,
+            'error': f"Formato non supportato: {formato} (valori ammessi: {', '.join(esportazione.FORMATI)})"
+        }, status=400)
+    try:
+        queryset = esportazione.filtra(request.GET)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': f"Filtro non valido: {e}"}, status=400)
+    
+    if formato == 'csv':
+        response = StreamingHttpResponse(esportazione.in_csv(queryset), content_type='text/csv; charset=utf-8')
+    else:
+        response = StreamingHttpResponse(esportazione.in_ndjson(queryset), content_type='application/x-ndjson')
+    response['Content-Disposition'] = f'attachment; filename="storico_simulazioni.{formato}"'
+    return response
+
+@metriche.strumenta('aggregati')
+def storico_aggregati(request):
+    """
+    Serie aggregate dello storico per i grafici: conteggio, quota con
+    impianto conveniente e media (o somma) dei risultati per gruppo.
+    
+    Parametri GET: per=mese|esito|volume, dal / al (AAAA-MM, inclusi),
+    valore=media|somma. Legge gli aggregati materializzati (vedi
+    dashboard.aggregati), non le singole simulazioni.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'message': 'Metodo non consentito'}, status=405)
+    
+    try:
+        risultato = aggregati.serie(
+            per=request.GET.get('per', 'mese'),
+            dal=request.GET.get('dal'),
+            al=request.GET.get('al'),
+            valore=request.GET.get('valore', 'media'),
+        )
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': f"Parametri non validi: {e}"}, status=400)
+    
+    risultato['success'] = True
+    return serializzazione.risposta_json(risultato)
+
+# Permessi richiesti per importare (e sovrascrivere) i volumi di produzione
+PERMESSI_IMPORTAZIONE = ('dashboard.add_produzionemensile', 'dashboard.change_produzionemensile')
+
+
+@metriche.strumenta('importazione')
+def importa_produzione(request):
+    """
+    Importazione dei volumi mensili di siero per latteria da CSV: file nel
+    campo `file` (multipart) oppure corpo text/csv. Il file è letto in
+    streaming e calcolato a blocchi (vedi dashboard.importazione).
+    
+    L'importazione sostituisce i dati salvati: è riservata allo staff con i
+    permessi di PERMESSI_IMPORTAZIONE e, a differenza delle API di calcolo,
+    mantiene la protezione CSRF.
+    
+    Parametri GET: delimitatore (default rilevato), simula=1 per validare e
+    calcolare senza salvare. Restituisce il riepilogo dell'importazione.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Metodo non consentito'}, status=405)
+    
+    utente = request.user
+    if not (utente.is_authenticated and utente.is_staff and utente.has_perms(PERMESSI_IMPORTAZIONE)):
+        return JsonResponse({'success': False, 'error': "Importazione riservata allo staff autorizzato"}, status=403)
+    
+    traccia = request.traccia
+    if request.content_type == 'multipart/form-data':
+        sorgente = request.FILES.get('file')
+        if sorgente is None:
+            return JsonResponse({'success': False, 'error': "Allegare il file CSV nel campo 'file'"}, status=400)
+    else:
+        sorgente = request
+    
+    try:
+        with traccia.fase('calcolo'):
+            riepilogo = importazione.importa(
+                codecs.iterdecode(sorgente, 'utf-8-sig'),
+                delimitatore=request.GET.get('delimitatore') or None,
+                scrivi=request.GET.get('simula') != '1',
+            )
+    except (ValueError, UnicodeDecodeError) as e:
+        return JsonResponse({'success': False, 'error': f"Importazione non valida: {e}"}, status=400)
+    
+    return JsonResponse(dict(riepilogo, success=True))
+
+def cache_stats(request):
+    """Contatori hit/miss della cache dei risultati (monitoraggio)"""
+    return JsonResponse(cache_risultati.statistiche())
+
+# --- Variante asincrona (ASGI) -------------------------------------------------
+#
+# Con DASHBOARD_VISTE_ASINCRONE attivo (default sotto siero_simulator.asgi) gli
+# URL puntano a queste view. Il calcolo della singola simulazione è breve e
+# senza accessi al database, quindi avviene direttamente nel ciclo di eventi;
+# batch, sweep, Monte Carlo e solver girano nel pool di thread così da non
+# bloccarlo.
+
+@metriche.strumenta('dashboard')
+async def dashboard_view_async(request):
+    """
+    Variante asincrona di dashboard_view. Le richieste AJAX sono servite nel
+    ciclo di eventi; la pagina HTML (sessione e messaggi) usa la view
+    sincrona.
+    """
+    if request.method != 'POST' or request.headers.get('X-Requested-With') != 'XMLHttpRequest':
+        return await sync_to_async(dashboard_view)(request)
+    
+    traccia = request.traccia
+    with traccia.fase('parsing'):
+        dati = request.POST
+    with traccia.fase('validazione'):
+        input_data, errors = _valida_input(dati, await profili.aprepara())
+    if errors:
+        return JsonResponse({
+            'success': False,
+            'error': "Errori di validazione: " + "; ".join(errors)
+        })
+    
+    try:
+        input_data = _ordina_input(input_data)
+        simulation_json, _ = _simulazione_json(input_data, traccia)
+    except Exception as e:
+        error_msg = f"Errore nei calcoli: {str(e)}"
+        logger.error("[%s] %s", traccia.id, error_msg)
+        return JsonResponse({'success': False, 'error': error_msg})
+    
+    await _aregistra_storico([(input_data, simulation_json)], traccia)
+    return HttpResponse(simulation_json, content_type='application/json')
+
+@csrf_exempt
+@metriche.strumenta('ajax')
+async def ajax_calculate_async(request):
+    """Variante asincrona di ajax_calculate, servita nel ciclo di eventi"""
+    response, voce = _calcolo_api(request, await profili.aprepara())
+    if voce is not None:
+        await _aregistra_storico([voce], request.traccia)
+    return response
+
+@csrf_exempt
+@metriche.strumenta('whatif')
+async def whatif_calculate_async(request):
+    """Variante asincrona di whatif_calculate, servita nel ciclo di eventi"""
+    return _whatif(request, await profili.aprepara())
+
+def _in_thread(vista):
+    """Variante asincrona di una view di calcolo intensivo, eseguita nel pool di thread"""
+    def vista_con_connessioni(request):
+        # I thread del pool non ricevono request_started/request_finished: le
+        # connessioni aperte dalla view sono chiuse qui (come fa Django a fine
+        # richiesta), altrimenti restano aperte una per thread oltre CONN_MAX_AGE
+        close_old_connections()
+        try:
+            return vista(request)
+        finally:
+            close_old_connections()
+    
+    vista_in_thread = sync_to_async(vista_con_connessioni, thread_sensitive=False)
+    
+    # wraps copia anche l'attributo csrf_exempt: la protezione CSRF resta quella della view
+    @wraps(vista)
+    async def vista_async(request):
+        return await vista_in_thread(request)
+    
+    return vista_async
+
+@metriche.strumenta('esportazione')
+async def esporta_storico_async(request):
+    """
+    Variante asincrona di esporta_storico: lo streaming usa un iteratore
+    asincrono (un iteratore sincrono verrebbe accumulato per intero da
+    Django sotto ASGI), con lettura e calcolo dei blocchi nel pool di thread.
+    """
+    # Nessun accesso al database prima dell'iterazione: la validazione resta nel ciclo di eventi
+    response = esporta_storico(request)
+    if isinstance(response, StreamingHttpResponse):
+        response.streaming_content = esportazione.in_asincrono(iter(response.streaming_content))
+    return response
+
+batch_calculate_async = _in_thread(batch_calculate)
+sweep_calculate_async = _in_thread(sweep_calculate)
+montecarlo_calculate_async = _in_thread(montecarlo_calculate)
+solver_calculate_async = _in_thread(solver_calculate)
+importa_produzione_async = _in_thread(importa_produzione)
+storico_aggregati_async = _in_thread(storico_aggregati)
 
 def test_view(request):
     """View di test semplificata"""
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'siero_simulator.settings')
+# Sotto ASGI gli URL della dashboard usano le view asincrone
+os.environ.setdefault('DASHBOARD_VISTE_ASINCRONE', '1')
 
 application = get_asgi_application()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'dashboard.statici.servizio_statici',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -81,6 +83,52 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Risultati della dashboard: LRU in memoria locale con TTL e dimensione massima
+    'simulazioni': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'simulazioni',
+        'TIMEOUT': 600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    },
+}
+
+DASHBOARD_CACHE_ALIAS = 'simulazioni'
+
+# Storico simulazioni: coda write-behind scritta in blocco in background
+DASHBOARD_STORICO_ATTIVO = True
+DASHBOARD_PERSISTENZA_ASINCRONA = True
+DASHBOARD_STORICO_CAPACITA = 50000  # oltre, le nuove simulazioni vengono scartate
+DASHBOARD_STORICO_BLOCCO = 500  # simulazioni per transazione
+DASHBOARD_STORICO_INTERVALLO = 2.0  # secondi massimi di attesa prima della scrittura
+
+# Soglie della tabella decisionale (budget rimanente in euro, spazio in m²)
+DASHBOARD_SOGLIA_BUDGET = 500000
+DASHBOARD_SOGLIA_SPAZIO = 50
+
+# Profili di costo (ProfiloCosti): secondi dopo cui ogni processo li rilegge
+# dal database (nel processo che li modifica la cache è svuotata subito)
+DASHBOARD_PROFILI_TTL = 60.0
+
+# Percentuale di richieste con misura dei tempi per fase (0-100, vedi /metrics/)
+DASHBOARD_METRICHE_CAMPIONAMENTO = 100
+
+# Modalità what-if: sessioni (schede della dashboard) di cui ogni processo
+# ricorda i valori intermedi del grafo di calcolo (le meno recenti sono scartate)
+DASHBOARD_WHATIF_SESSIONI = 1000
+
+# View di calcolo asincrone: attivate da siero_simulator.asgi
+DASHBOARD_VISTE_ASINCRONE = os.environ.get('DASHBOARD_VISTE_ASINCRONE') == '1'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -119,6 +167,21 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [
     BASE_DIR / "static",
 ]
+STATIC_ROOT = BASE_DIR / "staticfiles"
+
+# Nomi con hash del contenuto e varianti .gz/.br scritte da collectstatic
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'dashboard.statici.StaticiCompressi',
+    },
+}
+
+# Senza DEBUG i file di STATIC_ROOT sono serviti da Django (dashboard.statici),
+# con cache a lungo termine: disattivare se li serve un web server
+DASHBOARD_SERVI_STATICI = not DEBUG
 
 # Configurazione per la localizzazione italiana
 LANGUAGE_CODE = 'it-it'
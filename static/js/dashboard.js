@@ -0,0 +1,838 @@
+/*
+ * Dashboard del simulatore: invio del form via AJAX, tabella, KPI, grafici
+ * e analisi di sensibilità. File statico (in cache nel browser grazie al
+ * nome con hash); i risultati della simulazione corrente arrivano dalla
+ * pagina nel blocco JSON #datiSimulazione.
+ */
+let comparisonChart = null;
+let costsDistributionChart = null;
+let trendChart = null;
+let profitabilityChart = null;
+
+// Gestione form con AJAX
+document.getElementById('simulationForm').addEventListener('submit', function(e) {
+    e.preventDefault();
+
+    const formData = new FormData(this);
+    const calculateBtn = document.getElementById('calculateBtn');
+
+    // Disabilita il pulsante durante il calcolo
+    calculateBtn.disabled = true;
+    calculateBtn.innerHTML = '<i class="fas fa-spinner fa-spin me-2"></i>Calcolando...';
+
+    fetch('/', {
+        method: 'POST',
+        body: formData,
+        headers: {
+            'X-Requested-With': 'XMLHttpRequest',
+            'X-CSRFToken': formData.get('csrfmiddlewaretoken')
+        }
+    })
+    .then(response => {
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+        }
+
+        return response.json();
+    })
+    .then(data => {
+        if (data.success === false) {
+            alert(data.error || 'Errore durante il calcolo. Riprova.');
+        } else {
+            displayResults(data);
+            // Base dei delta della modalità live
+            risultatoLive = data;
+            inputLive = inputForm();
+        }
+    })
+    .catch(error => {
+        console.error('Errore completo:', error);
+        alert(`Errore: ${error.message}`);
+    })
+    .finally(() => {
+        // Riabilita il pulsante
+        calculateBtn.disabled = false;
+        calculateBtn.innerHTML = '<i class="fas fa-play me-2"></i>Calcola Simulazione';
+    });
+});
+
+// Mostra messaggi informativi sui valori di default
+function showDefaultValueMessages(data) {
+    let messages = [];
+
+    // Un solo avviso: sostituito a ogni calcolo (anche in modalità live)
+    const avvisoPrecedente = document.getElementById('avvisoValoriDefault');
+    if (avvisoPrecedente) {
+        avvisoPrecedente.remove();
+    }
+
+    if (data.defaults_used.prezzo_proteine || data.defaults_used.resa_proteine) {
+        messages.push('<i class="fas fa-info-circle text-info"></i> <strong>Scenario Impianto:</strong> Usati valori di default per confronto (Prezzo: €8.50/kg, Resa: 0.65%)');
+    }
+
+    if (data.defaults_used.prezzo_siero) {
+        messages.push('<i class="fas fa-info-circle text-info"></i> <strong>Scenario Siero:</strong> Usato valore di default per confronto (Prezzo: €0.50/litro)');
+    }
+
+    if (messages.length > 0) {
+        const alertDiv = document.createElement('div');
+        alertDiv.id = 'avvisoValoriDefault';
+        alertDiv.className = 'alert alert-info alert-dismissible fade show mb-3';
+        alertDiv.innerHTML = `
+            <div class="d-flex align-items-start">
+                <div class="flex-grow-1">
+                    <h6 class="alert-heading mb-2">Valori di Default Utilizzati</h6>
+                    ${messages.map(msg => `<div class="mb-1">${msg}</div>`).join('')}
+                    <small class="text-muted">I grafici mostrano entrambi gli scenari per facilitare il confronto.</small>
+                </div>
+                <button type="button" class="btn-close ms-2" data-bs-dismiss="alert"></button>
+            </div>
+        `;
+
+        // Inserisce l'alert prima della sezione risultati
+        const resultsSection = document.getElementById('resultsSection');
+        resultsSection.parentNode.insertBefore(alertDiv, resultsSection);
+    }
+}
+
+
+
+function showMessaggioDecisionale(data) {
+    if (data.messaggio_decisionale) {
+        const messaggioDiv = document.getElementById('messaggioDecisionale');
+        const messaggioTesto = document.getElementById('messaggioTesto');
+        const messaggioDettagli = document.getElementById('messaggioDettagli');
+        const messaggioIcon = document.getElementById('messaggioIcon');
+
+        // Imposta il messaggio
+        messaggioTesto.textContent = data.messaggio_decisionale.messaggio;
+
+        // Imposta i dettagli
+        const dettagli = data.messaggio_decisionale.dettagli;
+        messaggioDettagli.innerHTML = `
+            Budget rimanente: €${dettagli.budget_rimanente.toLocaleString('it-IT')} | 
+            Tempistiche: ${dettagli.tempistiche || 'Non specificato'} | 
+            Spazio: ${dettagli.spazio}m² | 
+            Personale: ${dettagli.personale || 'Non specificato'}
+        `;
+
+        // Imposta lo stile in base al tipo di messaggio
+        messaggioDiv.className = `alert alert-${data.messaggio_decisionale.tipo_messaggio} mb-4`;
+
+        // Imposta l'icona appropriata
+        let iconClass = 'fas fa-lightbulb';
+        if (data.messaggio_decisionale.tipo_messaggio === 'success') {
+            iconClass = 'fas fa-check-circle';
+        } else if (data.messaggio_decisionale.tipo_messaggio === 'warning') {
+            iconClass = 'fas fa-exclamation-triangle';
+        } else if (data.messaggio_decisionale.tipo_messaggio === 'info') {
+            iconClass = 'fas fa-info-circle';
+        }
+        messaggioIcon.className = iconClass + ' fa-lg me-2';
+
+        // Mostra il messaggio
+        messaggioDiv.style.display = 'block';
+    }
+}
+
+function displayResults(data) {
+    // Nascondi messaggio iniziale
+    document.getElementById('initialMessage').style.display = 'none';
+
+    // Mostra sezioni risultati
+    document.getElementById('resultsSection').style.display = 'block';
+    document.getElementById('kpiSection').style.display = 'block';
+    document.getElementById('insightsSection').style.display = 'block';
+
+    // Mostra messaggi informativi sui valori di default usati
+    showDefaultValueMessages(data);
+
+    // Mostra messaggio decisionale
+    showMessaggioDecisionale(data);
+
+    // Popola la tabella in base agli scenari disponibili
+    const tableBody = document.getElementById('resultsTableBody');
+    let tableHTML = '';
+
+    // Sempre entrambi gli scenari ora
+    const impiantoLabel = data.scenario_impianto.is_user_data ? 'Acquisto Impianto' : 'Acquisto Impianto <small class="text-muted">(valori default)</small>';
+    const sieroLabel = data.scenario_siero.is_user_data ? 'Vendita Siero' : 'Vendita Siero <small class="text-muted">(valori default)</small>';
+
+    tableHTML = `
+        <tr class="table-info">
+            <td><strong>${impiantoLabel}</strong></td>
+            <td class="text-end">${formatCurrency(data.scenario_impianto.ricavi)}</td>
+            <td class="text-end">${formatCurrency(data.scenario_impianto.costi)}</td>
+            <td class="text-end ${data.scenario_impianto.margine_netto >= 0 ? 'text-success' : 'text-danger'}">${formatCurrency(data.scenario_impianto.margine_netto)}</td>
+            <td class="text-end">${data.scenario_impianto.roi.toFixed(2)}%</td>
+        </tr>
+        <tr class="table-warning">
+            <td><strong>${sieroLabel}</strong></td>
+            <td class="text-end">${formatCurrency(data.scenario_siero.ricavi)}</td>
+            <td class="text-end">${formatCurrency(data.scenario_siero.costi)}</td>
+            <td class="text-end ${data.scenario_siero.margine_netto >= 0 ? 'text-success' : 'text-danger'}">${formatCurrency(data.scenario_siero.margine_netto)}</td>
+            <td class="text-end">${data.scenario_siero.roi.toFixed(2)}%</td>
+        </tr>
+    `;
+
+    tableBody.innerHTML = tableHTML;
+
+    // Aggiorna KPI (solo se disponibili)
+    if (data.kpi && Object.keys(data.kpi).length > 0) {
+        updateKPI(data.kpi);
+    }
+
+    // Aggiorna grafici in base agli scenari disponibili
+    updateComparisonChart(data);
+
+    if (data.distribuzione_costi) {
+        updateCostsDistributionChart(data.distribuzione_costi);
+    }
+
+
+
+    if (data.trend_quinquennale) {
+        updateTrendChart(data.trend_quinquennale);
+    }
+
+    updateProfitabilityChart(data);
+
+    // Genera insights AI
+    generateInsights(data);
+}
+
+// Aggiorna KPI Cards
+function updateKPI(kpi) {
+    // ROI (solo se l'elemento esiste)
+    const roiValueEl = document.getElementById('roiValue');
+    const roiTrendEl = document.getElementById('roiTrend');
+    if (roiValueEl && roiTrendEl) {
+        if (kpi.roi_impianto !== undefined) {
+            roiValueEl.textContent = kpi.roi_impianto.toFixed(1) + '%';
+            roiTrendEl.className = kpi.roi_impianto > 10 ? 'kpi-trend positive' : 'kpi-trend negative';
+        } else {
+            roiValueEl.textContent = 'N/A';
+            roiTrendEl.className = 'kpi-trend neutral';
+        }
+    }
+
+    // Payback
+    const paybackValueEl = document.getElementById('paybackValue');
+    const paybackTrendEl = document.getElementById('paybackTrend');
+    if (paybackValueEl && paybackTrendEl) {
+        if (kpi.payback_years !== undefined) {
+            const payback = kpi.payback_years === 999 ? 'N/A' : kpi.payback_years.toFixed(1);
+            paybackValueEl.textContent = payback;
+            paybackTrendEl.className = kpi.payback_years < 5 ? 'kpi-trend positive' : 'kpi-trend negative';
+        } else {
+            paybackValueEl.textContent = 'N/A';
+            paybackTrendEl.className = 'kpi-trend neutral';
+        }
+    }
+
+    // Efficienza
+    const efficienzaValueEl = document.getElementById('efficienzaValue');
+    if (efficienzaValueEl) {
+        if (kpi.efficienza_conversione !== undefined) {
+            efficienzaValueEl.textContent = kpi.efficienza_conversione.toFixed(2) + '%';
+        } else {
+            efficienzaValueEl.textContent = 'N/A';
+        }
+    }
+
+    // Valore aggiunto
+    const valoreValueEl = document.getElementById('valoreValue');
+    if (valoreValueEl) {
+        if (kpi.valore_aggiunto_per_litro !== undefined) {
+            valoreValueEl.textContent = formatCurrencyShort(kpi.valore_aggiunto_per_litro);
+        } else {
+            valoreValueEl.textContent = 'N/A';
+        }
+    }
+}
+
+// Crea il grafico al primo calcolo; ai successivi ne sostituisce etichette e
+// dataset e lo ridisegna con un'animazione dai valori precedenti, senza
+// distruggere e ricreare istanza e canvas
+function disegnaGrafico(grafico, canvasId, tipo, etichette, datasets, opzioni) {
+    if (grafico && grafico.data.datasets.length === datasets.length) {
+        grafico.data.labels = etichette;
+        datasets.forEach((dataset, i) => Object.assign(grafico.data.datasets[i], dataset));
+        grafico.update();
+        return grafico;
+    }
+    if (grafico) {
+        grafico.destroy();
+    }
+    return new Chart(document.getElementById(canvasId), {
+        type: tipo,
+        data: { labels: etichette, datasets: datasets },
+        options: opzioni
+    });
+}
+
+function scalaEuro() {
+    return {
+        beginAtZero: true,
+        grid: { color: 'rgba(0,0,0,0.1)' },
+        ticks: {
+            callback: function(value) {
+                return formatCurrency(value);
+            }
+        }
+    };
+}
+
+const OPZIONI_CONFRONTO = {
+    responsive: true,
+    maintainAspectRatio: false,
+    plugins: {
+        title: {
+            display: true,
+            text: 'Confronto Scenari: Impianto vs Vendita Siero',
+            font: { size: 16, weight: 'bold' }
+        },
+        legend: {
+            position: 'top',
+            labels: { usePointStyle: true, padding: 20 }
+        }
+    },
+    scales: {
+        y: {
+            beginAtZero: true,
+            grid: { color: 'rgba(0,0,0,0.1)' },
+            ticks: {
+                callback: function(value) {
+                    return '€ ' + value.toLocaleString('it-IT');
+                }
+            }
+        },
+        x: { grid: { display: false } }
+    },
+    animation: {
+        duration: 1500,
+        easing: 'easeOutBounce'
+    }
+};
+
+// Grafico principale comparativo
+function updateComparisonChart(data) {
+    const datasets = [];
+
+    if (data.scenario_impianto) {
+        datasets.push({
+            label: 'Acquisto Impianto',
+            data: [
+                data.scenario_impianto.ricavi,
+                data.scenario_impianto.costi,
+                data.scenario_impianto.margine_netto
+            ],
+            backgroundColor: 'rgba(102, 126, 234, 0.8)',
+            borderColor: 'rgba(102, 126, 234, 1)',
+            borderWidth: 2,
+            borderRadius: 8
+        });
+    }
+
+    if (data.scenario_siero) {
+        datasets.push({
+            label: 'Vendita Siero',
+            data: [
+                data.scenario_siero.ricavi,
+                data.scenario_siero.costi,
+                data.scenario_siero.margine_netto
+            ],
+            backgroundColor: 'rgba(255, 193, 7, 0.8)',
+            borderColor: 'rgba(255, 193, 7, 1)',
+            borderWidth: 2,
+            borderRadius: 8
+        });
+    }
+
+    comparisonChart = disegnaGrafico(comparisonChart, 'comparisonChart', 'bar',
+        ['Ricavi', 'Costi', 'Margine Netto'], datasets, OPZIONI_CONFRONTO);
+}
+
+const OPZIONI_DISTRIBUZIONE_COSTI = {
+    responsive: true,
+    maintainAspectRatio: false,
+    plugins: {
+        legend: {
+            position: 'bottom',
+            labels: { padding: 20, usePointStyle: true }
+        },
+        tooltip: {
+            callbacks: {
+                label: function(context) {
+                    const label = context.label || '';
+                    const value = formatCurrency(context.raw);
+                    // Totale del calcolo corrente, salvato sul dataset
+                    const percentage = ((context.raw / context.dataset.totale) * 100).toFixed(1);
+                    return `${label}: ${value} (${percentage}%)`;
+                }
+            }
+        }
+    },
+    animation: {
+        animateRotate: true,
+        duration: 2000
+    }
+};
+
+// Grafico distribuzione costi
+function updateCostsDistributionChart(distribuzione) {
+    costsDistributionChart = disegnaGrafico(costsDistributionChart, 'costsDistributionChart', 'doughnut',
+        ['Ammortamento Impianto', 'Costi Operativi', 'Costi Distribuzione'], [{
+            data: [distribuzione.ammortamento, distribuzione.operativi, distribuzione.distribuzione],
+            totale: distribuzione.totale,
+            backgroundColor: [
+                'rgba(102, 126, 234, 0.8)',
+                'rgba(56, 239, 125, 0.8)',
+                'rgba(255, 159, 64, 0.8)'
+            ],
+            borderColor: [
+                'rgba(102, 126, 234, 1)',
+                'rgba(56, 239, 125, 1)',
+                'rgba(255, 159, 64, 1)'
+            ],
+            borderWidth: 3,
+            hoverOffset: 10
+        }], OPZIONI_DISTRIBUZIONE_COSTI);
+}
+
+const OPZIONI_TREND = {
+    responsive: true,
+    maintainAspectRatio: false,
+    interaction: {
+        intersect: false,
+        mode: 'index'
+    },
+    plugins: {
+        legend: {
+            position: 'top',
+            labels: { usePointStyle: true, padding: 20 }
+        },
+        tooltip: {
+            callbacks: {
+                label: function(context) {
+                    return `${context.dataset.label}: ${formatCurrency(context.raw)}`;
+                }
+            }
+        }
+    },
+    scales: {
+        y: scalaEuro(),
+        x: { grid: { display: false } }
+    },
+    animation: {
+        duration: 2000,
+        easing: 'easeInOutQuart'
+    }
+};
+
+// Grafico trend quinquennale (o della proiezione pluriennale)
+function updateTrendChart(trendData) {
+    trendChart = disegnaGrafico(trendChart, 'trendChart', 'line', trendData.map(d => `Anno ${d.anno}`), [{
+        label: 'Ricavi Cumulativi Impianto',
+        data: trendData.map(d => d.ricavi_impianto),
+        borderColor: 'rgba(102, 126, 234, 1)',
+        backgroundColor: 'rgba(102, 126, 234, 0.1)',
+        borderWidth: 3,
+        fill: true,
+        tension: 0.4
+    }, {
+        label: 'Costi Cumulativi Impianto',
+        data: trendData.map(d => d.costi_impianto),
+        borderColor: 'rgba(245, 87, 108, 1)',
+        backgroundColor: 'rgba(245, 87, 108, 0.1)',
+        borderWidth: 3,
+        fill: true,
+        tension: 0.4
+    }, {
+        label: 'Ricavi Cumulativi Siero',
+        data: trendData.map(d => d.ricavi_siero),
+        borderColor: 'rgba(56, 239, 125, 1)',
+        backgroundColor: 'rgba(56, 239, 125, 0.1)',
+        borderWidth: 2,
+        borderDash: [5, 5],
+        fill: false,
+        tension: 0.2
+    }, {
+        label: 'Costi Cumulativi Siero',
+        data: trendData.map(d => d.costi_siero),
+        borderColor: 'rgba(255, 159, 64, 1)',
+        backgroundColor: 'rgba(255, 159, 64, 0.1)',
+        borderWidth: 2,
+        borderDash: [10, 5],
+        fill: false,
+        tension: 0.2
+    }], OPZIONI_TREND);
+}
+
+const OPZIONI_PROFITTABILITA = {
+    responsive: true,
+    maintainAspectRatio: false,
+    plugins: {
+        legend: { display: false },
+        tooltip: {
+            callbacks: {
+                label: function(context) {
+                    return `€ ${context.raw.toLocaleString('it-IT')}`;
+                }
+            }
+        }
+    },
+    scales: {
+        y: scalaEuro(),
+        x: { grid: { display: false } }
+    },
+    animation: {
+        duration: 1500,
+        easing: 'easeOutBounce'
+    }
+};
+
+// Grafico profittabilità
+function updateProfitabilityChart(data) {
+    const margineImpianto = data.scenario_impianto.margine_netto;
+    const margineSiero = data.scenario_siero.margine_netto;
+    const differenza = margineImpianto - margineSiero;
+
+    profitabilityChart = disegnaGrafico(profitabilityChart, 'profitabilityChart', 'bar',
+        ['Margine Impianto', 'Margine Siero', 'Differenza'], [{
+            label: 'Profittabilità (€)',
+            data: [margineImpianto, margineSiero, differenza],
+            backgroundColor: [
+                margineImpianto >= 0 ? 'rgba(56, 239, 125, 0.8)' : 'rgba(245, 87, 108, 0.8)',
+                margineSiero >= 0 ? 'rgba(56, 239, 125, 0.8)' : 'rgba(245, 87, 108, 0.8)',
+                differenza >= 0 ? 'rgba(102, 126, 234, 0.8)' : 'rgba(245, 87, 108, 0.8)'
+            ],
+            borderColor: [
+                margineImpianto >= 0 ? 'rgba(56, 239, 125, 1)' : 'rgba(245, 87, 108, 1)',
+                margineSiero >= 0 ? 'rgba(56, 239, 125, 1)' : 'rgba(245, 87, 108, 1)',
+                differenza >= 0 ? 'rgba(102, 126, 234, 1)' : 'rgba(245, 87, 108, 1)'
+            ],
+            borderWidth: 2,
+            borderRadius: 8
+        }], OPZIONI_PROFITTABILITA);
+}
+
+// Genera insights AI
+function generateInsights(data) {
+    const insightsContainer = document.getElementById('aiInsights');
+    const roi = data.kpi.roi_impianto;
+    const payback = data.kpi.payback_years;
+    const differenzaMargine = data.comparazione.differenza_margine;
+
+    let insights = [];
+
+    // Analisi ROI
+    if (roi > 20) {
+        insights.push({
+            icon: 'fas fa-thumbs-up text-success',
+            title: 'ROI Eccellente',
+            text: `Il ROI del ${roi.toFixed(1)}% indica un investimento molto redditizio. L'impianto genererà valore significativo.`
+        });
+    } else if (roi > 10) {
+        insights.push({
+            icon: 'fas fa-check-circle text-warning',
+            title: 'ROI Moderato',
+            text: `Il ROI del ${roi.toFixed(1)}% è accettabile. Considera ottimizzazioni per migliorare la redditività.`
+        });
+    } else {
+        insights.push({
+            icon: 'fas fa-exclamation-triangle text-danger',
+            title: 'ROI Basso',
+            text: `Il ROI del ${roi.toFixed(1)}% potrebbe non giustificare l'investimento. Valuta alternative.`
+        });
+    }
+
+
+
+    // Confronto scenari
+    if (differenzaMargine > 50000) {
+        insights.push({
+            icon: 'fas fa-chart-line text-success',
+            title: 'Vantaggio Significativo',
+            text: `L'impianto genera ${formatCurrency(differenzaMargine)} in più rispetto alla vendita siero. Investimento consigliato.`
+        });
+    } else if (differenzaMargine > 0) {
+        insights.push({
+            icon: 'fas fa-balance-scale text-warning',
+            title: 'Vantaggio Moderato',
+            text: `L'impianto offre un vantaggio di ${formatCurrency(differenzaMargine)}. Valuta fattori qualitativi aggiuntivi.`
+        });
+    } else {
+        insights.push({
+            icon: 'fas fa-arrow-down text-danger',
+            title: 'Vendita Siero Preferibile',
+            text: `La vendita diretta del siero è più conveniente di ${formatCurrency(Math.abs(differenzaMargine))}. Sconsigliato l'impianto.`
+        });
+    }
+
+    // Efficienza
+    const efficienza = data.kpi.efficienza_conversione;
+    if (efficienza > 0.8) {
+        insights.push({
+            icon: 'fas fa-cogs text-success',
+            title: 'Alta Efficienza',
+            text: `L'efficienza di conversione del ${efficienza.toFixed(2)}% è ottima per la valorizzazione del siero.`
+        });
+    }
+
+    // Genera HTML
+    insightsContainer.innerHTML = insights.map(insight => `
+        <div class="alert alert-light border-start border-4 border-primary mb-3">
+            <div class="d-flex align-items-center">
+                <div class="me-3">
+                    <i class="${insight.icon} fa-2x"></i>
+                </div>
+                <div>
+                    <h6 class="mb-1">${insight.title}</h6>
+                    <p class="mb-0 text-muted">${insight.text}</p>
+                </div>
+            </div>
+        </div>
+    `).join('');
+}
+
+// Analisi di sensibilità: griglia volume × prezzo siero in formato binario
+const SWEEP_PASSI = 200;
+// Campi del form inviati come valori fissi della griglia (se non sono un asse)
+const SWEEP_CAMPI_FORM = ['volume_siero', 'capacita_investimento', 'spazio_disponibile', 'tempistiche', 'personale_disponibile'];
+let sweepDati = null;
+
+document.getElementById('sweepForm').addEventListener('submit', function(e) {
+    e.preventDefault();
+    caricaSweep();
+});
+
+function caricaSweep() {
+    const metrica = document.getElementById('sweepMetrica').value;
+    const assi = {
+        volume_siero: {
+            min: parseFloat(document.getElementById('sweepVolumeMin').value),
+            max: parseFloat(document.getElementById('sweepVolumeMax').value),
+            passi: SWEEP_PASSI
+        },
+        prezzo_vendita_siero: {
+            min: parseFloat(document.getElementById('sweepPrezzoMin').value),
+            max: parseFloat(document.getElementById('sweepPrezzoMax').value),
+            passi: SWEEP_PASSI
+        }
+    };
+
+    // Stesso profilo di costo e stessi input del calcolo principale
+    const form = inputForm();
+    const parametri = {};
+    SWEEP_CAMPI_FORM.forEach(campo => {
+        if (!(campo in assi) && form[campo]) {
+            parametri[campo] = form[campo];
+        }
+    });
+
+    fetch('/api/sweep/', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            assi: assi, parametri: parametri, profilo: form.profilo || '', metriche: [metrica], formato: 'binario'
+        })
+    })
+    .then(response => {
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+        }
+        const forma = response.headers.get('X-Sweep-Forma').split(',').map(Number);
+        return response.arrayBuffer().then(buffer => ({ forma: forma, valori: new Float32Array(buffer) }));
+    })
+    .then(risultato => {
+        sweepDati = { assi: assi, metrica: metrica, forma: risultato.forma, valori: risultato.valori };
+        disegnaHeatmap(sweepDati);
+    })
+    .catch(error => {
+        console.error('Errore sweep:', error);
+        alert(`Errore: ${error.message}`);
+    });
+}
+
+function disegnaHeatmap(dati) {
+    const canvas = document.getElementById('sweepHeatmap');
+    const ctx = canvas.getContext('2d');
+    const [righe, colonne] = dati.forma;  // righe = volume, colonne = prezzo siero
+    const valori = dati.valori;
+
+    let minimo = Infinity, massimo = -Infinity;
+    for (let i = 0; i < valori.length; i++) {
+        if (valori[i] < minimo) minimo = valori[i];
+        if (valori[i] > massimo) massimo = valori[i];
+    }
+    const scala = Math.max(Math.abs(minimo), Math.abs(massimo)) || 1;
+
+    // Una cella per pixel, poi scalata sul canvas: volume crescente verso l'alto
+    const immagine = ctx.createImageData(colonne, righe);
+    for (let r = 0; r < righe; r++) {
+        for (let c = 0; c < colonne; c++) {
+            const t = valori[r * colonne + c] / scala;  // -1 .. 1
+            const p = ((righe - 1 - r) * colonne + c) * 4;
+            immagine.data[p] = t < 0 ? Math.round(255 + 10 * t) : Math.round(255 - 199 * t);
+            immagine.data[p + 1] = t < 0 ? Math.round(255 + 168 * t) : Math.round(255 - 16 * t);
+            immagine.data[p + 2] = t < 0 ? Math.round(255 + 147 * t) : Math.round(255 - 130 * t);
+            immagine.data[p + 3] = 255;
+        }
+    }
+
+    const buffer = document.createElement('canvas');
+    buffer.width = colonne;
+    buffer.height = righe;
+    buffer.getContext('2d').putImageData(immagine, 0, 0);
+    ctx.imageSmoothingEnabled = false;
+    ctx.clearRect(0, 0, canvas.width, canvas.height);
+    ctx.drawImage(buffer, 0, 0, canvas.width, canvas.height);
+
+    const formato = dati.metrica === 'roi_impianto' ? (v => v.toFixed(1) + '%') : formatCurrency;
+    document.getElementById('sweepLegendaMin').textContent = 'Min: ' + formato(minimo);
+    document.getElementById('sweepLegendaMax').textContent = 'Max: ' + formato(massimo);
+}
+
+document.getElementById('sweepHeatmap').addEventListener('mousemove', function(e) {
+    if (!sweepDati) return;
+    const rect = this.getBoundingClientRect();
+    const [righe, colonne] = sweepDati.forma;
+    const c = Math.min(colonne - 1, Math.floor((e.clientX - rect.left) / rect.width * colonne));
+    const r = righe - 1 - Math.min(righe - 1, Math.floor((e.clientY - rect.top) / rect.height * righe));
+    const volume = sweepDati.assi.volume_siero;
+    const prezzo = sweepDati.assi.prezzo_vendita_siero;
+    const v = volume.min + (volume.max - volume.min) * r / Math.max(righe - 1, 1);
+    const p = prezzo.min + (prezzo.max - prezzo.min) * c / Math.max(colonne - 1, 1);
+    const valore = sweepDati.valori[r * colonne + c];
+    const formato = sweepDati.metrica === 'roi_impianto' ? valore.toFixed(1) + '%' : formatCurrency(valore);
+    document.getElementById('sweepCella').textContent =
+        `Volume ${Math.round(v).toLocaleString('it-IT')} L | Prezzo siero €${p.toFixed(3)}/L → ${formato}`;
+});
+
+// Modalità what-if: con "Aggiornamento live" i cursori (e i campi) di volume,
+// spazio e capacità di investimento ricalcolano i risultati mentre si
+// modificano. Le richieste partono dopo una breve pausa (debounce), quella
+// superata da un input più recente viene annullata e /api/whatif/ restituisce
+// solo le parti cambiate rispetto al risultato mostrato. L'identificativo di
+// sessione permette al server di ricordare i valori intermedi della scheda.
+const RITARDO_LIVE = 150;  // ms
+const SESSIONE_LIVE = Math.random().toString(36).slice(2) + Date.now().toString(36);
+let risultatoLive = null;  // payload mostrato
+let inputLive = null;      // input del payload mostrato
+let richiestaLive = null;  // AbortController della richiesta in corso
+let timerLive = null;
+
+function inputForm() {
+    const dati = Object.fromEntries(new FormData(document.getElementById('simulationForm')));
+    delete dati.csrfmiddlewaretoken;
+    return dati;
+}
+
+// JSON Merge Patch (RFC 7396), il formato di serializzazione.differenze
+function applicaDelta(oggetto, delta) {
+    for (const [campo, valore] of Object.entries(delta)) {
+        const annidato = oggetto[campo];
+        if (valore === null) {
+            delete oggetto[campo];
+        } else if (typeof valore === 'object' && !Array.isArray(valore) &&
+                   annidato && typeof annidato === 'object' && !Array.isArray(annidato)) {
+            applicaDelta(annidato, valore);
+        } else {
+            oggetto[campo] = valore;
+        }
+    }
+    return oggetto;
+}
+
+function ricalcolaLive() {
+    const dati = inputForm();
+    if (!dati.volume_siero || !dati.spazio_disponibile) {
+        return;
+    }
+    if (richiestaLive) {
+        richiestaLive.abort();
+    }
+    const controller = richiestaLive = new AbortController();
+
+    fetch('/api/whatif/', {
+        method: 'POST',
+        body: JSON.stringify(Object.assign({}, dati, {
+            precedente: risultatoLive ? inputLive : null,
+            sessione: SESSIONE_LIVE
+        })),
+        headers: { 'Content-Type': 'application/json' },
+        signal: controller.signal
+    })
+    .then(response => response.json())
+    .then(risposta => {
+        // Input non valido durante la digitazione: resta il risultato precedente
+        if (risposta.success === false) {
+            return;
+        }
+        risultatoLive = risposta.completo ? risposta.delta : applicaDelta(risultatoLive, risposta.delta);
+        inputLive = dati;
+        displayResults(risultatoLive);
+    })
+    .catch(error => {
+        if (error.name !== 'AbortError') {
+            console.error('Errore what-if:', error);
+        }
+    })
+    .finally(() => {
+        if (richiestaLive === controller) {
+            richiestaLive = null;
+        }
+    });
+}
+
+function programmaLive() {
+    if (!document.getElementById('modalitaLive').checked) {
+        return;
+    }
+    clearTimeout(timerLive);
+    timerLive = setTimeout(ricalcolaLive, RITARDO_LIVE);
+}
+
+document.querySelectorAll('#pannelloLive input[type="range"]').forEach(cursore => {
+    const campo = document.querySelector(`#simulationForm [name="${cursore.dataset.campo}"]`);
+    if (campo.value) {
+        cursore.value = campo.value;
+    }
+    cursore.addEventListener('input', () => {
+        campo.value = cursore.value;
+        programmaLive();
+    });
+    campo.addEventListener('input', () => {
+        cursore.value = campo.value;
+        programmaLive();
+    });
+});
+
+// Anche gli altri campi del form (tempistiche, personale, profilo, ...)
+document.getElementById('simulationForm').addEventListener('change', programmaLive);
+
+// Un solo formatter (crearne uno per valore è costoso: tick e tooltip lo chiamano spesso)
+const FORMATO_EURO = new Intl.NumberFormat('it-IT', {
+    style: 'currency',
+    currency: 'EUR',
+    minimumFractionDigits: 0,
+    maximumFractionDigits: 0
+});
+
+function formatCurrency(value) {
+    return FORMATO_EURO.format(value);
+}
+
+function formatCurrencyShort(value) {
+    if (Math.abs(value) >= 1000) {
+        return '€' + (value / 1000).toFixed(1) + 'k';
+    }
+    return formatCurrency(value);
+}
+
+// Carica risultati se già disponibili (per refresh della pagina)
+const datiSimulazione = document.getElementById('datiSimulazione');
+if (datiSimulazione) {
+    displayResults(JSON.parse(datiSimulazione.textContent));
+}
@@ -2,6 +2,8 @@
 
 # Test script per testare i nuovi scenari condizionali
 
+from dashboard import engine
+
 # Test 1: Solo scenario impianto
 data_impianto = {
     'volume_siero': 10000,
@@ -36,43 +38,23 @@ def test_scenario(data, name):
     print(f"\n=== TEST {name} ===")
     print("Input:", data)
     
-    volume = data['volume_siero']
+    # Stesso calcolo della dashboard: grafo del motore, campi mancanti ai valori fissi
+    input_data = dict(engine.VALORI_FISSI)
+    input_data.update((campo, valore) for campo, valore in data.items() if valore is not None)
+    if input_data['resa_proteine'] > 1:
+        input_data['resa_proteine'] /= 100
+    payload = engine.Valutatore(input_data).payload()
     
     # Scenario Impianto (solo se ha prezzo proteine e resa)
     scenario_impianto = None
     if data['prezzo_vendita_proteine'] and data['resa_proteine']:
-        resa_pct = data['resa_proteine'] / 100 if data['resa_proteine'] > 1 else data['resa_proteine']
-        kg_proteine = volume * resa_pct
-        ricavi_impianto = kg_proteine * data['prezzo_vendita_proteine']
-        
-        ammortamento_annuo = data['costo_impianto'] / 10
-        costi_impianto = ammortamento_annuo + data['costi_operativi_annui']
-        
-        margine_impianto = ricavi_impianto - costi_impianto
-        roi_impianto = (margine_impianto / data['costo_impianto']) * 100
-        
-        scenario_impianto = {
-            'ricavi': round(ricavi_impianto, 2),
-            'costi': round(costi_impianto, 2),
-            'margine_netto': round(margine_impianto, 2),
-            'roi': round(roi_impianto, 2),
-            'kg_proteine': round(kg_proteine, 2)
-        }
+        scenario_impianto = payload['scenario_impianto']
         print("Scenario impianto:", scenario_impianto)
     
     # Scenario Siero (solo se ha prezzo siero)
     scenario_siero = None
     if data['prezzo_vendita_siero']:
-        ricavi_siero = volume * data['prezzo_vendita_siero']
-        costi_siero = 0
-        margine_siero = ricavi_siero - costi_siero
-        
-        scenario_siero = {
-            'ricavi': round(ricavi_siero, 2),
-            'costi': round(costi_siero, 2),
-            'margine_netto': round(margine_siero, 2),
-            'roi': 0
-        }
+        scenario_siero = payload['scenario_siero']
         print("Scenario siero:", scenario_siero)
     
     print("Scenario type:", 'both' if (scenario_impianto and scenario_siero) else 'impianto' if scenario_impianto else 'siero')